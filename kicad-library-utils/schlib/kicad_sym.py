@@ -0,0 +1,752 @@
+# -*- coding: utf-8 -*-
+
+import sys, os, re, copy, mmap, hashlib
+from collections import OrderedDict
+
+# S-expression structure: parentheses and quoted strings (atoms are skipped)
+_STRUCTURE = re.compile(rb'[()]|"(?:[^"\\]|\\.)*"')
+# S-expression tokens: parenthesis, quoted string or atom
+_TOKEN = re.compile(rb'\s*(?:([()])|("(?:[^"\\]|\\.)*")|([^\s()"]+))')
+# S-expression tokens (without leading whitespace): parenthesis or atom (1), quoted string (2)
+_TOKENS = re.compile(rb'([()]|[^\s()"]+)|("(?:[^"\\]|\\.)*")')
+# Atoms of S-expressions without strings (id, at, hide)
+_ATOMS = re.compile(rb'[^\s()"]+')
+# Property name and value
+_PROPERTY = re.compile(rb'\(property\s+("(?:[^"\\]|\\.)*"|[^\s()"]+)\s+("(?:[^"\\]|\\.)*")')
+# Pin position
+_PIN_AT = re.compile(rb'\(pin\s+([^\s()]+)\s+[^\s()]+\s+\(at\s+([^\s()]+)\s+([^\s()]+)')
+# Pin name and number
+_PIN_NAME = re.compile(rb'\(name\s+("(?:[^"\\]|\\.)*")')
+_PIN_NUMBER = re.compile(rb'\(number\s+("(?:[^"\\]|\\.)*")')
+# Hidden text: "hide" flag (KiCad 6-7) or "(hide yes)" (KiCad 8+)
+_HIDE = re.compile(rb'\(hide(?:\s+(yes|no))?\)|[\s)]hide(?=[\s)])')
+
+_ESCAPES = {'n': '\n', 'r': '\r', 't': '\t'}
+_UNESCAPES = {'\n': 'n', '\r': 'r', '\t': 't', '"': '"', '\\': '\\'}
+
+MM_PER_MIL = 0.0254
+
+def unquote(token):
+    # Quoted string token to value
+    return re.sub(r'\\(.)', lambda match: _ESCAPES.get(match.group(1), match.group(1)), token[1:-1])
+
+def quote(value):
+    # Value to quoted string token
+    return '"' + re.sub(r'[\n\r\t"\\]', lambda match: '\\' + _UNESCAPES[match.group()], value) + '"'
+
+def parseExpression(data, start, end):
+    # Parse the S-expression spanning data[start:end]
+    # Atoms and strings are returned as (token, start, end), lists as [start, end, items]
+    stack = []
+    items = None
+    for match in _TOKENS.finditer(data, start, end):
+        token = match.group()
+        if token == b'(':
+            stack.append((match.start(), items))
+            items = []
+        elif token == b')':
+            expression_start, parent = stack.pop()
+            expression = [expression_start, match.end(), items]
+            if not stack:
+                return expression
+            parent.append(expression)
+            items = parent
+        else:
+            items.append((token.decode('utf-8'), match.start(), match.end()))
+    raise ValueError('Unbalanced S-expression at {pos}'.format(pos=start))
+
+def iterTopLevel(data):
+    # Stream top level entries of the library: (start, end, children spans)
+    # Only parentheses and strings are scanned, entry contents are not tokenized
+    depth = 0
+    for match in _STRUCTURE.finditer(data):
+        char = match.group()
+        if char == b'(':
+            depth += 1
+            if depth == 2:
+                entry_start = match.start()
+                children = []
+            elif depth == 3:
+                child_start = match.start()
+        elif char == b')':
+            if depth == 3:
+                children.append((child_start, match.end()))
+            elif depth == 2:
+                yield entry_start, match.end(), children
+            depth -= 1
+
+def iterChildren(data, start, end):
+    # Spans of the S-expressions found in data[start:end] (nested ones are skipped)
+    depth = 0
+    for match in _STRUCTURE.finditer(data, start, end):
+        char = match.group()
+        if char == b'(':
+            if depth == 0:
+                child_start = match.start()
+            depth += 1
+        elif char == b')':
+            depth -= 1
+            if depth == 0:
+                yield child_start, match.end()
+
+def headAtom(data, start):
+    # First atom of the S-expression opened at start
+    match = _TOKEN.match(data, start + 1)
+    if match and match.group(3):
+        return match.group(3).decode('utf-8')
+    return None
+
+def mmToMil(value):
+    try:
+        return str(int(round(float(value) / MM_PER_MIL)))
+    except ValueError:
+        return value
+
+def mmToMilExact(value):
+    # Conversion without rounding to integer (off-grid positions are kept)
+    try:
+        return '{0:g}'.format(round(float(value) / MM_PER_MIL, 3))
+    except ValueError:
+        return value
+
+def milToMm(value):
+    try:
+        return '{0:g}'.format(round(int(value) * MM_PER_MIL, 4))
+    except ValueError:
+        return value
+
+
+class SymProperty(object):
+    """
+    Source of a symbol property: spans are relative to the symbol start
+    """
+    def __init__(self, data, start, end, base, gap_start):
+        match = _PROPERTY.match(data, start, end)
+        if not match:
+            raise ValueError('Invalid property at {pos}'.format(pos=start))
+
+        self.start = start - base
+        self.end = end - base
+        # Whitespace before the property is removed with it
+        self.gap_start = gap_start - base
+        self.name = match.group(1).decode('utf-8')
+        if self.name.startswith('"'):
+            self.name = unquote(self.name)
+        self.name_start, self.name_end = match.start(1) - base, match.end(1) - base
+        self.value = match.group(2).decode('utf-8')
+        self.value_start, self.value_end = match.start(2) - base, match.end(2) - base
+        self.id = None
+        self.at = ['0', '0', '0']
+        self.at_span = None
+        self.effects = None
+        self.effects_span = None
+        # Property level visibility (KiCad 9+)
+        self.hide_span = None
+        self.hidden = False
+
+        # Only position and visibility are parsed, text effects are kept as is
+        for child_start, child_end in iterChildren(data, match.end(), end - 1):
+            head = headAtom(data, child_start)
+            if head == 'effects':
+                self.effects_span = (child_start - base, child_end - base)
+                hide = _HIDE.search(data, child_start, child_end)
+                self.hidden = self.hidden or bool(hide and hide.group(1) != b'no')
+            elif head in ['id', 'at', 'hide']:
+                items = [token.decode('utf-8') for token in _ATOMS.findall(data, child_start, child_end)]
+                if head == 'id':
+                    self.id = int(items[1])
+                elif head == 'at':
+                    self.at = items[1:] + ['0'] * (4 - len(items))
+                    self.at_span = (child_start - base, child_end - base)
+                else:
+                    self.hide_span = (child_start - base, child_end - base)
+                    self.hidden = len(items) < 2 or items[1] != 'no'
+
+
+class SymComponent(object):
+    """
+    A class to parse symbols of KiCad 6+ symbol libraries (.kicad_sym)
+    Symbols are exposed with the fields and documentation model of schlib Component,
+    their S-expression is read from the source file and only patched where it was edited
+    """
+    # Properties mapped to documentation
+    _DOC_PROPERTIES = {'ki_description':'description', 'Description':'description', 'ki_keywords':'keywords', 'Datasheet':'datasheet'}
+    # Mandatory properties mapped to fields 0, 1 and 2
+    _FIELD_PROPERTIES = ['Reference', 'Value', 'Footprint']
+
+    def __init__(self, data, start, end, children, filename, version=0):
+        self.comments = []
+        self.aliases = OrderedDict()
+        self.gap = None
+        self.version = version
+        self.load(data, start, end, children, filename)
+
+    def load(self, data, start, end, children, filename):
+        # Symbol S-expression source
+        self.filename = filename
+        self.start = start
+        self.end = end
+        self.fplist = []
+        self.documentation = OrderedDict([('description',None), ('keywords',None), ('datasheet',None)])
+        self.fields = [None, None, None]
+        # (field or documentation key, property source) of parsed properties
+        self._sources = []
+        # Units: name span, name and S-expression span (relative to symbol start)
+        self._units = []
+        self._pins = None
+        self._power = False
+        # Next property id (None if properties have no id)
+        self._next_id = None
+        self._property_gap = b'\n    '
+
+        match = _TOKEN.match(data, start + 1)
+        match = _TOKEN.match(data, match.end())
+        self.name = unquote(match.group(2).decode('utf-8'))
+        self._name_span = (match.start(2) - start, match.end(2) - start)
+
+        previous_end = match.end()
+        for child_start, child_end in children:
+            head = headAtom(data, child_start)
+            if head == 'property':
+                source = SymProperty(data, child_start, child_end, start, previous_end)
+                self._property_gap = data[previous_end:child_start]
+                self.addSource(source)
+            elif head == 'symbol':
+                # Unit names are prefixed with the symbol name
+                unit = _TOKEN.match(data, child_start + 1)
+                unit = _TOKEN.match(data, unit.end())
+                self._units.append((unit.start(2) - start, unit.end(2) - start, unquote(unit.group(2).decode('utf-8')), child_start - start, child_end - start))
+            elif head == 'power':
+                self._power = True
+            previous_end = child_end
+
+        # Missing mandatory properties
+        if self.fields[0] is None:
+            self.fields[0] = {'reference':'""', 'posx':'0', 'posy':'0', 'visibility':'V', 'property':None}
+        for index in [1, 2]:
+            if self.fields[index] is None:
+                self.fields[index] = {'name':'""', 'posx':'0', 'posy':'0', 'visibility':'I', 'fieldname':'', 'property':None}
+
+        self.definition = {'name':self.name, 'reference':unquote(self.fields[0]['reference'])}
+        self.reference = self.definition['reference']
+        self._original_name = self.name
+
+    def addSource(self, source):
+        if source.id is not None:
+            self._next_id = max(self._next_id or 0, source.id + 1)
+
+        if source.name in self._DOC_PROPERTIES:
+            key = self._DOC_PROPERTIES[source.name]
+            self.documentation[key] = unquote(source.value)
+            source.original = self.documentation[key]
+            self._sources.append((key, source))
+            return
+
+        if source.name == 'ki_fp_filters':
+            self.fplist = unquote(source.value).split()
+            return
+
+        if source.name.startswith('ki_'):
+            # Other internal properties are kept as is
+            return
+
+        field = {
+            'name':source.value,
+            'posx':mmToMil(source.at[0]),
+            'posy':mmToMil(source.at[1]),
+            'visibility':'I' if source.hidden else 'V',
+            'fieldname':'' if source.name in self._FIELD_PROPERTIES else quote(source.name),
+            'property':source,
+        }
+        if source.name == 'Reference':
+            field['reference'] = field.pop('name')
+            del field['fieldname']
+
+        source.original = dict(field)
+        self._sources.append((field, source))
+
+        if source.name in self._FIELD_PROPERTIES:
+            self.fields[self._FIELD_PROPERTIES.index(source.name)] = field
+        else:
+            self.fields.append(field)
+
+    def isModified(self):
+        if self.name != self._original_name:
+            return True
+
+        field_ids = set(id(field) for field in self.fields)
+        for key, source in self._sources:
+            if type(key) is dict:
+                if id(key) not in field_ids or any(key.get(name) != value for name, value in source.original.items()):
+                    return True
+            elif self.documentation[key] != source.original:
+                return True
+
+        sources = set(id(key) for key, source in self._sources if type(key) is dict)
+        if any(id(field) not in sources for field in self.fields):
+            return True
+
+        sources = set(key for key, source in self._sources if type(key) is str)
+        return any(self.documentation[key] is not None and key not in sources for key in self.documentation.keys())
+
+    def clone(self):
+        # Fields and documentation are copied, the S-expression source is shared
+        component = copy.copy(self)
+        component.comments = list(self.comments)
+        component.definition = dict(self.definition)
+        component.fplist = list(self.fplist)
+        component.documentation = OrderedDict(self.documentation)
+        component.aliases = OrderedDict()
+        component.fields = []
+        copies = {}
+        for field in self.fields:
+            copies[id(field)] = dict(field)
+            component.fields.append(copies[id(field)])
+        component._sources = [(copies.get(id(key), key) if type(key) is dict else key, source) for key, source in self._sources]
+        return component
+
+    def propertyExpression(self, name, value, field, hidden):
+        # New property S-expression, effects are copied from the field which was copied (if any)
+        source = field.get('property', None) if field else None
+        if isinstance(source, SymProperty):
+            effects = source.effects
+        else:
+            effects = None
+        if effects is None:
+            effects = '(effects (font (size 1.27 1.27)))'
+        effects = self.setHidden(effects, hidden)
+
+        expression = '(property ' + name + ' ' + value
+        if self._next_id is not None:
+            expression += ' (id {id})'.format(id=self._next_id)
+            self._next_id += 1
+        if field:
+            expression += ' (at {x} {y} 0)'.format(x=milToMm(field['posx']), y=milToMm(field['posy']))
+        else:
+            expression += ' (at 0 0 0)'
+        return expression + ' ' + effects + ')'
+
+    def setHidden(self, effects, hidden):
+        # Update visibility of effects S-expression
+        effects = re.sub(r'\s*\(hide(?:\s+\w+)?\)|\s+hide(?=[\s)])', '', effects)
+        if not hidden:
+            return effects
+        if self.version >= 20231120:
+            return effects[:-1] + ' (hide yes))'
+        return effects[:-1] + ' hide)'
+
+    def render(self, data):
+        # Patch the symbol S-expression (data) with edited name, fields and documentation
+        patches = []
+        gap = self._property_gap.decode('utf-8')
+        insert_at = max([source.end for key, source in self._sources] + [self._name_span[1]])
+
+        # Source effects are needed to create new properties and toggle visibility
+        for key, source in self._sources:
+            if source.effects is None and source.effects_span:
+                source.effects = data[source.effects_span[0]:source.effects_span[1]].decode('utf-8')
+
+        if self.name != self._original_name:
+            patches.append((self._name_span[0], self._name_span[1], quote(self.name)))
+            for unit_start, unit_end, unit_name, unit_data_start, unit_data_end in self._units:
+                if unit_name.startswith(self._original_name + '_'):
+                    patches.append((unit_start, unit_end, quote(self.name + unit_name[len(self._original_name):])))
+
+        field_ids = set(id(field) for field in self.fields)
+        sources = set()
+        for key, source in self._sources:
+            if type(key) is str:
+                # Documentation
+                sources.add(key)
+                value = self.documentation[key]
+                if value == source.original:
+                    continue
+                if value is None:
+                    patches.append((source.gap_start, source.end, ''))
+                else:
+                    patches.append((source.value_start, source.value_end, quote(value)))
+                continue
+
+            sources.add(id(key))
+            if id(key) not in field_ids:
+                # Field was deleted
+                patches.append((source.gap_start, source.end, ''))
+                continue
+
+            value_key = 'reference' if 'reference' in source.original else 'name'
+            if key[value_key] != source.original[value_key]:
+                value = key[value_key]
+                if not value.startswith('"'):
+                    value = '"' + value + '"'
+                patches.append((source.value_start, source.value_end, value))
+            if key.get('fieldname', '') != source.original.get('fieldname', ''):
+                patches.append((source.name_start, source.name_end, key['fieldname']))
+            if source.at_span and (key['posx'] != source.original['posx'] or key['posy'] != source.original['posy']):
+                patches.append((source.at_span[0], source.at_span[1], '(at {x} {y} {angle})'.format(x=milToMm(key['posx']), y=milToMm(key['posy']), angle=source.at[2])))
+            if key['visibility'] != source.original['visibility']:
+                if source.hide_span:
+                    patches.append((source.hide_span[0], source.hide_span[1], '(hide yes)' if key['visibility'] == 'I' else '(hide no)'))
+                elif source.effects_span:
+                    patches.append((source.effects_span[0], source.effects_span[1], self.setHidden(source.effects, key['visibility'] == 'I')))
+
+        # New fields and documentation
+        new_properties = []
+        for index, field in enumerate(self.fields):
+            if id(field) in sources:
+                continue
+            if index < 3:
+                name = quote(self._FIELD_PROPERTIES[index])
+                value = field['reference'] if index == 0 else field['name']
+            else:
+                name = field['fieldname']
+                value = field['name']
+            if not value.startswith('"'):
+                value = '"' + value + '"'
+            new_properties.append(self.propertyExpression(name, value, field, field['visibility'] == 'I'))
+
+        for key, value in self.documentation.items():
+            if value is not None and key not in sources:
+                name = [name for name, doc_key in self._DOC_PROPERTIES.items() if doc_key == key]
+                if key == 'description' and self.version >= 20231120:
+                    name = 'Description'
+                else:
+                    name = name[0]
+                new_properties.append(self.propertyExpression(quote(name), quote(value), None, key != 'datasheet'))
+
+        if new_properties:
+            patches.append((insert_at, insert_at, ''.join(gap + expression for expression in new_properties)))
+
+        # Apply patches from the end of the S-expression
+        output = data
+        for start, end, text in sorted(patches, key=lambda patch: (patch[0], patch[1]), reverse=True):
+            output = output[:start] + text.encode('utf-8') + output[end:]
+        return output
+
+    def isPowerSymbol(self):
+        return self._power
+
+    def isNonBOMSymbol(self):
+        return self.definition['reference'].startswith('#')
+
+    @property
+    def pins(self):
+        # Pins are read from the symbol S-expression on first access (drawings are not kept in memory)
+        if self._pins is None:
+            with open(self.filename, 'rb') as f:
+                data = self.read(f)
+            self._pins = []
+            for unit_start, unit_end, unit_name, unit_data_start, unit_data_end in self._units:
+                # Unit and body style are given by the unit name suffix (NAME_unit_convert)
+                suffix = unit_name.rsplit('_', 2)[1:] if unit_name.count('_') >= 2 else ['0', '1']
+                for pin_start, pin_end in iterChildren(data, unit_data_start + 1, unit_data_end - 1):
+                    pin = _PIN_AT.match(data, pin_start, pin_end)
+                    if not pin:
+                        continue
+                    name = _PIN_NAME.search(data, pin_start, pin_end)
+                    number = _PIN_NUMBER.search(data, pin_start, pin_end)
+                    self._pins.append({
+                        'name': unquote(name.group(1).decode('utf-8')) if name else '',
+                        'num': unquote(number.group(1).decode('utf-8')) if number else '',
+                        'posx': mmToMilExact(pin.group(2).decode('utf-8')),
+                        'posy': mmToMilExact(pin.group(3).decode('utf-8')),
+                        'unit': suffix[0],
+                        'convert': suffix[1],
+                        'electrical_type': pin.group(1).decode('utf-8'),
+                    })
+        return self._pins
+
+    def read(self, source_file):
+        source_file.seek(self.start)
+        return source_file.read(self.end - self.start)
+
+
+class SymLib(object):
+    """
+    A class to parse KiCad 6+ symbol libraries (.kicad_sym)
+    Symbols are streamed one at a time from the memory-mapped file, unchanged symbols are saved verbatim
+    """
+    _DEFAULT_HEADER = b'(kicad_symbol_lib (version 20211014) (generator kicad_library_manager)'
+    _DEFAULT_GAP = b'\n  '
+
+    def __init__(self, filename, create=False):
+        self.filename = filename
+        self.header = None
+        self.trailer = b'\n)\n'
+        self.components = []
+        self.validFile = False
+        self.version = 0
+
+        if create:
+            if os.path.lexists(self.filename):
+                sys.stderr.write("File already exists!\n")
+            else:
+                self.validFile = True
+                self.header = self._DEFAULT_HEADER
+                self.version = 20211014
+        else:
+            if not os.path.isfile(self.filename):
+                sys.stderr.write("Library file '{filename}' does not exist\n".format(filename=self.filename))
+            else:
+                self.__parse()
+
+    def __parse(self):
+        with open(self.filename, 'rb') as f:
+            try:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # Empty file
+                data = b''
+
+            try:
+                if headAtom(data, data.find(b'(')) != 'kicad_symbol_lib':
+                    sys.stderr.write("'{fn}' is not a KiCad Symbol Library File\n".format(fn=self.filename))
+                    return False
+
+                header_end = data.find(b'kicad_symbol_lib') + len('kicad_symbol_lib')
+                previous_end = None
+                for start, end, children in iterTopLevel(data):
+                    head = headAtom(data, start)
+                    if head != 'symbol':
+                        if head == 'version':
+                            self.version = int(parseExpression(data, start, end)[2][1][0])
+                        if previous_end is None:
+                            header_end = end
+                        continue
+
+                    component = SymComponent(data, start, end, children, self.filename, self.version)
+                    component.gap = data[header_end if previous_end is None else previous_end:start]
+                    if previous_end is None:
+                        self.header = data[:header_end]
+                    self.components.append(component)
+                    previous_end = end
+
+                if previous_end is None:
+                    self.header = data[:header_end]
+                    previous_end = header_end
+                self.trailer = data[previous_end:]
+                self.validFile = True
+            finally:
+                if type(data) is mmap.mmap:
+                    data.close()
+
+        return True
+
+    def getComponentByName(self, name):
+        for component in self.components:
+            if component.definition['name'] == name:
+                return component
+
+        return None
+
+    def removeComponent(self, name):
+        component = self.getComponentByName(name)
+        self.components.remove(component)
+        return component
+
+    def addComponent(self, component):
+        if not component in self.components:
+            if not isinstance(component, SymComponent):
+                raise TypeError('Only KiCad 6+ symbols can be added to {filename}'.format(filename=self.filename))
+            component.gap = self._DEFAULT_GAP
+            component.version = self.version
+            self.components.append(component)
+
+    def save(self, filename=None):
+        if not self.validFile: return False
+
+        if not filename: filename = self.filename
+
+        # Library is written to a temporary file as unchanged symbols are copied from source file(s)
+        temp_filename = filename + '.tmp'
+        source_files = {}
+        saved = []
+        try:
+            with open(temp_filename, 'wb') as f:
+                f.write(self.header)
+                offset = len(self.header)
+                for component in self.components:
+                    f.write(component.gap)
+                    offset += len(component.gap)
+
+                    if component.filename not in source_files:
+                        source_files[component.filename] = open(component.filename, 'rb')
+                    data = component.read(source_files[component.filename])
+                    if component.isModified():
+                        data = component.render(data)
+                        # Rendered symbols are parsed again once saved
+                        saved.append((component, offset, len(data), data))
+                    else:
+                        saved.append((component, offset, len(data), None))
+                    f.write(data)
+                    offset += len(data)
+
+                f.write(self.trailer)
+        finally:
+            for source_file in source_files.values():
+                source_file.close()
+
+        os.replace(temp_filename, filename)
+
+        # Symbols now refer to the saved file
+        for component, offset, length, data in saved:
+            if data is not None:
+                data = b'(' + data + b')'
+                entry = next(iterTopLevel(data))
+                component.load(data, entry[0], entry[1], entry[2], filename)
+                component.start += offset - 1
+                component.end += offset - 1
+            else:
+                component.start = offset
+                component.end = offset + length
+                component.filename = filename
+
+        return True
+
+
+class SymComponentDigest(object):
+    """
+    A class to store digests of the properties, documentation and drawing of a symbol
+    The symbol source is hashed as a whole, sections are only hashed (and properties unquoted) on request
+    """
+    # Properties mapped to documentation (same mapping as parsed symbols)
+    _DOC_PROPERTIES = SymComponent._DOC_PROPERTIES
+    _FIELD_NAMES = {'ki_fp_filters':'Footprint filters'}
+
+    def __init__(self, data, start, end, children):
+        match = _TOKEN.match(data, start + 1)
+        match = _TOKEN.match(data, match.end())
+        self.name = unquote(match.group(2).decode('utf-8'))
+        self.source = data[start:end]
+        self.digest = hashlib.md5(self.source).hexdigest()
+        # Children spans relative to symbol start
+        self._children = [(child_start - start, child_end - start) for child_start, child_end in children]
+        self._name = match.group(2)[1:-1]
+        self._sections = None
+
+    @property
+    def fields(self):
+        return self.getSections()['fields']
+
+    @property
+    def draw(self):
+        return self.getSections()['draw']
+
+    @property
+    def doc(self):
+        return self.getSections()['doc']
+
+    @property
+    def content(self):
+        return self.getSections()['content']
+
+    def getSections(self):
+        # Section digests are computed on first access (changed, added or removed symbols)
+        if self._sections is None:
+            self._sections = self.__hashSections()
+        return self._sections
+
+    def __hashSections(self):
+        data = self.source
+        sections = {'field_sources': [], 'doc_sources': []}
+        fields = hashlib.md5()
+        draw = hashlib.md5()
+        doc = hashlib.md5()
+        content = hashlib.md5()
+
+        for child_start, child_end in self._children:
+            head = headAtom(data, child_start)
+            if head == 'property':
+                prop = _PROPERTY.match(data, child_start, child_end)
+                if not prop:
+                    continue
+                prop_name = prop.group(1).decode('utf-8')
+                if prop_name.startswith('"'):
+                    prop_name = unquote(prop_name)
+                source = data[child_start:child_end]
+                if prop_name in self._DOC_PROPERTIES:
+                    sections['doc_sources'].append((prop_name, prop.group(2), source))
+                    doc.update(source)
+                else:
+                    sections['field_sources'].append((prop_name, prop.group(2), source))
+                    fields.update(source)
+                    if prop_name != 'Value':
+                        content.update(source)
+            elif head == 'symbol':
+                # Unit names are prefixed with the symbol name, only the suffix is hashed
+                unit = _TOKEN.match(data, child_start + 1)
+                unit = _TOKEN.match(data, unit.end())
+                unit_name = unit.group(2)[1:-1]
+                if unit_name.startswith(self._name):
+                    unit_name = unit_name[len(self._name):]
+                draw.update(data[child_start:unit.start(2)] + unit_name + data[unit.end(2):child_end])
+            else:
+                draw.update(data[child_start:child_end])
+
+        sections['fields'] = fields.hexdigest()
+        sections['draw'] = draw.hexdigest()
+        sections['doc'] = doc.hexdigest()
+        # Sections which do not depend on the symbol name (value property excluded), used to match renamed symbols
+        content.update((sections['draw'] + sections['doc']).encode('utf-8'))
+        sections['content'] = content.hexdigest()
+        return sections
+
+    def getFields(self):
+        # Property name: (value, source)
+        fields = OrderedDict()
+        for name, value, source in self.getSections()['field_sources']:
+            fields[self._FIELD_NAMES.get(name, name)] = (unquote(value.decode('utf-8')), source.decode('utf-8'))
+        return fields
+
+    def getFieldValues(self):
+        # Property name: value (sources are not decoded)
+        values = OrderedDict()
+        for name, value, source in self.getSections()['field_sources']:
+            values[self._FIELD_NAMES.get(name, name)] = unquote(value.decode('utf-8'))
+        return values
+
+    def getDocumentation(self):
+        # Documentation key: (value, source)
+        documentation = OrderedDict()
+        for name, value, source in self.getSections()['doc_sources']:
+            documentation[self._DOC_PROPERTIES[name]] = (unquote(value.decode('utf-8')), source.decode('utf-8'))
+        return documentation
+
+class SymLibDigest(object):
+    """
+    A class to compute symbol digests of KiCad 6+ symbol libraries without loading symbols
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.components = OrderedDict()
+        self.validFile = False
+
+        if not os.path.isfile(self.filename):
+            sys.stderr.write("Library file '{filename}' does not exist\n".format(filename=self.filename))
+        else:
+            self.__parse()
+
+    def __parse(self):
+        with open(self.filename, 'rb') as f:
+            try:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # Empty file
+                data = b''
+
+            try:
+                if headAtom(data, data.find(b'(')) != 'kicad_symbol_lib':
+                    sys.stderr.write("'{fn}' is not a KiCad Symbol Library File\n".format(fn=self.filename))
+                    return False
+
+                for start, end, children in iterTopLevel(data):
+                    if headAtom(data, start) == 'symbol':
+                        component = SymComponentDigest(data, start, end, children)
+                        self.components[component.name] = component
+
+                self.validFile = True
+            finally:
+                if type(data) is mmap.mmap:
+                    data.close()
+
+        return True
@@ -1,9 +1,45 @@
 # -*- coding: utf-8 -*-
 
-import sys, shlex
+import sys, shlex, copy, re
 import os.path
 from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import hashlib
+import gzip, lzma
+
+# Zstandard compression: standard library module (Python 3.14+) or zstandard package
+try:
+    from compression import zstd
+except ImportError:
+    try:
+        import zstandard as zstd
+    except ImportError:
+        zstd = None
+
+# Compressed files are read and written as streams through the compressor (no uncompressed copy)
+COMPRESSIONS = {'.gz': gzip.open, '.xz': lzma.open}
+if zstd:
+    COMPRESSIONS['.zst'] = zstd.open
+
+def splitCompression(filename):
+    # File name without compression extension and compression extension ('' if not compressed)
+    root, extension = os.path.splitext(filename)
+    if extension.lower() in COMPRESSIONS:
+        return root, extension
+    return filename, ''
+
+def openFile(filename, mode='r', newline=None):
+    # Open text file, compressed files are decompressed (or compressed) while read (or written)
+    compression = splitCompression(filename)[1]
+    if compression:
+        return COMPRESSIONS[compression.lower()](filename, mode + 't', newline=newline)
+    return open(filename, mode, newline=newline)
+
+def libToDcmFilename(filename):
+    # Documentation file is compressed as library file (Library.lib.gz -> Library.dcm.gz)
+    dir_path = os.path.dirname(os.path.realpath(filename))
+    filename, compression = splitCompression(os.path.basename(filename))
+    return os.path.join(dir_path, os.path.splitext(filename)[0] + '.dcm' + compression)
 
 class Documentation(object):
     """
@@ -43,21 +79,23 @@ class Documentation(object):
                 self.__parse()
 
     def __parse(self):
-        f = open(self.filename, 'r')
+        f = openFile(self.filename, 'r')
         self.header = [f.readline()]
 
         if self.header and not self.line_keys['header'] in self.header[0]:
             self.header=None
             sys.stderr.write("'{fn}' is not a KiCad Documentation Library File\n".format(fn=self.filename))
+            f.close()
             return False
 
         name = None
-        f.seek(0)
 
-        checksum_data = ''
+        # Lines are joined once (repeated concatenation copies the whole string)
+        checksum_data = []
 
-        for line in f.readlines():
-            checksum_data += line.strip()
+        # Header line is not read again (compressed streams cannot seek back cheaply)
+        for line in self.header + f.readlines():
+            checksum_data.append(line.strip())
             line = line.replace('\n', '')
             if line.startswith(Documentation.line_keys['start']):
                 name = line[5:].strip()
@@ -75,6 +113,7 @@ class Documentation(object):
             #FIXME: we do not handle comments except separators around components
         f.close()
 
+        checksum_data = ''.join(checksum_data)
         try:
             md5 = hashlib.md5(checksum_data.encode('utf-8'))
         except UnicodeDecodeError:
@@ -89,7 +128,7 @@ class Documentation(object):
 
         if not filename: filename = self.filename
 
-        to_write=self.header
+        to_write=list(self.header)
 
         # Ensure that items are written in alphabetical order
         items = sorted(self.components.items(), key = lambda item: item[0])
@@ -104,7 +143,7 @@ class Documentation(object):
         to_write.append("#\n")#again, spacer^^
         to_write.append("#End Doc Library\n")
 
-        f = open(filename, 'w', newline='\n')
+        f = openFile(filename, 'w', newline='\n')
         f.writelines(to_write)
         f.close()
 
@@ -136,33 +175,40 @@ class Component(object):
 
     _KEYS = {'DEF':_DEF_KEYS, 'F0':_F0_KEYS, 'F':_FN_KEYS,
              'A':_ARC_KEYS, 'C':_CIRCLE_KEYS, 'P':_POLY_KEYS, 'S':_RECT_KEYS, 'T':_TEXT_KEYS, 'X':_PIN_KEYS}
-    def __init__(self, data, comments, filename, documentation):
+    def __init__(self, data, comments, filename, documentation=None, draw_raw=False):
         self.comments = comments
         self.fplist = []
         self.aliases = OrderedDict()
         self.lib_filename = filename
-        self.dcm_filename = documentation.filename
+        self.dcm_filename = None
+        self.documentation = {}
+        # DRAW section lines kept unparsed (draw_raw mode), parsed on first access to draw elements
+        self.draw_raw = None
         building_fplist = False
         building_draw = False
         building_fields = False
 
         checksum_data = ''
+        draw_lines = []
 
         self.resetDraw()
+        self._drawOrdered = []
 
         for line in data:
-            checksum_data += line.strip()
-            line = line.replace('\n', '')
-            if '\\"' in line:
-                import re
-                line = re.findall(r'(?:[^\s,"]|"(?:\\.|[^"])*")+', line)
-                #print(line)
-            else:
-                s = shlex.shlex(line)#, posix=True)
-                s.whitespace_split = True
-                s.commenters = ''
-                s.quotes = '"'
-                line = list(s)
+            stripped_line = line.strip()
+            checksum_data += stripped_line
+
+            if building_draw and draw_raw:
+                # Do not tokenize drawing elements
+                if stripped_line == 'ENDDRAW':
+                    building_draw = False
+                    self.draw_raw = ''.join(draw_lines)
+                    self._draw = None
+                elif stripped_line:
+                    draw_lines.append(stripped_line + '\n')
+                continue
+
+            line = self._tokenize(line)
 
             if len(line) == 0:
                 continue
@@ -177,7 +223,7 @@ class Component(object):
 
             elif line[0] == 'ALIAS':
                 for alias in line[1:]:
-                    self.aliases[alias]=self.getDocumentation(documentation,alias)
+                    self.aliases[alias]={}
 
             elif line[0] == '$FPLIST':
                 building_fields = False
@@ -189,8 +235,9 @@ class Component(object):
 
             elif line[0] == 'DRAW':
                 building_draw = True
+                draw_lines = []
                 self.resetDraw()
-                self.drawOrdered=[]#list of draw elements references, needed to preserve line ordering
+                self._drawOrdered=[]#list of draw elements references, needed to preserve line ordering
 
             elif line[0] == 'ENDDRAW':
                 building_draw = False
@@ -200,31 +247,8 @@ class Component(object):
                     self.fplist.append(line[0])
 
                 elif building_draw:
-                    if line[0] == 'A':
-                        self.draw['arcs'].append(dict(zip(self._ARC_KEYS,values)))
-                        self.drawOrdered.append(['A',self.draw['arcs'][-1]])
-                    if line[0] == 'C':
-                        self.draw['circles'].append(dict(zip(self._CIRCLE_KEYS,values)))
-                        self.drawOrdered.append(['C',self.draw['circles'][-1]])
-                    if line[0] == 'P':#mixing X an Y points into 1 list in not handy
-                        n_points = int(line[1])
-                        points = line[5:5+(2*n_points)]
-                        values = line[1:5] + [points]
-                        if len(line) > (5 + len(points)):
-                            values += [line[-1]]
-                        else:
-                            values += ['']
-                        self.draw['polylines'].append(dict(zip(self._POLY_KEYS,values)))
-                        self.drawOrdered.append(['P',self.draw['polylines'][-1]])
-                    if line[0] == 'S':
-                        self.draw['rectangles'].append(dict(zip(self._RECT_KEYS,values)))
-                        self.drawOrdered.append(['S',self.draw['rectangles'][-1]])
-                    if line[0] == 'T':
-                        self.draw['texts'].append(dict(zip(self._TEXT_KEYS,values)))
-                        self.drawOrdered.append(['T',self.draw['texts'][-1]])
-                    if line[0] == 'X':
-                        self.draw['pins'].append(dict(zip(self._PIN_KEYS,values)))
-                        self.drawOrdered.append(['X',self.draw['pins'][-1]])
+                    draw_lines.append(stripped_line + '\n')
+                    self._addDrawElement(line, values)
 
                 elif building_fields:
                     if line[0] == 'F0':
@@ -242,13 +266,150 @@ class Component(object):
             md5 = hashlib.md5(checksum_data)
         self.checksum = md5.hexdigest()
 
+        # content digest of DRAW section (used to share identical draw elements)
+        self.draw_digest = hashlib.md5(''.join(draw_lines).encode('utf-8')).hexdigest()
+
         # define some shortcuts
         self.name = self.definition['name']
         self.reference = self.definition['reference']
-        self.pins = self.draw['pins']
 
         # get documentation
+        if documentation:
+            self.setDocumentation(documentation)
+
+    @staticmethod
+    def _tokenize(line):
+        line = line.replace('\n', '')
+        if '\\"' in line:
+            return re.findall(r'(?:[^\s,"]|"(?:\\.|[^"])*")+', line)
+        else:
+            s = shlex.shlex(line)#, posix=True)
+            s.whitespace_split = True
+            s.commenters = ''
+            s.quotes = '"'
+            return list(s)
+
+    def _addDrawElement(self, line, values):
+        if line[0] == 'A':
+            self._draw['arcs'].append(dict(zip(self._ARC_KEYS,values)))
+            self._drawOrdered.append(['A',self._draw['arcs'][-1]])
+        if line[0] == 'C':
+            self._draw['circles'].append(dict(zip(self._CIRCLE_KEYS,values)))
+            self._drawOrdered.append(['C',self._draw['circles'][-1]])
+        if line[0] == 'P':#mixing X an Y points into 1 list in not handy
+            n_points = int(line[1])
+            points = line[5:5+(2*n_points)]
+            values = line[1:5] + [points]
+            if len(line) > (5 + len(points)):
+                values += [line[-1]]
+            else:
+                values += ['']
+            self._draw['polylines'].append(dict(zip(self._POLY_KEYS,values)))
+            self._drawOrdered.append(['P',self._draw['polylines'][-1]])
+        if line[0] == 'S':
+            self._draw['rectangles'].append(dict(zip(self._RECT_KEYS,values)))
+            self._drawOrdered.append(['S',self._draw['rectangles'][-1]])
+        if line[0] == 'T':
+            self._draw['texts'].append(dict(zip(self._TEXT_KEYS,values)))
+            self._drawOrdered.append(['T',self._draw['texts'][-1]])
+        if line[0] == 'X':
+            self._draw['pins'].append(dict(zip(self._PIN_KEYS,values)))
+            self._drawOrdered.append(['X',self._draw['pins'][-1]])
+
+    def _parseDrawRaw(self):
+        self.resetDraw()
+        self._drawOrdered = []
+        for line in self.draw_raw.splitlines():
+            line = self._tokenize(line)
+            if len(line) == 0:
+                continue
+            values = line[1:]
+            if line[0] in self._DRAW_KEYS:
+                values += ['' for n in range(len(self._DRAW_KEYS[line[0]]) - len(line[1:]))]
+            self._addDrawElement(line, values)
+
+    @property
+    def draw(self):
+        if self._draw is None:
+            self._parseDrawRaw()
+        return self._draw
+
+    @draw.setter
+    def draw(self, draw):
+        self._draw = draw
+
+    @property
+    def drawOrdered(self):
+        if self._draw is None:
+            self._parseDrawRaw()
+        return self._drawOrdered
+
+    @drawOrdered.setter
+    def drawOrdered(self, drawOrdered):
+        self._drawOrdered = drawOrdered
+
+    @property
+    def pins(self):
+        return self.draw['pins']
+
+    def hasRawDraw(self):
+        # DRAW section was not parsed (nor edited) and can be written back as is
+        return self.draw_raw is not None and self._draw is None
+
+    def setDocumentation(self, documentation):
+        # documentation can be joined after the component was parsed
+        self.dcm_filename = documentation.filename
         self.documentation = self.getDocumentation(documentation,self.name)
+        for alias in self.aliases.keys():
+            self.aliases[alias]=self.getDocumentation(documentation,alias)
+
+    def clone(self):
+        # Unparsed DRAW section is shared with the clone (string), parsed draw elements are copied
+        component = copy.copy(self)
+        component.comments = list(self.comments)
+        component.definition = dict(self.definition)
+        component.fields = [dict(field) for field in self.fields]
+        component.fplist = list(self.fplist)
+        component.documentation = OrderedDict(self.documentation)
+        component.aliases = OrderedDict((alias, OrderedDict(doc)) for alias, doc in self.aliases.items())
+        if self._draw is not None:
+            component.copyDraw()
+        return component
+
+    def copyDraw(self):
+        # Replace draw elements with copies (drawOrdered refers to the copied elements)
+        copies = {}
+        draw = {}
+        for key, items in self.draw.items():
+            draw[key] = []
+            for item in items:
+                copies[id(item)] = dict(item)
+                if 'points' in item:
+                    copies[id(item)]['points'] = list(item['points'])
+                draw[key].append(copies[id(item)])
+
+        self.draw = draw
+        self.drawOrdered = [[elem[0], copies[id(elem[1])]] for elem in self.drawOrdered]
+
+    def shareDraw(self, draw_raw):
+        # Use the unparsed DRAW section of an identical component (strings are immutable,
+        # draw elements are parsed for this component only on first access)
+        if self.hasRawDraw():
+            self.draw_raw = draw_raw
+
+    def getDrawSize(self):
+        # Memory used by draw elements (estimated, bytes)
+        if self._draw is None:
+            return sys.getsizeof(self.draw_raw)
+
+        size = sys.getsizeof(self._draw) + sys.getsizeof(self._drawOrdered)
+        for items in self._draw.values():
+            size += sys.getsizeof(items)
+            for item in items:
+                size += sys.getsizeof(item) + sum(sys.getsizeof(value) for value in item.values())
+        for elem in self._drawOrdered:
+            size += sys.getsizeof(elem)
+        return size
 
     def resetDraw(self):
         self.draw = {
@@ -337,45 +498,53 @@ class SchLib(object):
         'header':'EESchema-LIBRARY',
     }
 
-    def __init__(self, filename, create=False):
+    def __init__(self, filename, create=False, draw_raw=False):
         self.filename = filename
         self.header = None
         self.components = []
         self.validFile = False
+        # Keep DRAW sections unparsed (fields-only mode), they are written back verbatim
+        self.draw_raw = draw_raw
+        # Unparsed DRAW sections by digest (draw_raw mode), identical sections are stored once
+        self.draws = {}
 
         self.checksum = ""
 
-        self.documentation = Documentation(self.libToDcmFilename(self.filename), create)
+        # dcm and lib files are read concurrently, documentation is joined to components once both are parsed
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            documentation = executor.submit(Documentation, self.libToDcmFilename(self.filename), create)
 
-        if create:
-            if os.path.lexists(self.filename):
-                sys.stderr.write("File already exists!\n")
-                return
-            else:
-                self.validFile = True
-                self.header=['EESchema-LIBRARY Version 2.3\n','#encoding utf-8\n']
+            if create:
+                if os.path.lexists(self.filename):
+                    sys.stderr.write("File already exists!\n")
+                else:
+                    self.validFile = True
+                    self.header=['EESchema-LIBRARY Version 2.3\n','#encoding utf-8\n']
 
-        else:
-            if not os.path.isfile(self.filename):
-                sys.stderr.write("Library file '{filename}' does not exist\n".format(filename=self.filename))
-                return
             else:
-                self.validFile = True
-                self.__parse()
+                if not os.path.isfile(self.filename):
+                    sys.stderr.write("Library file '{filename}' does not exist\n".format(filename=self.filename))
+                else:
+                    self.validFile = True
+                    self.__parse()
+
+            self.documentation = documentation.result()
+
+        for component in self.components:
+            component.setDocumentation(self.documentation)
 
     def libToDcmFilename(self,filename):
-        dir_path = os.path.dirname(os.path.realpath(filename))
-        filename = os.path.splitext(os.path.basename(filename))
-        return os.path.join(dir_path, filename[0] + '.dcm')
+        return libToDcmFilename(filename)
 
     def __parse(self):
-        f = open(self.filename, 'r')
+        f = openFile(self.filename, 'r')
 
-        checksum_data = ""
+        # Lines are joined once (repeated concatenation copies the whole string)
+        checksum_data = []
 
         self.header = [f.readline()]
 
-        checksum_data += self.header[0]
+        checksum_data.append(self.header[0])
 
         if self.header and not SchLib.line_keys['header'] in self.header[0]:
             sys.stderr.write("'{fn}' is not a KiCad Schematic Library File\n".format(fn=self.filename))
@@ -387,7 +556,7 @@ class SchLib(object):
         comments = []
         for line in f.readlines():
 
-            checksum_data += line.strip()
+            checksum_data.append(line.strip())
 
             if line.startswith('#'):
                 comments.append(line)
@@ -401,11 +570,14 @@ class SchLib(object):
                 component_data.append(line)
                 if line.startswith('ENDDEF'):
                     building_component = False
-                    self.components.append(Component(component_data, comments, self.filename, self.documentation))
+                    component = Component(component_data, comments, self.filename, draw_raw=self.draw_raw)
+                    self.internDraw(component)
+                    self.components.append(component)
                     comments = []
         f.close()
 
         #perform checksum calculation
+        checksum_data = ''.join(checksum_data)
         try:
             md5 = hashlib.md5(checksum_data.encode('utf-8'))
         except UnicodeDecodeError:
@@ -414,6 +586,36 @@ class SchLib(object):
 
         return True
 
+    def internDraw(self, component):
+        # Share unparsed DRAW sections of components having an identical DRAW section
+        # (draw_raw mode only: parsed draw elements are never shared, they can be edited)
+        if not component.hasRawDraw():
+            return
+        if component.draw_digest in self.draws:
+            component.shareDraw(self.draws[component.draw_digest])
+        else:
+            self.draws[component.draw_digest] = component.draw_raw
+
+    def getDrawStats(self):
+        # Number of distinct draw sections and memory saved by sharing them (estimated, bytes)
+        stats = {'components': len(self.components), 'draws': 0, 'shared': 0, 'size': 0, 'saved': 0}
+        draws = set()
+        for component in self.components:
+            # Components without drawing are not counted as shared
+            if not component.draw_raw and (component._draw is None or not any(component._draw.values())):
+                continue
+            draw = id(component.draw_raw) if component._draw is None else id(component._draw)
+            size = component.getDrawSize()
+            if draw in draws:
+                stats['shared'] += 1
+                stats['saved'] += size
+            else:
+                draws.add(draw)
+                stats['draws'] += 1
+                stats['size'] += size
+
+        return stats
+
     def validChecksum(self):
         if len(self.checksum) == 0:
             return False
@@ -474,8 +676,8 @@ class SchLib(object):
 
         self.documentation.save(self.libToDcmFilename(filename))
 
-        # insert the header
-        to_write = self.header
+        # insert the header (copied, the library can be saved more than once)
+        to_write = list(self.header)
 
         # Ensure that the components are sorted by name!
         components = sorted(self.components, key = lambda cmp: cmp.name)
@@ -534,19 +736,23 @@ class SchLib(object):
 
             # DRAW
             to_write.append('DRAW\n')
-            for elem in component.drawOrdered:
-                item=elem[1]
-                keys_list = Component._DRAW_KEYS[elem[0]]# 'A' -> keys of all properties of arc
-                line = elem[0] + ' '# 'arcs' -> 'A'
-                for k in keys_list:
-                    if k == 'points':
-                        for i in item['points']:
-                            line += '{0} '.format(i)
-                    else:
-                        line += item[k] + ' '
+            if component.hasRawDraw():
+                # DRAW section was not parsed
+                to_write.append(component.draw_raw)
+            else:
+                for elem in component.drawOrdered:
+                    item=elem[1]
+                    keys_list = Component._DRAW_KEYS[elem[0]]# 'A' -> keys of all properties of arc
+                    line = elem[0] + ' '# 'arcs' -> 'A'
+                    for k in keys_list:
+                        if k == 'points':
+                            for i in item['points']:
+                                line += '{0} '.format(i)
+                        else:
+                            line += item[k] + ' '
 
-                line = line.rstrip() + '\n'
-                to_write.append(line)
+                    line = line.rstrip() + '\n'
+                    to_write.append(line)
 
             # ENDDRAW
             to_write.append('ENDDRAW\n')
@@ -558,6 +764,166 @@ class SchLib(object):
         to_write.append('#\n')
         to_write.append('#End Library\n')
 
-        f = open(filename, 'w', newline='\n')
+        f = openFile(filename, 'w', newline='\n')
         f.writelines(to_write)
         f.close()
+
+class ComponentDigest(object):
+    """
+    A class to store digests of the fields, documentation and drawing of a component
+    Sections are hashed as text, field and documentation lines are only tokenized on request
+    """
+
+    _FIELD_NAMES = {'F0':'Reference', 'F1':'Value', 'F2':'Footprint', 'F3':'Datasheet'}
+    _DOC_KEYS = {'D':'description', 'K':'keywords', 'F':'datasheet'}
+    _FIELD_VALUE = re.compile(r'F(\d+) +("(?:[^"\\]|\\.)*"|\S+)')
+    _FIELD_NAME = re.compile(r' "((?:[^"\\]|\\.)*)"\s*$')
+
+    def __init__(self, name, field_lines, draw, doc_lines):
+        self.name = name
+        self.field_lines = field_lines
+        self.doc_lines = doc_lines
+        self.fields = hashlib.md5(''.join(field_lines).encode('utf-8')).hexdigest()
+        self.draw = hashlib.md5(draw.encode('utf-8')).hexdigest()
+        self.doc = hashlib.md5(''.join(doc_lines).encode('utf-8')).hexdigest()
+        # Sections which do not depend on the component name (value field excluded), used to match renamed components
+        content = ''.join(line for line in field_lines if not line.startswith('F1 '))
+        self.content = hashlib.md5((content + self.draw + self.doc).encode('utf-8')).hexdigest()
+        self.digest = hashlib.md5((self.fields + self.draw + self.doc).encode('utf-8')).hexdigest()
+
+    def getFields(self):
+        # Field name: (value, line) of fields, aliases and footprint filters
+        fields = OrderedDict()
+        fplist = []
+        building_fplist = False
+        for line in self.field_lines:
+            tokens = Component._tokenize(line)
+            if len(tokens) == 0:
+                continue
+
+            if tokens[0] == '$FPLIST':
+                building_fplist = True
+            elif tokens[0] == '$ENDFPLIST':
+                building_fplist = False
+            elif building_fplist:
+                fplist.append(tokens[0])
+            elif tokens[0] == 'ALIAS':
+                fields['Aliases'] = (' '.join(tokens[1:]), line.strip())
+            elif tokens[0][0] == 'F' and len(tokens) > 1:
+                name = self._FIELD_NAMES.get(tokens[0], tokens[-1].strip('"') if len(tokens) > 9 else tokens[0])
+                fields[name] = (tokens[1][1:-1] if tokens[1].startswith('"') else tokens[1], line.strip())
+
+        if fplist:
+            fields['Footprint filters'] = (' '.join(fplist), ' '.join(fplist))
+
+        return fields
+
+    def getFieldValues(self):
+        # Field name: value of fields and footprint filters (lines are matched, not tokenized)
+        values = OrderedDict()
+        fplist = []
+        building_fplist = False
+        for line in self.field_lines:
+            if line.startswith('$FPLIST'):
+                building_fplist = True
+            elif line.startswith('$ENDFPLIST'):
+                building_fplist = False
+            elif building_fplist:
+                fplist.append(line.strip())
+            else:
+                field = self._FIELD_VALUE.match(line)
+                if not field:
+                    continue
+                key = 'F' + field.group(1)
+                name = self._FIELD_NAMES.get(key)
+                if name is None:
+                    # User field name is the last quoted token
+                    field_name = self._FIELD_NAME.search(line, field.end())
+                    name = field_name.group(1) if field_name else key
+                value = field.group(2)
+                values[name] = value[1:-1] if value.startswith('"') else value
+
+        if fplist:
+            values['Footprint filters'] = ' '.join(fplist)
+
+        return values
+
+    def getDocumentation(self):
+        # Documentation key: (value, line)
+        documentation = OrderedDict()
+        for line in self.doc_lines:
+            key = self._DOC_KEYS.get(line[:1])
+            if key and line[1:2] == ' ':
+                documentation[key] = (line[2:].rstrip('\n'), line.strip())
+        return documentation
+
+class SchLibDigest(object):
+    """
+    A class to compute component digests of Schematic Libraries Files (and documentation files) without parsing components
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.components = OrderedDict()
+        self.validFile = False
+
+        if not os.path.isfile(self.filename):
+            sys.stderr.write("Library file '{filename}' does not exist\n".format(filename=self.filename))
+        else:
+            self.__parse()
+
+    def __parseDocumentation(self):
+        # Component name: documentation lines ($CMP and $ENDCMP lines excluded)
+        documentation = {}
+        dcm_filename = libToDcmFilename(self.filename)
+        if not os.path.isfile(dcm_filename):
+            return documentation
+
+        name = None
+        with openFile(dcm_filename, 'r') as f:
+            for line in f:
+                if line.startswith('$CMP '):
+                    name = line[5:].strip()
+                    documentation[name] = []
+                elif line.startswith('$ENDCMP'):
+                    name = None
+                elif name is not None:
+                    documentation[name].append(line)
+
+        return documentation
+
+    def __parse(self):
+        with openFile(self.filename, 'r') as f:
+            data = f.read()
+
+        if not data.startswith(SchLib.line_keys['header']):
+            sys.stderr.write("'{fn}' is not a KiCad Schematic Library File\n".format(fn=self.filename))
+            return False
+
+        documentation = self.__parseDocumentation()
+
+        # Components are sliced from DEF to ENDDEF, lines are not tokenized
+        position = 0
+        while True:
+            start = data.find('\nDEF ', position)
+            if start < 0:
+                break
+            end = data.find('\nENDDEF', start)
+            if end < 0:
+                break
+            position = end + 1
+
+            definition_end = data.find('\n', start + 1)
+            definition = data[start + 1:definition_end].split(' ', 2)
+            draw_start = data.find('\nDRAW\n', definition_end, end + 1)
+            if draw_start < 0:
+                draw_start = end
+
+            # DEF line (without name) and DRAW section define the graphics
+            name = definition[1]
+            draw = (definition[2] if len(definition) > 2 else '') + data[draw_start + 1:end + 1]
+            field_lines = data[definition_end + 1:draw_start + 1].splitlines(True)
+            self.components[name] = ComponentDigest(name, field_lines, draw, documentation.get(name, []))
+
+        self.validFile = True
+        return True
@@ -1,12 +1,26 @@
 #!/usr/bin/env python
-import sys, os, json, argparse, copy
+import sys
+import os
+import io
+import json
+import argparse
+import re
+import bisect
+import hashlib
+import time
+import fnmatch
+import threading
+import atexit
+import collections
+import collections.abc
 import csv as csv_tool
-import builtins
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 
 # Import KiCad schematic library utils
 FILE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(FILE_DIR + '/kicad-library-utils')
-from schlib.schlib import SchLib
+from schlib.schlib import SchLib, SchLibDigest, openFile, splitCompression
+from schlib.kicad_sym import SymLib, SymLibDigest
 
 ### VERSION
 __version_info__ = ('0', '1', '0')
@@ -25,15 +39,64 @@ ADD_ENABLE = True
 DELETE_ENABLE = True
 # Export empty fields to CSV if set to True
 EMPTY_EXPORT = False
+# Keep symbol drawings (DRAW section) unparsed if set to True
+LIB_DRAW_RAW = True
 
 ### GLOBAL SETTINGS
-# Library (.lib) and CSV files folders
+# Library (.lib, .kicad_sym) and CSV files folders
 LIB_FOLDER = None
 CSV_FOLDER = None
+# Supported library file extensions
+LIB_EXTENSIONS = ['.lib', '.kicad_sym']
+# Component file formats (CSV or JSON-lines)
+CSV_EXTENSIONS = ['.csv', '.jsonl']
 
 # New component field offset
 POSY_OFFSET = -100
 
+# Minimum ratio of matching fields for a CSV part to replace (rename) a library part
+RENAME_SIMILARITY = 0.75
+# Minimum number of field values set in both parts (and matching) to rename a library part
+RENAME_MIN_FIELDS = 3
+RENAME_MIN_MATCHES = 2
+
+# Pin grid used by library checks (mils)
+PIN_GRID = 50
+
+# Minimum similarity of footprint names for fuzzy suggestions
+FOOTPRINT_SIMILARITY = 0.6
+# Maximum number of footprint suggestions
+FOOTPRINT_SUGGESTIONS = 3
+
+# Symbol thumbnails: render processes, minimum number of drawings rendered in parallel
+SVG_WORKERS = os.cpu_count() or 1
+SVG_PARALLEL_MIN = 64
+# Symbol thumbnails: line width and margin (mils), scale (pixels per mil) and colors
+SVG_LINE_WIDTH = 6
+SVG_MARGIN = 50
+SVG_SCALE = 0.2
+SVG_COLORS = {'line': '#840000', 'background': '#ffffc2', 'text': '#008484'}
+# CSV column linking parts to their thumbnail (ignored on update)
+THUMBNAIL_COLUMN = 'thumbnail_svg'
+
+# Duplicate report: minimum similarity of near-duplicates (shared fields, documentation and drawing)
+DEDUPE_SIMILARITY = 0.75
+# Duplicate report: MinHash signature bands and rows per band (at most 32 hashes)
+DEDUPE_BANDS = 8
+DEDUPE_ROWS = 4
+# Duplicate report: members of larger buckets are only compared to their neighbors (sorted by signature)
+DEDUPE_BUCKET_SIZE = 32
+# Duplicate report: read processes, minimum number of libraries read in parallel
+DEDUPE_WORKERS = os.cpu_count() or 1
+DEDUPE_PARALLEL_MIN = 8
+
+# Above this number of changes per library, per-change output is replaced by aggregated counts
+CHANGE_OUTPUT_LIMIT = 1000
+
+# Batch mode: maximum number of loaded libraries and total size of their files (MB)
+BATCH_CACHE_SIZE = 64
+BATCH_CACHE_MEMORY = 512
+
 # Define mapping between symbol template and library component
 symbol_to_component_mapping = {
 	# 'name':'SYMBOL_NAME',
@@ -45,36 +108,372 @@ symbol_to_component_mapping = {
 	'SYMBOL_DATASHEET':'datasheet_doc',
 }
 
-# Overload print function for pretty-print of dictionaries
-def print(*args, **kwargs):
-	# Check if silent is set
-	try:
-		silent = kwargs.pop('silent')
-	except:
-		silent = False
-	if not silent:
-		if type(args[0]) is dict:
-			return builtins.print(json.dumps(*args, **kwargs, indent = 4, sort_keys = True))
+### LOGGER CLASS
+class Logger(object):
+	# Output levels, messages above the current level are dropped
+	LEVELS = ['error', 'warn', 'info', 'debug']
+
+	def __init__(self, level = 'info', buffer_size = 1 << 16):
+		self.level = self.LEVELS.index(level)
+		# Output is buffered and written in blocks
+		self.buffer = []
+		self.buffer_length = 0
+		self.buffer_size = buffer_size
+		# Per-change output and aggregated change counts (current library)
+		self.change_output = True
+		self.change_counts = {}
+		# JSON-lines change log file
+		self.change_log = None
+		atexit.register(self.Close)
+
+	def SetLevel(self, level):
+		self.level = self.LEVELS.index(level)
+
+	def Write(self, text, end = '\n', level = None):
+		if level is None:
+			# Infer level from message tag
+			head = text[:9]
+			if '[ERROR]' in head:
+				level = 0
+			elif '[WARN]' in head:
+				level = 1
+			else:
+				level = 2
+		if level > self.level:
+			return
+
+		self.buffer.append(text)
+		self.buffer.append(end)
+		self.buffer_length += len(text) + len(end)
+
+		# Errors are written right away
+		if level == 0 or self.buffer_length >= self.buffer_size:
+			self.Flush()
+
+	def Flush(self):
+		if self.buffer:
+			sys.stdout.write(''.join(self.buffer))
+			self.buffer = []
+			self.buffer_length = 0
+		sys.stdout.flush()
+
+	def OpenChangeLog(self, change_log_file):
+		self.change_log = open(change_log_file, 'a')
+
+	def BeginChanges(self, change_count):
+		# Large updates only report aggregated counts (unless debug level is set)
+		self.change_counts = {}
+		self.change_output = self.level >= 3 or (self.level >= 2 and change_count <= CHANGE_OUTPUT_LIMIT)
+
+	def Change(self, library, component, action, field = None, old_value = None, new_value = None):
+		# Count change and record it in change log
+		# Return True if the change should be displayed
+		self.change_counts[action] = self.change_counts.get(action, 0) + 1
+		if self.change_log:
+			self.change_log.write(json.dumps({
+				'library': library,
+				'component': component,
+				'action': action,
+				'field': field,
+				'old': old_value,
+				'new': new_value,
+			}) + '\n')
+
+		return self.change_output
+
+	def PrintChangeSummary(self, silent = False):
+		if self.change_output or not self.change_counts or silent:
+			return
+		summary = ', '.join(f'{action}: {count}' for action, count in sorted(self.change_counts.items()))
+		self.Write(f'[INFO]\tChanges ({summary})')
+
+	def Close(self):
+		self.Flush()
+		if self.change_log:
+			self.change_log.close()
+			self.change_log = None
+
+LOGGER = Logger()
+
+# Overload print function for buffered output and pretty-print of dictionaries
+def print(*args, sep = ' ', end = '\n', silent = False, level = None):
+	if silent:
+		return
+	if args and type(args[0]) is dict:
+		text = json.dumps(args[0], indent = 4, sort_keys = True)
+	else:
+		text = sep.join(str(arg) for arg in args)
+	LOGGER.Write(text, end = end, level = level)
+
+### FIELD SCHEMA CLASS
+class FieldSchema(object):
+
+	def __init__(self):
+		# Interned column names (CSV/parse keys) by slot index
+		self.columns = []
+		# Column name -> slot index
+		self.slots = {}
+		# Memoized translations: raw KiCad field name -> column name
+		self.clean_table = {}
+		# Memoized translations: column name -> KiCad field name
+		self.restore_table = {}
+		# Lock for slot assignment
+		self.lock = threading.Lock()
+
+	def __len__(self):
+		return len(self.columns)
+
+	def Slot(self, column):
+		try:
+			return self.slots[column]
+		except KeyError:
+			pass
+
+		# Assign slot to new column (library and CSV files can be parsed concurrently)
+		with self.lock:
+			if column not in self.slots:
+				column = sys.intern(column)
+				self.columns.append(column)
+				self.slots[column] = len(self.columns) - 1
+			return self.slots[column]
+
+	def Column(self, column):
+		# Return interned column name
+		return self.columns[self.Slot(column)]
+
+	def CleanFieldname(self, fieldname):
+		try:
+			return self.clean_table[fieldname]
+		except KeyError:
+			column = fieldname.lower().replace('"','').replace(' ','_').replace('(','').replace(')','')
+			column = self.clean_table[sys.intern(fieldname)] = self.Column(column)
+			return column
+
+	def RestoreFieldname(self, column):
+		try:
+			return self.restore_table[column]
+		except KeyError:
+			pass
+
+		# Build field name
+		new_field_name = []
+		fieldname_restored = ''
+		# Split user field name
+		if '_' in column:
+			new_field_name = column.split('_')
+		elif ' ' in column:
+			new_field_name = column.split(' ')
 		else:
-			return builtins.print(*args, **kwargs)
+			new_field_name.append(column)
+
+		for index, word in enumerate(new_field_name):
+			if word != '':
+				# Capitalize first letter of each word
+				new_field_name[index] = word[0].upper() +  word[1:]
+				# Add whitespace
+				if (index + 1) < len(new_field_name):
+					new_field_name[index] += ' '
+
+		for word in new_field_name:
+			fieldname_restored += word
+
+		self.restore_table[column] = sys.intern(fieldname_restored)
+		return self.restore_table[column]
+
+# Field schema shared by all libraries processed in this run
+FIELD_SCHEMA = FieldSchema()
+
+### PART TABLE CLASS
+class PartTable(object):
+
+	def __init__(self, schema = None):
+		# Field schema (column names are interned)
+		self.schema = schema if schema else FIELD_SCHEMA
+		# Column names and column name -> column index
+		self.keys = []
+		self.key_index = {}
+		# Values of each column by row, None if field is not set on part
+		# (columns only grow up to the last part which sets them)
+		self.columns = []
+		# Field order of each part: tuples of column indexes, shared by parts with the same fields
+		self.layouts = []
+		self.layout_cache = {}
+		# Part name -> row indexes
+		self.names = {}
+
+	def __len__(self):
+		return len(self.layouts)
+
+	def __iter__(self):
+		return (PartRow(self, row) for row in range(len(self.layouts)))
+
+	def __getitem__(self, row):
+		if row < 0:
+			row += len(self.layouts)
+		if not 0 <= row < len(self.layouts):
+			raise IndexError('part table index out of range')
+		return PartRow(self, row)
+
+	def __repr__(self):
+		return repr(list(self))
+
+	def AddColumn(self, key):
+		try:
+			return self.key_index[key]
+		except KeyError:
+			pass
+
+		key = self.schema.Column(key)
+		self.keys.append(key)
+		self.columns.append([])
+		self.key_index[key] = len(self.keys) - 1
+		return self.key_index[key]
+
+	def GetLayout(self, layout):
+		return self.layout_cache.setdefault(layout, layout)
+
+	def AddRow(self, layout, values):
+		# Values are given in layout order
+		row = len(self.layouts)
+		columns = self.columns
+		for index, value in zip(layout, values):
+			column = columns[index]
+			if len(column) < row:
+				column.extend([None] * (row - len(column)))
+			column.append(value)
+		self.layouts.append(self.GetLayout(layout))
+
+		name = self.GetValue(row, self.key_index.get('name', -1))
+		if name is not None:
+			self.names.setdefault(name, []).append(row)
+
+	def append(self, part):
+		self.AddRow(tuple(map(self.AddColumn, part)), part.values())
+
+	def GetValue(self, row, index):
+		if index < 0:
+			return None
+		column = self.columns[index]
+		return column[row] if row < len(column) else None
+
+	def SetValue(self, row, key, value):
+		index = self.AddColumn(key)
+		column = self.columns[index]
+		if len(column) <= row:
+			column.extend([None] * (row + 1 - len(column)))
+
+		old_value = column[row]
+		if old_value is None:
+			# New field is added after other fields
+			self.layouts[row] = self.GetLayout(self.layouts[row] + (index,))
+		column[row] = value
+
+		if key == 'name':
+			if old_value is not None:
+				self.names[old_value].remove(row)
+			self.names.setdefault(value, []).append(row)
+
+	def DeleteValue(self, row, key):
+		index = self.key_index[key]
+		if key == 'name':
+			self.names[self.columns[index][row]].remove(row)
+		self.columns[index][row] = None
+		self.layouts[row] = self.GetLayout(tuple(column for column in self.layouts[row] if column != index))
+
+	def Pad(self):
+		# Extend all columns to the number of rows (values can then be read without bound checks)
+		for column in self.columns:
+			if len(column) < len(self.layouts):
+				column.extend([None] * (len(self.layouts) - len(column)))
+
+	def Column(self, key):
+		# Values of column (None if not set), padded to the number of rows
+		try:
+			column = self.columns[self.key_index[key]]
+		except KeyError:
+			return [None] * len(self.layouts)
+		return column + [None] * (len(self.layouts) - len(column))
+
+	def GetRows(self, name):
+		return self.names.get(name, [])
+
+	def Keys(self):
+		# Column names set on any part, in order of first appearance
+		keys = {}
+		layouts = set()
+		for layout in self.layouts:
+			# Layouts are shared, each one is read once
+			if id(layout) not in layouts:
+				layouts.add(id(layout))
+				for index in layout:
+					keys.setdefault(self.keys[index], None)
+		return list(keys)
+
+class PartRow(collections.abc.MutableMapping):
+	# Part of a PartTable (dict-like view on table columns)
+
+	__slots__ = ('table', 'row')
+
+	def __init__(self, table, row):
+		self.table = table
+		self.row = row
+
+	def __getitem__(self, key):
+		value = self.table.GetValue(self.row, self.table.key_index.get(key, -1))
+		if value is None:
+			raise KeyError(key)
+		return value
+
+	def __setitem__(self, key, value):
+		self.table.SetValue(self.row, key, value)
+
+	def __delitem__(self, key):
+		if key not in self:
+			raise KeyError(key)
+		self.table.DeleteValue(self.row, key)
+
+	def __contains__(self, key):
+		return self.table.GetValue(self.row, self.table.key_index.get(key, -1)) is not None
+
+	def __iter__(self):
+		keys = self.table.keys
+		return (keys[index] for index in self.table.layouts[self.row])
+
+	def __len__(self):
+		return len(self.table.layouts[self.row])
+
+	def __repr__(self):
+		return repr(dict(self))
+
+	def copy(self):
+		return dict(self)
 
 ### KICAD LIBRARY CLASS
 class KicadLibrary(object):
 
-	def __init__(self, name = None, lib_file = None, csv_file = None, export = False, silent = True):
+	def __init__(self, name = None, lib_file = None, csv_file = None, export = False, silent = True, schema = None):
 		# Version
 		self.version = 'kicad-library-0.1'
+		# Field schema (interned field names and memoized translations)
+		self.schema = schema if schema else FIELD_SCHEMA
 		# Library file name and extension (path NOT included)
 		self.lib_file = lib_file
 		# CSV file name and extension (path NOT included)
 		self.csv_file = csv_file
-		# Parsed list of library components
+		# Parsed library components (PartTable)
 		self.lib_parse = None
-		# Parsed list of csv components
+		# Parsed csv components (PartTable)
 		self.csv_parse = None
 		# Store relationship between parse 'label'
 		# (space => underscores) and actual field name 
 		self.fieldname_lookup_table = {}
+		# Loaded template libraries
+		self.templates = {}
+		# Library is only saved on request if set (batch mode)
+		self.deferred_save = False
+		self.modified = False
+		# Component name -> thumbnail SVG file (linked in CSV export if set)
+		self.thumbnails = None
 
 		# Define library instance name
 		if not name:
@@ -85,27 +484,34 @@ class KicadLibrary(object):
 		else:
 			self.name = name
 
-		# Process library file
-		if self.lib_file:
-			# Load library file from schlib module
-			self.library = self.LoadLibrary()
-			if self.library:
-				# Parse library file
-				print(f'(LIB)\tParsing {self.lib_file} file', end='', silent=silent)
-				self.lib_parse = self.ParseLibrary()
-				print(f' ({len(self.lib_parse)} components)', silent=silent)
-				# print(self.lib_parse, silent=not(DEBUG_DEEP))
-
-		# Process CSV file
-		if self.lib_parse and self.csv_file:
-			# Check if file exists, has a valid format, can be read and contains data
-			csv_check = self.CheckCSV(export)
-			if csv_check:
-				# Parse CSV file
-				print(f'(CSV)\tParsing {self.csv_file} file', end='', silent=silent)
-				self.csv_parse = self.ParseCSV()
-				print(f' ({len(self.csv_parse)} components)', silent=silent)
-			# print(self.csv_parse, silent=not(DEBUG_DEEP))
+		# CSV file is read while library file is loaded
+		with ThreadPoolExecutor(max_workers=1) as executor:
+			if self.csv_file and self.lib_file:
+				csv_read = executor.submit(self.ReadCSV, export)
+
+			# Process library file
+			if self.lib_file:
+				# Load library file from schlib module
+				self.library = self.LoadLibrary()
+				if self.library:
+					# Parse library file
+					print(f'(LIB)\tParsing {self.lib_file} file', end='', silent=silent)
+					self.lib_parse = self.ParseLibrary()
+					print(f' ({len(self.lib_parse)} components)', silent=silent)
+					# print(self.lib_parse, silent=not(DEBUG_DEEP))
+
+			# Process CSV file
+			if self.lib_parse and self.csv_file:
+				# Check if file exists, has a valid format, can be read and contains data
+				csv_db, messages = csv_read.result()
+				for message in messages:
+					print(message)
+				if csv_db is not None:
+					# Parse CSV file
+					print(f'(CSV)\tParsing {self.csv_file} file', end='', silent=silent)
+					self.csv_parse = csv_db
+					print(f' ({len(self.csv_parse)} components)', silent=silent)
+				# print(self.csv_parse, silent=not(DEBUG_DEEP))
 
 	def LoadLibrary(self):
 		# Check if file exists
@@ -114,13 +520,20 @@ class KicadLibrary(object):
 			return None
 
 		# Check if valid library file
-		if not '.lib' in self.lib_file:
+		if SplitExtension(self.lib_file)[1] not in LIB_EXTENSIONS:
 			print(f'[ERROR]\t{self.lib_file} does not have a valid library file format')
 			return None
 
+		# KiCad 6+ symbols are read from their offsets in library file
+		if SplitExtension(self.lib_file)[1] == '.kicad_sym' and splitCompression(self.lib_file)[1]:
+			print(f'[ERROR]\tCompressed KiCad 6+ library {self.lib_file} is not supported')
+			return None
+
+		# schlib module writes to stdout directly
+		LOGGER.Flush()
 		try:
 			# Load library using schlib module
-			library = SchLib(self.lib_file)
+			library = OpenLibrary(self.lib_file)
 		except:
 			library = None
 			print(f'[ERROR]\tCannot read library file {self.lib_file}')
@@ -130,40 +543,55 @@ class KicadLibrary(object):
 
 		return library
 
-	def CheckCSV(self, export = False):
+	def ReadCSV(self, export = False):
+		# Check and parse CSV file in a single read
+		# Messages are returned instead of printed as this runs concurrently with library loading
+		messages = []
+
 		# Check if user requested export
 		if export:
 			# Check if file exists
 			if os.path.exists(self.csv_file):
-				print(f'[WARN]\tFile {self.csv_file} already exists')
+				messages.append(f'[WARN]\tFile {self.csv_file} already exists')
 			else:
 				# File does not exist, prevent parsing
-				return False
+				return None, messages
 		else:
 			# Check if file exists
 			if not os.path.exists(self.csv_file):
-				print(f'[ERROR]\tFile {self.csv_file} does not exist')
-				print(f'\tUse "--export_csv" argument to export CSV file')
-				return False
+				messages.append(f'[ERROR]\tFile {self.csv_file} does not exist')
+				messages.append(f'\tUse "--export_csv" argument to export CSV file')
+				return None, messages
 
 			# Check if valid CSV file
-			if not '.csv' in self.csv_file:
-				print(f'[ERROR]\tFile {self.csv_file} does not have a valid CSV file format')
-				return False
+			if SplitExtension(self.csv_file)[1] not in CSV_EXTENSIONS:
+				messages.append(f'[ERROR]\tFile {self.csv_file} does not have a valid CSV file format')
+				return None, messages
 
-			# Check if file can be read and contains data
-			with open(self.csv_file, 'r') as csvfile:
+		# JSON-lines file: one record per component
+		if SplitExtension(self.csv_file)[1] == '.jsonl':
+			with openFile(self.csv_file, 'r') as jsonfile:
 				try:
-					csv_reader = csv_tool.reader(csvfile)
-					next_line = csv_reader.__next__()
+					return self.ParseRecords(ReadRecords(jsonfile)), messages
+				except ValueError as error:
+					messages.append(f'[ERROR]\tCannot read JSON-lines file {self.csv_file}: {error}')
+					return None, messages
 
-					if len(next_line) == 0:
-						print(f'[WARN]\tCSV file is empty {self.csv_file}')
-				except:
-					print(f'[ERROR]\tCannot read CSV file {self.csv_file}')
-					return False
+		# Check if file can be read and contains data
+		with openFile(self.csv_file, 'r') as csvfile:
+			try:
+				csv_reader = csv_tool.reader(csvfile)
+				header = csv_reader.__next__()
 
-		return True
+				if len(header) == 0:
+					messages.append(f'[WARN]\tCSV file is empty {self.csv_file}')
+			except:
+				messages.append(f'[ERROR]\tCannot read CSV file {self.csv_file}')
+				return None, messages
+
+			csv_db = self.ParseCSVRows(header, csv_reader)
+
+		return csv_db, messages
 
 	def ParseCSV(self, csv_input = None):
 		csv_db = None
@@ -172,67 +600,118 @@ class KicadLibrary(object):
 		if csv_input:
 			self.csv_file = csv_input
 
-		csv_db = []
-		# Parse CSV
-		with open(self.csv_file, 'r') as csvfile:
-			csv_reader = csv_tool.reader(csvfile)
+		# Parse CSV (or JSON-lines records)
+		with openFile(self.csv_file, 'r') as csvfile:
+			if SplitExtension(self.csv_file)[1] == '.jsonl':
+				csv_db = self.ParseRecords(ReadRecords(csvfile))
+			else:
+				csv_reader = csv_tool.reader(csvfile)
+				header = csv_reader.__next__()
+				csv_db = self.ParseCSVRows(header, csv_reader)
 
-			# Process header and mapping
-			header = csv_reader.__next__()
-			mapping = {}
-			for index, item in enumerate(header):
-				mapping[index] = self.CleanFieldname(item)
-				if item not in self.fieldname_lookup_table.keys():
-					self.fieldname_lookup_table[mapping[index]] = '"' + self.RestoreFieldname(mapping[index]) + '"'
-
-			# Process component information
-			for line in csv_reader:
-				csv_parse_line = {}
-				for index, item in enumerate(line):
-					# Check if item has leading single-quote and is only numeric
-					# Single-quote was added to prevent Excel and other tools to treat it as a number
-					try:
-						if item[0] == '\'' and item[1:].isdigit():
-							item = item[1:]
-					except:
-						pass
-					csv_parse_line[mapping[index]] = item
-				# Add to parse
-				csv_db.append(csv_parse_line)
-		
 		if csv_input:
 			self.csv_parse = csv_db
 		else:
 			return csv_db
 
+	def ParseCSVRows(self, header, csv_reader):
+		csv_db = PartTable(self.schema)
+
+		# Thumbnail links are not component fields
+		if THUMBNAIL_COLUMN in header:
+			thumbnail_index = header.index(THUMBNAIL_COLUMN)
+			header = header[:thumbnail_index] + header[thumbnail_index + 1:]
+			csv_reader = (line[:thumbnail_index] + line[thumbnail_index + 1:] for line in csv_reader)
+
+		# Process header and mapping
+		mapping = {}
+		for index, item in enumerate(header):
+			mapping[index] = self.CleanFieldname(item)
+			if item not in self.fieldname_lookup_table.keys():
+				self.fieldname_lookup_table[mapping[index]] = '"' + self.RestoreFieldname(mapping[index]) + '"'
+
+		columns = [csv_db.AddColumn(mapping[index]) for index in range(len(header))]
+		# Layout of rows by length (same header columns for all rows)
+		layouts = {}
+		# Repeated values (footprints, manufacturers, empty fields...) are stored once
+		values_seen = {}
+
+		# Process component information
+		for line in csv_reader:
+			values = []
+			for item in line:
+				# Check if item has leading single-quote and is only numeric
+				# Single-quote was added to prevent Excel and other tools to treat it as a number
+				if item[:1] == '\'' and item[1:].isdigit():
+					item = item[1:]
+				values.append(values_seen.setdefault(item, item))
+
+			if len(line) not in layouts:
+				layout = tuple(columns[:len(line)])
+				# Duplicate header names: last value is kept at first position
+				layouts[len(line)] = layout if len(set(layout)) == len(layout) else None
+			layout = layouts[len(line)]
+
+			# Add to parse
+			if layout:
+				csv_db.AddRow(layout, values)
+			else:
+				csv_db.append({mapping[index]: item for index, item in enumerate(values)})
+
+		return csv_db
+
+	def ParseRecords(self, records):
+		# Parse JSON-lines records (values are not double-quoted, null values are deleted)
+		parse = PartTable(self.schema)
+		for record in records:
+			part = {'name': record['name']}
+			for key, value in (record.get('documentation', None) or {}).items():
+				part[self.schema.Column(key + '_doc')] = self.UnquotedValue(value)
+			for key in ['reference', 'value', 'footprint']:
+				if key in record:
+					part[key] = self.QuotedValue(record[key])
+			for fieldname, value in (record.get('fields', None) or {}).items():
+				key = self.CleanFieldname(fieldname)
+				if key not in self.fieldname_lookup_table:
+					# Field name is kept when it is given instead of the column name
+					self.fieldname_lookup_table[key] = '"' + (fieldname if fieldname != key else self.RestoreFieldname(key)) + '"'
+				part[key] = self.QuotedValue(value)
+			parse.append(part)
+
+		return parse
+
+	def UnquotedValue(self, value):
+		if value is None:
+			return ''
+		return value if isinstance(value, str) else json.dumps(value)
+
+	def QuotedValue(self, value):
+		# KiCad field values are double-quoted, missing values delete the field
+		if value is None:
+			return ''
+		return '"' + self.UnquotedValue(value) + '"'
+
 	def CleanFieldname(self, fieldname):
 		# Return simple fieldname
-		return fieldname.lower().replace('"','').replace(' ','_').replace('(','').replace(')','')
+		return self.schema.CleanFieldname(fieldname)
 
 	def RestoreFieldname(self, fieldname):
-		# Build field name
-		new_field_name = []
-		fieldname_restored = ''
-		# Split user field name
-		if '_' in fieldname:
-			new_field_name = fieldname.split('_')
-		elif ' ' in fieldname:
-			new_field_name = fieldname.split(' ')
-		else:
-			new_field_name.append(fieldname)
-
-		for index, word in enumerate(new_field_name):
-			if word != '':
-				# Capitalize first letter of each word
-				new_field_name[index] = word[0].upper() +  word[1:]
-				# Add whitespace
-				if (index + 1) < len(new_field_name):
-					new_field_name[index] += ' '
-
-		for word in new_field_name:
-			fieldname_restored += word
+		return self.schema.RestoreFieldname(fieldname)
 
-		return fieldname_restored
+	def DisplayFieldname(self, key):
+		# Field name found in library, restored from column name for other fields
+		try:
+			return self.fieldname_lookup_table[key]
+		except KeyError:
+			return '"' + self.RestoreFieldname(key) + '"'
+
+	def SaveLibrary(self):
+		# Saving is postponed when deferred (library is marked as modified)
+		if self.deferred_save:
+			self.modified = True
+		else:
+			self.library.save()
+			self.modified = False
 
 	def ParseComponent(self, component):
 		parse_comp = {}
@@ -249,9 +728,9 @@ class KicadLibrary(object):
 		try:
 			for key, value in component.documentation.items():
 				if value != None:
-					parse_comp[key + '_doc'] = value
+					parse_comp[self.schema.Column(key + '_doc')] = value
 				else:
-					parse_comp[key + '_doc'] = ''
+					parse_comp[self.schema.Column(key + '_doc')] = ''
 		except:
 			print('[ERROR]\tParse: Component documentation not found')
 			return {}
@@ -303,7 +782,7 @@ class KicadLibrary(object):
 		return parse_comp
 
 	def ParseLibrary(self):
-		parse_lib = []
+		parse_lib = PartTable(self.schema)
 		for component in self.library.components:
 			try:
 				parse_lib.append(self.ParseComponent(component))
@@ -312,45 +791,28 @@ class KicadLibrary(object):
 
 		return parse_lib
 
+	def RefreshPart(self, part, component):
+		# Read library part again from component (once component was modified)
+		parse_comp = self.ParseComponent(component)
+		for key in [key for key in part.keys() if key not in parse_comp]:
+			del part[key]
+		for key, value in parse_comp.items():
+			part[key] = value
+
 	def GetComponentIndexByName(self, component_name):
 		lib_index = None
 		csv_index = None
 
 		if self.lib_parse:
-			for index, component in enumerate(self.lib_parse):
-				if component['name'] == component_name:
-					lib_index = index
-					break
+			lib_index = next(iter(self.lib_parse.GetRows(component_name)), None)
 
 		if self.csv_parse:
-			for index, component in enumerate(self.csv_parse):
-				if component['name'] == component_name:
-					csv_index = index
-					break
+			csv_index = next(iter(self.csv_parse.GetRows(component_name)), None)
 
 		# print(f'\n{component_name}\tlib_index, csv_index = {lib_index}, {csv_index}', silent=not(DEBUG_DEEP))
 
 		return lib_index, csv_index
 
-	def GetCommonAndDiffKeys(self, part1, part2):
-		# Find common keys based on first part of each library file
-		common_keys = []
-		diff_keys = []
-		for key1 in part1.keys():
-			for key2 in part2.keys():
-				if key1 == key2:
-					common_keys.append(key1)
-					break
-
-			if key1 not in common_keys:
-				diff_keys.append(key1)
-
-		for key2 in part2.keys():
-			if key2 not in part1.keys():
-				diff_keys.append(key2)
-
-		return common_keys, diff_keys
-
 	def CompareParse(self, silent = False):
 		compare = {}
 
@@ -360,101 +822,80 @@ class KicadLibrary(object):
 			return compare
 		print(f'Processing compare on {max(len(self.csv_parse), len(self.lib_parse))} components... ', end='', silent = silent)
 
-		# Copy lib_parse
-		lib_parse_remaining_components = copy.deepcopy(self.lib_parse)
-		
+		# Library parts by name (parts are matched in library order, inputs are not copied)
+		lib_parts_by_name = {name: list(rows) for name, rows in self.lib_parse.names.items()}
+		lib_parts_matched = set()
+
 		if ADD_ENABLE:
 			compare['part_add'] = []
 		if DELETE_ENABLE:
 			compare['part_delete'] = []
 		compare['part_update'] = {}
+
+		def AddCompare(name, compare_type, key, value):
+			compare['part_update'].setdefault(name, {}).setdefault(compare_type, {})[key] = value
+
+		# Fields are compared by columns: CSV column -> library column (empty fields are not deleted)
+		csv_table, lib_table = self.csv_parse, self.lib_parse
+		csv_table.Pad()
+		lib_table.Pad()
+		# Missing columns (index -1) are read from a column of None values
+		csv_columns = csv_table.columns + [[None] * len(csv_table)]
+		lib_columns = lib_table.columns + [[None] * len(lib_table)]
+		csv_to_lib = [lib_table.key_index.get(key, -1) for key in csv_table.keys]
+		lib_to_csv = [csv_table.key_index.get(key, -1) for key in lib_table.keys]
+		lib_deletable = ['empty' not in key for key in lib_table.keys]
+		csv_addable = ['empty' not in key for key in csv_table.keys]
+		csv_names = csv_table.Column('name')
+
 		# Find parts to delete from lib
-		for csv_part in self.csv_parse:
+		for csv_index, csv_layout in enumerate(csv_table.layouts):
+			csv_name = csv_names[csv_index]
+			if csv_name is None:
+				# Blank line
+				continue
 			match = False
-			for part_index, lib_part in enumerate(lib_parse_remaining_components):
-				# print(f'>> {csv_part["name"]} {lib_part["name"]}')
-				if csv_part['name'] == lib_part['name']:
-					match = True
-					# Get common and diff keys
-					common_keys, diff_keys = self.GetCommonAndDiffKeys(csv_part, lib_part)
-					# print(f'\n\ncommon_keys = {common_keys}\ndiff_keys = {diff_keys}')
-					# Check for field discrepancies
-					for key in common_keys:
-						# field_add = False
-						field_delete = False
-						field_update = False
-
-						if lib_part[key]:
-							# CSV field exists and fields are different
-							if lib_part[key] != csv_part[key] and csv_part[key]:
-								field_update = True
-
-							# Handle case where the CSV sheet does not have double-quotes (intention is to delete field from component)
-							#if lib_part[key] == '""' and not csv_part[key]:
-							if not csv_part[key]:
-								field_delete = True
-
-						if field_update:
-							try:
-								compare['part_update'][csv_part['name']]['field_update'].update({key : csv_part[key]})
-							except:
-								if csv_part['name'] not in compare['part_update'].keys():
-									compare['part_update'][csv_part['name']] = {}
-								compare['part_update'][csv_part['name']].update({'field_update': {key : csv_part[key]}})
-
-						if field_delete:
-							try:
-								compare['part_update'][csv_part['name']]['field_delete'].update({key : lib_part[key]})
-							except:
-								if csv_part['name'] not in compare['part_update'].keys():
-									compare['part_update'][csv_part['name']] = {}
-								compare['part_update'][csv_part['name']].update({'field_delete': {key : lib_part[key]}})
-
-					
-					# REMOVE EMPTY KEYS FROM DIFF (DO NOT DELETE THOSE)
-					diff_keys_updated = []
-					for key in diff_keys:
-						if not 'empty' in key:
-							diff_keys_updated.append(key)
-
-					# Add missing library fields
-					for key in diff_keys_updated:
-						# Check csv field contains new fields and add to compare
-						if key not in lib_part and key in csv_part:
-							if len(csv_part[key]) > 0:
-								# Add to compare
-								try:
-									compare['part_update'][csv_part['name']]['field_add'].update({key : csv_part[key]})
-								except:
-									if csv_part['name'] not in compare['part_update'].keys():
-										compare['part_update'][csv_part['name']] = {}
-									compare['part_update'][csv_part['name']].update({'field_add': {key : csv_part[key]}})
-
-						# Check if field was removed from CSV part
-						if key in lib_part and key not in csv_part:
-							# Add to compare
-							try:
-								compare['part_update'][csv_part['name']]['field_delete'].update({key : lib_part[key]})
-							except:
-								if csv_part['name'] not in compare['part_update'].keys():
-									compare['part_update'][csv_part['name']] = {}
-								compare['part_update'][csv_part['name']].update({'field_delete': {key : lib_part[key]}})
-								
-					break
+			if lib_parts_by_name.get(csv_name, None):
+				part_index = lib_parts_by_name[csv_name].pop(0)
+				match = True
+
+				# Check for field discrepancies (fields not set in library part are None)
+				field_add = []
+				for index in csv_layout:
+					csv_value = csv_columns[index][csv_index]
+					lib_value = lib_columns[csv_to_lib[index]][part_index]
+					if lib_value is None:
+						# Add missing library fields (CSV field contains new fields)
+						if csv_addable[index] and len(csv_value) > 0:
+							field_add.append((csv_table.keys[index], csv_value))
+					elif lib_value:
+						# Handle case where the CSV sheet does not have double-quotes (intention is to delete field from component)
+						if not csv_value:
+							AddCompare(csv_name, 'field_delete', csv_table.keys[index], lib_value)
+						# CSV field exists and fields are different
+						elif lib_value != csv_value:
+							AddCompare(csv_name, 'field_update', csv_table.keys[index], csv_value)
+
+				for key, csv_value in field_add:
+					AddCompare(csv_name, 'field_add', key, csv_value)
+
+				# Check if field was removed from CSV part
+				for index in lib_table.layouts[part_index]:
+					if lib_deletable[index] and csv_columns[lib_to_csv[index]][csv_index] is None:
+						AddCompare(csv_name, 'field_delete', lib_table.keys[index], lib_columns[index][part_index])
 
 			if not match:
 				# Part exists in CSV but not in library
 				if ADD_ENABLE:
-					compare['part_add'].append(csv_part['name'])
-					print(f'\n\n[ DEBUG: PART ADD ]\n{csv_part["name"]} = {csv_part}', silent=True)
+					compare['part_add'].append(csv_name)
+					print(f'\n\n[ DEBUG: PART ADD ]\n{csv_name} = {self.csv_parse[csv_index]}', silent=True)
 			else:
 				# Remove from the compare list (already processed)
-				lib_parse_remaining_components.pop(part_index)
+				lib_parts_matched.add(part_index)
 
 		# Process parts to remove from lib
-		# print(lib_parse_remaining_components, silent=not(DEBUG_DEEP))
-		if len(lib_parse_remaining_components) > 0:
-			for lib_part in lib_parse_remaining_components:
+		for part_index, lib_part in enumerate(self.lib_parse):
+			if part_index not in lib_parts_matched:
 				# Part not found in CSV (to be deleted)
 				if DELETE_ENABLE:
 					compare['part_delete'].append(lib_part['name'])
@@ -471,16 +912,7 @@ class KicadLibrary(object):
 		if ADD_ENABLE and DELETE_ENABLE:
 			compare['part_replace'] = {}
 			if 'part_add' in compare and 'part_delete' in compare:
-				for component_add in compare['part_add']:
-					for component_del in compare['part_delete']:
-						
-						csv_index = self.GetComponentIndexByName(component_add)[1]
-						lib_index = self.GetComponentIndexByName(component_del)[0]
-
-						# Check if index are matching
-						if lib_index == csv_index:
-							# Add to replace dict
-							compare['part_replace'].update({component_add : component_del})
+				compare['part_replace'] = self.MatchRenamedParts(compare['part_add'], compare['part_delete'])
 
 		# Simplify compare report
 		if not compare['part_update']:
@@ -492,11 +924,80 @@ class KicadLibrary(object):
 
 		return compare
 
+	def GetFingerprintKeys(self):
+		# Fields used to match renamed parts (found in both library and CSV, except name)
+		lib_keys = set(self.lib_parse.Keys())
+		csv_keys = set(self.csv_parse.Keys())
+		return sorted(key for key in lib_keys & csv_keys if key != 'name' and 'empty' not in key)
+
+	def GetPartFingerprint(self, part, keys):
+		# Field values of part (empty and double-quoted empty values are equivalent)
+		return tuple('' if part.get(key, '') == '""' else part.get(key, '') for key in keys)
+
+	def MatchRenamedParts(self, part_add, part_delete):
+		# Match CSV parts to add with library parts to delete based on their other fields
+		part_replace = {}
+		keys = self.GetFingerprintKeys()
+		csv_parts = {}
+		for part in self.csv_parse:
+			csv_parts.setdefault(part['name'], part)
+		lib_parts = {}
+		for part in self.lib_parse:
+			lib_parts.setdefault(part['name'], part)
+
+		# Identical fields: hash lookup (parts with too few values are never renamed)
+		lib_fingerprints = {}
+		for component_del in part_delete:
+			fingerprint = self.GetPartFingerprint(lib_parts[component_del], keys)
+			if len(keys) - fingerprint.count('') >= RENAME_MIN_FIELDS:
+				lib_fingerprints.setdefault(fingerprint, []).append(component_del)
+
+		unmatched = []
+		for component_add in part_add:
+			fingerprint = self.GetPartFingerprint(csv_parts[component_add], keys)
+			if len(keys) - fingerprint.count('') < RENAME_MIN_FIELDS:
+				continue
+			candidates = lib_fingerprints.get(fingerprint, None)
+			if candidates:
+				part_replace[component_add] = candidates.pop(0)
+			else:
+				unmatched.append(component_add)
+
+		if not unmatched:
+			return part_replace
+
+		# Similar fields: library parts sharing field values are scored
+		matched = set(part_replace.values())
+		lib_values = {}
+		lib_value_count = {}
+		for component_del in part_delete:
+			if component_del not in matched:
+				fingerprint = self.GetPartFingerprint(lib_parts[component_del], keys)
+				lib_value_count[component_del] = len(keys) - fingerprint.count('')
+				if lib_value_count[component_del] < RENAME_MIN_FIELDS:
+					continue
+				for item in zip(keys, fingerprint):
+					if item[1]:
+						lib_values.setdefault(item, []).append(component_del)
+
+		for component_add in unmatched:
+			fingerprint = self.GetPartFingerprint(csv_parts[component_add], keys)
+			scores = collections.Counter()
+			for item in zip(keys, fingerprint):
+				if item[1]:
+					scores.update(component_del for component_del in lib_values.get(item, []) if component_del not in matched)
+
+			for component_del, score in scores.most_common(1):
+				# Ratio of matching values to values set in the part with most values
+				similarity = score / max(len(keys) - fingerprint.count(''), lib_value_count[component_del])
+				if score >= RENAME_MIN_MATCHES and similarity >= RENAME_SIMILARITY:
+					part_replace[component_add] = component_del
+					matched.add(component_del)
+
+		return part_replace
+
 	def UpdateCompare(self):
-		# Save library
-		self.library.save()
-		# Update library parse
-		self.library = self.LoadLibrary()
+		# Update library parse (library is saved once update is complete)
 		self.lib_parse = self.ParseLibrary()
 		# Re-run compare
 		return self.CompareParse(silent = True)
@@ -519,11 +1020,13 @@ class KicadLibrary(object):
 				# Update library file
 				print('Differences found\n[2]\tUpdating library file\n---', silent=silent)
 
+			LOGGER.BeginChanges(self.GetChangeCount(compare))
+
 		# Replace parts
 		if 'part_replace' in compare:
 			for part_add, part_del in compare['part_replace'].items():
-				# Copy old component information
-				component = copy.deepcopy(self.library.getComponentByName(part_del))
+				# Copy old component information (drawing is shared)
+				component = self.library.getComponentByName(part_del).clone()
 				# Update component with new information
 				component.name = part_add
 				component.definition['name'] = part_add
@@ -534,20 +1037,16 @@ class KicadLibrary(object):
 				# Delete old component
 				remove = self.library.removeComponent(part_del)
 
-				for index, part in enumerate(compare['part_add']):
-					if part == part_add:
-						compare['part_add'].pop(index)
-
-				for index, part in enumerate(compare['part_delete']):
-					if part == part_del:
-						compare['part_delete'].pop(index)
-
-				print(f'\n[INFO]\tLibrary component "{part_del}" was replaced with CSV component "{part_add}" (matching indexes)')
+				self.LogChange(part_add, 'component_replace', 'name', part_del, part_add, '\n[INFO]\tLibrary component "{old}" was replaced with CSV component "{new}" (matching fields)')
 		
 				# Update flags
 				global_update = True
 				local_update = True
 
+			compare['part_add'] = [part for part in compare['part_add'] if part not in compare['part_replace']]
+			replaced = set(compare['part_replace'].values())
+			compare['part_delete'] = [part for part in compare['part_delete'] if part not in replaced]
+
 		# If any part was replaced: re-parse library and compare again
 		if local_update and LIB_SAVE:
 			# Reset update flag
@@ -590,7 +1089,8 @@ class KicadLibrary(object):
 		if 'part_update' in compare:
 			count = 0
 			for component_name in compare['part_update'].keys():
-				print(f'\n[ U{count} :\t{component_name} ]')
+				if LOGGER.change_output:
+					print(f'\n[ U{count} :\t{component_name} ]')
 				self.UpdateComponentInLibrary(component_name, compare['part_update'][component_name])
 				count += 1
 				# Update flags
@@ -600,45 +1100,52 @@ class KicadLibrary(object):
 		# 	print('[ERROR]\tCould not update library part')
 		# 	pass
 
-		# Save library if any field were updated
-		if local_update and LIB_SAVE:
-			self.library.save()
-		
+		# Save library if any component or field were updated
+		if global_update and LIB_SAVE:
+			self.SaveLibrary()
+
+		LOGGER.PrintChangeSummary(silent = silent)
+
 		if global_update:
 			if LIB_SAVE:
 				print('\n---\nUpdate complete', silent=silent)
 		else:
 			print('\tUpdate aborted', silent=silent)
 
+		return global_update
+
 	def AddComponentToLibrary(self, component_name, template):
 		if not template:
 			print(f'[ERROR]\tComponent {component_name} could not be added: missing template file')
 			return
 
-		print(f'[INFO]\tAdding {component_name} to library using {template} file')
+		self.LogChange(component_name, 'component_add', None, None, None, '[INFO]\tAdding {component} to library using {template} file', template = template)
 
 		# Get component data from CSV
 		component_index = self.GetComponentIndexByName(component_name)[1]
 		component_data = self.csv_parse[component_index]
 
 		# Get template symbol data
-		try:
-			# Load library using schlib module
-			template_library = SchLib(template)
-		except:
-			template_library = None
-			print(f'[ERROR]\tCannot read template library file {template}')
+		template_library = self.LoadTemplate(template)
+		if not template_library:
+			return
+
+		# Symbols cannot be converted between legacy and KiCad 6+ formats
+		if type(template_library) is not type(self.library):
+			print(f'[ERROR]\tComponent {component_name} could not be added: template format ({SplitExtension(template)[1]}) '
+				  f'does not match library format ({SplitExtension(self.lib_file)[1]})')
 			return
 
 		if len(template_library.components) > 1:
 			print(f'[ERROR]\tMore than one component template in file {template}')
 			return
 		
-		symbol_template = copy.deepcopy(template_library.components[0])
+		symbol_template = template_library.components[0].clone()
 
 		symbol_template.name = component_data['name']
 		symbol_template.definition['name'] = component_data['name']
-		symbol_template.comments[1] = symbol_template.comments[1].replace('SYMBOL_COMMENT',symbol_template.name)
+		if len(symbol_template.comments) == 3:
+			symbol_template.comments[1] = symbol_template.comments[1].replace('SYMBOL_COMMENT',symbol_template.name)
 
 		# Scroll through fields
 		symbol_keys = ['name', 'reference']
@@ -657,137 +1164,159 @@ class KicadLibrary(object):
 
 		self.library.addComponent(symbol_template)
 
+	def LoadTemplate(self, template):
+		# Template library is loaded once, components are cloned from it
+		if template not in self.templates:
+			LOGGER.Flush()
+			try:
+				# Load library using schlib module
+				self.templates[template] = OpenLibrary(template)
+			except:
+				self.templates[template] = None
+				print(f'[ERROR]\tCannot read template library file {template}')
+
+		return self.templates[template]
+
 	def RemoveComponentFromLibrary(self, component_name):
 		if LIB_SAVE:
 			self.library.removeComponent(component_name)
-			print('[INFO]\tComponent', component_name, 'was removed from library')
+			self.LogChange(component_name, 'component_delete', None, None, None, '[INFO]\tComponent {component} was removed from library')
 		else:
 			print('[ERROR]\tComponent could not be removed (protected)')
 
+	def LogChange(self, component_name, action, key, old_value, new_value, message, **kwargs):
+		# Record change, message is only formatted when per-change output is enabled
+		if LOGGER.Change(self.name, component_name, action, key, old_value, new_value):
+			name = self.DisplayFieldname(key) if key is not None else None
+			print(message.format(component = component_name, name = name, key = key, old = old_value, new = new_value, **kwargs))
+
+	def GetChangeCount(self, compare):
+		# Count component and field changes of compare report
+		count = 0
+		for section in ['part_add', 'part_delete', 'part_replace']:
+			count += len(compare.get(section, []))
+		for field_data in compare.get('part_update', {}).values():
+			for section in field_data.values():
+				count += len(section)
+		return count
+
+	def GetFieldIndex(self, component):
+		# Map field name (parse key) to field, unnamed user fields are listed separately
+		field_index = {}
+		unnamed_fields = []
+		for index, field in enumerate(component.fields):
+			if index == 0:
+				continue
+			elif index == 1:
+				fieldname = 'value'
+			elif index == 2:
+				fieldname = 'footprint'
+			else:
+				fieldname = self.CleanFieldname(field['fieldname'])
+
+			if fieldname == '':
+				unnamed_fields.append(field)
+			elif fieldname not in field_index:
+				field_index[fieldname] = field
+
+		return field_index, unnamed_fields
+
 	def UpdateComponentInLibrary(self, component_name, field_data):
 		component = self.library.getComponentByName(component_name)
 		# print(component.fields)
 
+		field_index, unnamed_fields = self.GetFieldIndex(component)
+
 		if 'field_update' in field_data:
 			# Process documentation
 			for key, new_value in field_data['field_update'].items():
 				if '_doc' in key[-4:]:
 					component_key = key[:-4]
 					old_value = component.documentation[component_key]
-					print(f'(F.upd) {key}: "{old_value}" -> "{new_value}"')
+					self.LogChange(component_name, 'field_update', key, old_value, new_value, '(F.upd) {key}: "{old}" -> "{new}"')
 
 					if new_value != '' and old_value != None:
 						component.documentation[component_key] = new_value
 
-			# Process fields
-			for index, field in enumerate(component.fields):
-				if index == 0:
-					# Reference line does not have fieldname key
-					# It needs to be handled separately
-					if 'reference' in field_data['field_update'].keys():
-						old_value = component.fields[index]['reference']
-						new_value = field_data['field_update']['reference']
-						print(f' reference: {old_value} -> {new_value}')
-						component.fields[index]['reference'] = new_value	
-				else:
-					if index == 1:
-						fieldname = 'value'
-					elif index == 2:
-						fieldname = 'footprint'
-					else:
-						# Create string copy before altering
-						fieldname = (field['fieldname'] + '.')[:-1]
-						fieldname = self.CleanFieldname(fieldname)
-
-					# Update field values
-					if fieldname in field_data['field_update'].keys():
-						old_value = component.fields[index]["name"]
-						new_value = field_data['field_update'][fieldname]	
-						try:
-							print(f'(F.upd) {self.fieldname_lookup_table[fieldname]} : {old_value} -> {new_value}')
-						except:
-							print(f'(F.upd) \"{fieldname}\" : {old_value} -> {new_value}')
-						try:
-							component.fields[index]['name'] = new_value
-							# print('\t> Successfully updated')
-						except:
-							print('\t[ERROR]\tField could not be updated')
+			# Reference line does not have fieldname key
+			# It needs to be handled separately
+			if 'reference' in field_data['field_update'].keys():
+				old_value = component.fields[0]['reference']
+				new_value = field_data['field_update']['reference']
+				self.LogChange(component_name, 'field_update', 'reference', old_value, new_value, ' reference: {old} -> {new}')
+				component.fields[0]['reference'] = new_value
+
+			# Update field values
+			for fieldname, field in field_index.items():
+				if fieldname in field_data['field_update']:
+					old_value = field['name']
+					new_value = field_data['field_update'][fieldname]
+					self.LogChange(component_name, 'field_update', fieldname, old_value, new_value, '(F.upd) {name} : {old} -> {new}')
+					field['name'] = new_value
 
 		# Delete extra fields from lib
 		if 'field_delete' in field_data:
+			fields_to_delete = set()
 			for key, value in field_data['field_delete'].items():
-				try:
-					print(f'(F.del) {self.fieldname_lookup_table[key]}')
-				except:
-					print(f'(F.del) \"{key}\"')
-				field_index_to_delete = None
-
-				for index, field in enumerate(component.fields):
-					# Iterate over user fields only
-					if index > 2:
-						# Create string copy before altering
-						fieldname = (field['fieldname'] + '.')[:-1]
-						fieldname = self.CleanFieldname(fieldname)
-
-						if fieldname == key:
-							field_index_to_delete = index
-							break
-						elif fieldname == '':
-							field_index_to_delete = index
-							break
-
-				try:
-					# Update Y position for fields present deleted index
-					# for index in range(field_index_to_delete + 1, len(component.fields)):
-					# 	component.fields[index]['posy'] = str(float(component.fields[index]['posy']) + POSY_OFFSET)
-					# Remove field
-					component.fields.pop(field_index_to_delete)
-					# print('\t> Successfully removed')
-				except:
+				self.LogChange(component_name, 'field_delete', key, value, None, '(F.del) {name}')
+
+				# Only user fields can be deleted
+				field = field_index.get(key, None)
+				if field is not None and field is not component.fields[1] and field is not component.fields[2]:
+					field_index.pop(key)
+				elif 'empty' in key and unnamed_fields:
+					field = unnamed_fields.pop(0)
+				else:
 					print('\t[ERROR]\tField could not be removed')
+					continue
+
+				fields_to_delete.add(id(field))
+
+			# Remove fields in a single pass
+			if fields_to_delete:
+				component.fields = [field for field in component.fields if id(field) not in fields_to_delete]
 
-		# Retrieve last field position
-		index = len(component.fields)
 		# Add missing fields from lib
 		if 'field_add' in field_data:
+			# Find lowest user field Y position, new fields are set below it
+			posy = None
+			for field in component.fields[2:]:
+				if field['name'] != '':
+					try:
+						if posy is None or int(field['posy']) < posy:
+							posy = int(field['posy'])
+					except ValueError:
+						pass
+
 			for key, value in field_data['field_add'].items():
-				try:
-					print(f'(F.add) {self.fieldname_lookup_table[key]} : {value}')
-				except:
-					print(f'(F.add) \"{key}\" : {value}')
-				
-				try:
-					# Deep copy previous field (dict)
-					new_field = copy.deepcopy(component.fields[index - 1])
-					# All properties from the previous field will be kept except for name, value, Y position and visibility
-					new_field['name'] = value
-					# Check if fieldname already exist in library
-					if key in self.fieldname_lookup_table.keys():
-						# Fetch field name
-						new_field['fieldname'] = self.fieldname_lookup_table[key]
-					else:
-						new_field['fieldname'] = self.RestoreFieldname(key)
-
-						# Add double-quotes
-						new_field['fieldname'] = '"' + new_field['fieldname'] + '"'
-
-					# Find user fields Y positions
-					posy = []
-					for posy_idx in range(2, len(component.fields)):
-						if component.fields[posy_idx]['name'] != '':
-							posy.append(int(component.fields[posy_idx]['posy']))
-
-					# Set the new field below the lowest one
-					new_field['posy'] = str(min(posy) + POSY_OFFSET)
-					# Set the visibility to hidden
-					new_field['visibility'] = 'I'
-					# Add to component's fields
-					component.fields.append(new_field)
-					# print('\t> Successfully added')
-					# Increment index
-					index += 1
-				except:
+				self.LogChange(component_name, 'field_add', key, None, value, '(F.add) {name} : {new}')
+
+				if posy is None:
 					print('\t[ERROR]\tField could not be added')
+					continue
+
+				# Copy previous field (dict of strings)
+				new_field = dict(component.fields[-1])
+				# All properties from the previous field will be kept except for name, value, Y position and visibility
+				new_field['name'] = value
+				# Check if fieldname already exist in library
+				if key in self.fieldname_lookup_table.keys():
+					# Fetch field name
+					new_field['fieldname'] = self.fieldname_lookup_table[key]
+				else:
+					new_field['fieldname'] = self.RestoreFieldname(key)
+
+					# Add double-quotes
+					new_field['fieldname'] = '"' + new_field['fieldname'] + '"'
+
+				# Set the new field below the lowest one
+				posy += POSY_OFFSET
+				new_field['posy'] = str(posy)
+				# Set the visibility to hidden
+				new_field['visibility'] = 'I'
+				# Add to component's fields
+				component.fields.append(new_field)
+				field_index[key] = new_field
 
 		if LIB_SAVE:
 			return True
@@ -802,82 +1331,2147 @@ class KicadLibrary(object):
 
 		return components
 
-	def ExportLibraryToCSV(self, csv_output = None, silent = False):
-		if not self.lib_parse:
-			print('[ERROR]\tCSV Export: Library parse is empty')
-			return
-
+	def GetExportFile(self, csv_output = None):
 		# Select CSV filename and path
 		if csv_output:
 			# Check if path exist
 			if not os.path.isdir(os.path.dirname(csv_output)):
 				raise Exception(f'[ERROR]\tPath to {csv_output} does not exist')
 			# Use user provided CSV filename
-			csv_file = csv_output
-		else:
-			if self.csv_file:
-				# Use CSV filename defined in class
-				csv_file = self.csv_file
-			else:
-				# Use autogenerated filename
-				try:
-					csv_file = CSV_FOLDER + self.name.split('.')[-2] + '.csv'
-				except:
-					csv_file = CSV_FOLDER + self.name + '.csv'
+			return csv_output
+
+		if self.csv_file:
+			# Use CSV filename defined in class
+			return self.csv_file
+
+		# Use autogenerated filename
+		try:
+			return CSV_FOLDER + self.name.split('.')[-2] + '.csv'
+		except:
+			return CSV_FOLDER + self.name + '.csv'
+
+	def ExportLibraryToCSV(self, csv_output = None, silent = False):
+		if not self.lib_parse:
+			print('[ERROR]\tCSV Export: Library parse is empty')
+			return
 
+		csv_file = self.GetExportFile(csv_output)
 		print(f'(CSV)\tExporting library to {csv_file}', silent=silent)
 
-		# Check mapping from all parts
-		mapping = {}
-		key_count = 0
-		for component in self.lib_parse:
-			for key in component.keys():
-				if key not in mapping.keys():
-					if 'empty' in key:
-						# Do not export empty fields if EMPTY_EXPORT set to False
-						if EMPTY_EXPORT:
-							mapping[key] = key_count
-							key_count += 1
-					else:
-						mapping[key] = key_count
-						key_count += 1					
+		# JSON-lines file: one record per component
+		if SplitExtension(csv_file)[1] == '.jsonl':
+			if os.path.dirname(csv_file):
+				os.makedirs(os.path.dirname(csv_file), exist_ok=True)
+			with openFile(csv_file, 'w') as jsonfile:
+				self.ExportLibraryToJSONL(jsonfile)
+			return
+
+		mapping = self.GetExportMapping()
+
+		# Nested libraries are exported to matching CSV sub-folders
+		if os.path.dirname(csv_file):
+			os.makedirs(os.path.dirname(csv_file), exist_ok=True)
 
-		with open(csv_file, 'w', newline='') as csvfile:
+		header = [self.schema.columns[slot] for slot in mapping.keys()]
+		rows = self.GetExportRows(mapping)
+
+		# Link parts to their thumbnail (path relative to CSV file)
+		if self.thumbnails is not None:
+			header.append(THUMBNAIL_COLUMN)
+			csv_folder = os.path.dirname(csv_file) or '.'
+			for row, name in zip(rows, self.lib_parse.Column('name')):
+				thumbnail = self.thumbnails.get(name, None)
+				row.append(os.path.relpath(thumbnail, csv_folder) if thumbnail else '')
+
+		with openFile(csv_file, 'w', newline='') as csvfile:
 			# Double-quotes (quotechar) are doubled. It does not look "pretty" when
 			# CSV is opened in text view but is functional to add fields with no value.
 			# It also handles well the double-quotes used for the "inch" unit.
 			csv_writer = csv_tool.writer(csvfile)
-			row_size = len(mapping)
 
 			# Write header
-			header = []
-			for key in mapping.keys():
-				header.append(key)
 			csv_writer.writerow(header)
 
 			# Write line for each component
-			for component in self.lib_parse:
-				row = []
-				count = 0
-				for column in range(row_size):
-					col_value = ''
-					for key, value in component.items():
-						if key in mapping:
-							if mapping[key] == count:
-								# Check if value has leading 0 and is only numeric
-								# Excel and other tools treat it as number and remove leading 0
-								try:
-									if value[0] == '0' and value.isdigit():
-										value = '\'' + value
-								except:
-									pass
-								col_value = value
-								break
-
-					row.append(col_value)
-					count += 1
-
-				csv_writer.writerow(row)
+			csv_writer.writerows(rows)
+
+	def SyncLibraryToCSV(self, csv_output = None, silent = False):
+		# Patch existing CSV file with library parts: rows are joined by name, only changed, added
+		# and removed rows are written (column order and text of unchanged rows are kept)
+		if not self.lib_parse:
+			print('[ERROR]\tCSV Sync: Library parse is empty')
+			return
+
+		csv_file = self.GetExportFile(csv_output)
+		if SplitExtension(csv_file)[1] == '.jsonl' or not os.path.exists(csv_file) or os.path.getsize(csv_file) == 0:
+			return self.ExportLibraryToCSV(csv_file, silent)
+
+		# Raw text of each record (quoted values can span several lines)
+		records = []
+		with openFile(csv_file, 'r', newline='') as csvfile:
+			encoding = csvfile.encoding
+			lines = []
+			def ReadLines():
+				for line in csvfile:
+					lines.append(line)
+					yield line
+
+			for cells in csv_tool.reader(ReadLines()):
+				records.append((''.join(lines), cells))
+				lines.clear()
+
+		if not records:
+			return self.ExportLibraryToCSV(csv_file, silent)
+
+		header = list(records[0][1])
+		name_slot = self.schema.Slot('name')
+		# CSV columns (field slot -> column index)
+		mapping = {}
+		for index, column in enumerate(header):
+			if column != THUMBNAIL_COLUMN:
+				mapping.setdefault(self.schema.Slot(self.CleanFieldname(column)), index)
+		if name_slot not in mapping:
+			print(f'[ERROR]\tCSV Sync: {csv_file} does not have a "name" column')
+			return
+
+		# New fields are added as last columns
+		header_changed = False
+		for slot in self.GetExportMapping().keys():
+			if slot not in mapping:
+				mapping[slot] = len(header)
+				header.append(self.schema.columns[slot])
+				header_changed = True
+		if self.thumbnails is not None and THUMBNAIL_COLUMN not in header:
+			header.append(THUMBNAIL_COLUMN)
+			header_changed = True
+		thumbnail_index = header.index(THUMBNAIL_COLUMN) if THUMBNAIL_COLUMN in header else None
+
+		# Library rows in CSV column order
+		csv_folder = os.path.dirname(csv_file) or '.'
+		rows = {}
+		for row, name in zip(self.GetExportRows(mapping), self.lib_parse.Column('name')):
+			row += [''] * (len(header) - len(row))
+			if self.thumbnails is not None:
+				thumbnail = self.thumbnails.get(name, None)
+				row[thumbnail_index] = os.path.relpath(thumbnail, csv_folder) if thumbnail else ''
+			rows.setdefault(name, row)
+
+		# Rows are written with line terminator of CSV file
+		terminator = '\n' if records[0][0].endswith('\n') and not records[0][0].endswith('\r\n') else '\r\n'
+		output = io.StringIO()
+		csv_writer = csv_tool.writer(output, lineterminator = terminator)
+		def Render(row):
+			output.seek(0)
+			output.truncate()
+			csv_writer.writerow(row)
+			return output.getvalue()
+
+		# Text of records, offset of first record which is not kept
+		text = [Render(header) if header_changed else records[0][0]]
+		patch_offset = 0 if header_changed else None
+		offset = len(records[0][0])
+		counts = {'changed': 0, 'added': 0, 'removed': 0, 'unchanged': 0}
+		name_index = mapping[name_slot]
+		for raw, cells in records[1:]:
+			new_raw = raw
+			if cells:
+				row = rows.pop(cells[name_index], None) if len(cells) > name_index else None
+				if row is None:
+					# Removed from library (or duplicate row)
+					new_raw = ''
+					counts['removed'] += 1
+				else:
+					# Thumbnail links are kept when thumbnails are not rendered
+					if self.thumbnails is None and thumbnail_index is not None:
+						row[thumbnail_index] = cells[thumbnail_index] if len(cells) > thumbnail_index else ''
+					if cells + [''] * (len(header) - len(cells)) == row:
+						counts['unchanged'] += 1
+					else:
+						new_raw = Render(row)
+						counts['changed'] += 1
+
+			if patch_offset is None and new_raw is not raw:
+				patch_offset = offset
+			text.append(new_raw)
+			offset += len(raw)
+
+		# New parts are added as last rows (library order)
+		if rows:
+			if patch_offset is None:
+				patch_offset = offset
+			if text[-1] and text[-1][-1] not in '\r\n':
+				text.append(terminator)
+			for row in rows.values():
+				text.append(Render(row))
+				counts['added'] += 1
+
+		summary = f'{counts["changed"]} changed, {counts["added"]} added, {counts["removed"]} removed ({counts["unchanged"]} unchanged)'
+		if patch_offset is None:
+			print(f'(CSV)\tSyncing library to {csv_file}: up to date ({counts["unchanged"]} rows)', silent=silent)
+			return
+
+		new_text = ''.join(text)
+		if splitCompression(csv_file)[1]:
+			# Compressed stream is written again
+			with openFile(csv_file, 'w', newline='') as csvfile:
+				csvfile.write(new_text)
+			print(f'(CSV)\tSyncing library to {csv_file}: {summary}', silent=silent)
+			return
+
+		# File is only written from first modified record
+		original = ''.join(record[0] for record in records)
+		with open(csv_file, 'r+b') as csvfile:
+			csvfile.seek(len(original[:patch_offset].encode(encoding)))
+			csvfile.write(new_text[patch_offset:].encode(encoding))
+			csvfile.truncate()
+
+		print(f'(CSV)\tSyncing library to {csv_file}: {summary}', silent=silent)
+
+	def ExportLibraryToJSONL(self, output, library = None):
+		# Records are written as they are built (library name is added for multi-library streams)
+		components = {component.name: component for component in self.library.components}
+		count = 0
+		for part in self.lib_parse:
+			output.write(json.dumps(self.GetRecord(part, components.get(part['name'], None), library)) + '\n')
+			count += 1
+
+		return count
+
+	def GetRecord(self, part, component = None, library = None):
+		record = {'library': library} if library else {}
+		record['name'] = part['name']
+		fields = {}
+		documentation = {}
+		for key, value in part.items():
+			if key == 'name' or ('empty' in key and not EMPTY_EXPORT):
+				continue
+			elif key[-4:] == '_doc':
+				documentation[key[:-4]] = value
+			elif key in ['reference', 'value', 'footprint']:
+				record[key] = self.UnquoteValue(value)
+			else:
+				fields[key] = self.UnquoteValue(value)
+
+		record['fields'] = fields
+		record['documentation'] = documentation
+		record['aliases'] = list(component.aliases.keys()) if component else []
+		return record
+
+	def UnquoteValue(self, value):
+		# Field values without double-quotes, fields without value are null
+		if not value:
+			return None
+		if len(value) >= 2 and value[0] == '"' and value[-1] == '"':
+			return value[1:-1]
+		return value
+
+	def GetExportMapping(self, mapping = None):
+		# Check mapping from all parts (field slot -> CSV column)
+		if mapping is None:
+			mapping = {}
+
+		for key in self.lib_parse.Keys():
+			slot = self.schema.Slot(key)
+			if slot not in mapping:
+				if 'empty' in key:
+					# Do not export empty fields if EMPTY_EXPORT set to False
+					if EMPTY_EXPORT:
+						mapping[slot] = len(mapping)
+				else:
+					mapping[slot] = len(mapping)
+
+		return mapping
+
+	def GetExportRows(self, mapping):
+		# Rows are filled column by column (fields not set on a part are left empty)
+		width = max(mapping.values(), default = -1) + 1
+		rows = [[''] * width for part_index in range(len(self.lib_parse))]
+		for key, values in zip(self.lib_parse.keys, self.lib_parse.columns):
+			column = mapping.get(self.schema.Slot(key), None)
+			if column is None:
+				continue
+
+			for row, value in zip(rows, values):
+				if value:
+					# Check if value has leading 0 and is only numeric
+					# Excel and other tools treat it as number and remove leading 0
+					if value[0] == '0' and value.isdigit():
+						value = '\'' + value
+					row[column] = value
+
+		return rows
+
+	def AddGlobalField(self, fieldname, default_value = ''):
+		# Add global field to all CSV parts
+		global_field = fieldname.lower()
+		self.fieldname_lookup_table[global_field] = '"' + fieldname + '"'
+
+		if default_value:
+			default_value = '"' + default_value + '"'
+		else:
+			default_value = '""'
+		print(f'default value = {default_value}', silent=not(DEBUG_DEEP))
+
+		# Process all CSV parts (missing or empty values of global field column)
+		if self.csv_parse:
+			names = self.csv_parse.Column('name')
+			self.csv_parse.AddColumn(global_field)
+			self.csv_parse.Pad()
+			for part_index, value in enumerate(self.csv_parse.columns[self.csv_parse.key_index[global_field]]):
+				print(f'Adding {global_field} to {names[part_index]}', silent=not(DEBUG_DEEP))
+				if not value:
+					self.csv_parse.SetValue(part_index, global_field, default_value)
+
+### LIBRARY PIPELINE CLASS
+class LibraryHandler(object):
+	# Operation run by LibraryPipeline on each library (base handler does nothing)
+
+	# Handler visits components (library traversal is skipped if no handler does)
+	VISIT = False
+
+	def Begin(self, klib):
+		# Library operation (components can be added, removed or renamed), return True if library was modified
+		return False
+
+	def Visit(self, klib, part, component):
+		# Component operation (part is None if component could not be parsed)
+		# Return field changes (same format as compare report: field_update, field_delete, field_add) or None
+		return None
+
+	def End(self, klib):
+		pass
+
+	def Close(self):
+		# Run is complete (all libraries were processed)
+		pass
+
+class LibraryPipeline(object):
+
+	def __init__(self, handlers = None, dry_run = False, silent = False):
+		self.handlers = list(handlers) if handlers else []
+		# Field changes are reported, not applied
+		self.dry_run = dry_run
+		self.silent = silent
+
+	def AddHandler(self, handler):
+		self.handlers.append(handler)
+
+	def Close(self):
+		for handler in self.handlers:
+			handler.Close()
+
+	def Run(self, klib):
+		# Handlers begin in order, components are streamed through all handlers in a single traversal, then handlers end in order
+		# Library is saved once if modified (unless saving is deferred by caller, never in dry run)
+		if not getattr(klib, 'library', None):
+			return 0
+
+		deferred_save = klib.deferred_save
+		klib.deferred_save = True
+
+		for index, handler in enumerate(self.handlers):
+			# Parse is refreshed for next handlers once components were modified
+			if handler.Begin(klib) and index < len(self.handlers) - 1:
+				klib.lib_parse = klib.ParseLibrary()
+
+		count = 0
+		visitors = [handler for handler in self.handlers if handler.VISIT]
+		if visitors:
+			count = self.Traverse(klib, visitors)
+
+		for handler in self.handlers:
+			handler.End(klib)
+
+		klib.deferred_save = deferred_save
+		if klib.modified and not deferred_save and not self.dry_run:
+			klib.SaveLibrary()
+
+		return count
+
+	def Traverse(self, klib, visitors):
+		# Field changes are applied to part as they are returned (next handlers see them), components are updated once traversal is complete
+		parts = klib.lib_parse
+		components = klib.library.components
+		part_update = {}
+		for component_index, component in enumerate(components):
+			# Parts follow components order (unless a component could not be parsed)
+			if len(parts) == len(components):
+				part = parts[component_index]
+			else:
+				rows = parts.GetRows(component.name)
+				part = parts[rows[0]] if rows else None
+
+			for handler in visitors:
+				field_data = handler.Visit(klib, part, component)
+				if not field_data:
+					continue
+
+				self.MergeChanges(part_update.setdefault(component.name, (part, {}))[1], field_data)
+				if not self.dry_run:
+					self.UpdatePart(part, field_data)
+
+		return self.ApplyChanges(klib, part_update)
+
+	def MergeChanges(self, changes, field_data):
+		# Changes of a field by several handlers: last change wins, added fields stay added and deleted fields which are added again are updated
+		for section in ['field_update', 'field_delete', 'field_add']:
+			for key, value in field_data.get(section, {}).items():
+				added = changes.get('field_add', {})
+				if key in added:
+					if section == 'field_delete':
+						added.pop(key)
+					else:
+						added[key] = value
+					continue
+
+				target = section
+				if section == 'field_add' and key in changes.get('field_delete', {}):
+					target = 'field_update'
+				for values in changes.values():
+					values.pop(key, None)
+				changes.setdefault(target, {})[key] = value
+
+	def UpdatePart(self, part, field_data):
+		for key, value in field_data.get('field_update', {}).items():
+			part[key] = value
+		for key in field_data.get('field_delete', {}).keys():
+			if key in part:
+				del part[key]
+		for key, value in field_data.get('field_add', {}).items():
+			part[key] = value
+
+	def ApplyChanges(self, klib, part_update):
+		count = 0
+		LOGGER.BeginChanges(klib.GetChangeCount({'part_update': {name: changes for name, (part, changes) in part_update.items()}}))
+
+		for component_name, (part, changes) in part_update.items():
+			silent_part = self.silent or not LOGGER.change_output
+			print(f'\n[ R{count} :\t{component_name} ]', silent=silent_part)
+			if self.dry_run:
+				for key, value in changes.get('field_update', {}).items():
+					print(f'(F.upd) {klib.DisplayFieldname(key)} : {part[key]} -> {value}', silent=silent_part)
+				for key in changes.get('field_delete', {}).keys():
+					print(f'(F.del) {klib.DisplayFieldname(key)}', silent=silent_part)
+				for key, value in changes.get('field_add', {}).items():
+					print(f'(F.add) {klib.DisplayFieldname(key)} : {value}', silent=silent_part)
+			else:
+				klib.UpdateComponentInLibrary(component_name, changes)
+				# Part is read again from component (changes which could not be applied are dropped)
+				if part is not None:
+					klib.RefreshPart(part, klib.library.getComponentByName(component_name))
+			count += 1
+
+		# Library is saved once
+		if count and not self.dry_run and LIB_SAVE:
+			klib.SaveLibrary()
+
+		if not self.dry_run:
+			LOGGER.PrintChangeSummary(silent = self.silent)
+
+		return count
+
+class UpdateHandler(LibraryHandler):
+	# Update library from CSV parts (global field is added to CSV parts, footprints are checked first)
+
+	def __init__(self, template = None, global_field = '', global_field_default = '', footprints = None, footprint_map = False, silent = False):
+		self.template = template
+		self.global_field = global_field
+		self.global_field_default = global_field_default
+		self.footprints = footprints
+		self.footprint_map = footprint_map
+		self.silent = silent
+
+	def Begin(self, klib):
+		if not (klib.lib_parse and klib.csv_parse):
+			return False
+
+		if self.global_field:
+			klib.AddGlobalField(self.global_field, self.global_field_default)
+
+		# Flag (or map) dangling footprints before update
+		if self.footprints:
+			self.footprints.CheckParts(klib, auto_map = self.footprint_map, silent = self.silent)
+
+		return klib.UpdateLibraryFromCSV(template = self.template, silent = self.silent)
+
+class ExportHandler(LibraryHandler):
+	# Export library parts to CSV file once other handlers ran (or sync existing CSV file)
+
+	def __init__(self, force_write = False, sync = False, silent = False):
+		self.force_write = force_write
+		self.sync = sync
+		self.silent = silent
+
+	def End(self, klib):
+		if self.sync:
+			klib.SyncLibraryToCSV(silent = self.silent)
+		elif klib.csv_parse and not self.force_write:
+			print(f'[ERROR]\tAborting Export: CSV file aleady exist and contains data', silent=self.silent)
+		else:
+			klib.ExportLibraryToCSV()
+
+### COMBINED CSV CLASS
+class CombinedCSV(object):
+
+	# Column storing library name
+	LIBRARY_COLUMN = 'library'
+
+	def __init__(self, csv_file):
+		# Combined CSV file (all libraries)
+		self.csv_file = csv_file
+		# Digests of libraries and CSV partitions at last export/update
+		self.digest_file = SplitExtension(csv_file)[0] + '.digest.json'
+		self.digests = {}
+
+		if os.path.exists(self.digest_file):
+			try:
+				with open(self.digest_file, 'r') as digest_file:
+					self.digests = json.load(digest_file)
+			except:
+				print(f'[WARN]\tCannot read digest file {self.digest_file}')
+
+	def SaveDigests(self):
+		with open(self.digest_file, 'w') as digest_file:
+			json.dump(self.digests, digest_file, indent = 4, sort_keys = True)
+
+	def GetLibraryDigest(self, lib_file):
+		return GetFilesDigest([lib_file, GetDocumentationFile(lib_file)])
+
+	def UpdatePartitionDigest(self, md5, header, row):
+		# Digest does not depend on column order nor on empty values
+		values = sorted((header[index], value) for index, value in enumerate(row) if value and index < len(header))
+		md5.update(json.dumps(values).encode('utf-8'))
+
+	def Export(self, lib_folder, lib_files, force_write = False, silent = False):
+		# Check if file exists and contains data
+		if os.path.exists(self.csv_file) and os.path.getsize(self.csv_file) > 0 and not force_write:
+			print(f'[ERROR]\tAborting Export: CSV file aleady exist and contains data', silent=silent)
+			return False
+
+		libraries = []
+		mapping = {}
+		for lib in lib_files:
+			lib_name = SplitExtension(lib)[0]
+			print(f'\n[[ {lib_name.upper()} ]]', silent=silent)
+			klib = KicadLibrary(name=lib_name, lib_file=lib_folder + lib, silent=silent)
+			if not klib.lib_parse:
+				continue
+			# Columns are shared by all libraries
+			klib.GetExportMapping(mapping)
+			libraries.append((lib_name, lib_folder + lib, klib))
+
+		print(f'\n(CSV)\tExporting {len(libraries)} libraries to {self.csv_file}', silent=silent)
+
+		self.digests = {}
+		with openFile(self.csv_file, 'w', newline='') as csvfile:
+			csv_writer = csv_tool.writer(csvfile)
+
+			header = [FIELD_SCHEMA.columns[slot] for slot in mapping.keys()]
+			csv_writer.writerow([self.LIBRARY_COLUMN] + header)
+
+			for lib_name, lib_file, klib in libraries:
+				md5 = hashlib.md5()
+				for row in klib.GetExportRows(mapping):
+					csv_writer.writerow([lib_name] + row)
+					self.UpdatePartitionDigest(md5, header, row)
+
+				self.digests[lib_name] = {
+					'library': self.GetLibraryDigest(lib_file),
+					'partition': md5.hexdigest(),
+				}
+
+		self.SaveDigests()
+		return True
+
+	def ReadPartitions(self):
+		# Split CSV rows by library in a single pass
+		partitions = {}
+		with openFile(self.csv_file, 'r') as csvfile:
+			csv_reader = csv_tool.reader(csvfile)
+			try:
+				header = csv_reader.__next__()
+				library_index = header.index(self.LIBRARY_COLUMN)
+			except StopIteration:
+				print(f'[ERROR]\tCSV file is empty {self.csv_file}')
+				return None, None
+			except ValueError:
+				print(f'[ERROR]\tCSV file {self.csv_file} does not have a "{self.LIBRARY_COLUMN}" column')
+				return None, None
+
+			header.pop(library_index)
+			for row in csv_reader:
+				if len(row) <= library_index:
+					continue
+				lib_name = row.pop(library_index)
+				if lib_name not in partitions:
+					partitions[lib_name] = {'rows': [], 'md5': hashlib.md5()}
+				partitions[lib_name]['rows'].append(row)
+				self.UpdatePartitionDigest(partitions[lib_name]['md5'], header, row)
+
+		return header, partitions
+
+	def Update(self, lib_folder, lib_files, template = None, global_field = '', global_field_default = '', silent = False):
+		if not os.path.exists(self.csv_file):
+			print(f'[ERROR]\tFile {self.csv_file} does not exist')
+			print(f'\tUse "--export_csv" argument to export CSV file')
+			return False
+
+		header, partitions = self.ReadPartitions()
+		if partitions is None:
+			return False
+
+		lib_names = {SplitExtension(lib)[0]: lib for lib in lib_files}
+		for lib_name in partitions.keys():
+			if lib_name not in lib_names:
+				print(f'[WARN]\tLibrary {lib_name} from CSV was not found in {lib_folder}', silent=silent)
+
+		skipped = 0
+		for lib_name, lib in lib_names.items():
+			if lib_name not in partitions:
+				print(f'[WARN]\tLibrary {lib_name} not found in CSV file (skipped)', silent=silent)
+				continue
+
+			lib_file = lib_folder + lib
+			partition_digest = partitions[lib_name]['md5'].hexdigest()
+			library_digest = self.GetLibraryDigest(lib_file)
+			digests = self.digests.get(lib_name, {})
+
+			# Library and partition did not change since last export or update
+			if not global_field and digests.get('partition', None) == partition_digest and digests.get('library', None) == library_digest:
+				skipped += 1
+				continue
+
+			print(f'\n[[ {lib_name.upper()} ]]', silent=silent)
+			klib = KicadLibrary(name=lib_name, lib_file=lib_file, silent=silent)
+			if not klib.lib_parse:
+				continue
+
+			klib.csv_file = self.csv_file
+			klib.csv_parse = klib.ParseCSVRows(header, partitions[lib_name]['rows'])
+			print(f'(CSV)\tParsing {lib_name} rows of {self.csv_file} ({len(klib.csv_parse)} components)', silent=silent)
+
+			LibraryPipeline([UpdateHandler(template = template, global_field = global_field, global_field_default = global_field_default, silent = silent)], silent = silent).Run(klib)
+
+			self.digests[lib_name] = {
+				'library': self.GetLibraryDigest(lib_file),
+				'partition': partition_digest,
+			}
+
+		print(f'\n{skipped} unchanged librar{"y" if skipped == 1 else "ies"} skipped', silent=silent)
+		self.SaveDigests()
+		return True
+
+### JSON-LINES STREAMS
+import itertools
+
+# Read JSON-lines records, invalid records stop the reading (components would be deleted otherwise)
+def ReadRecords(lines):
+	for line_number, line in enumerate(lines, 1):
+		if not line.strip():
+			continue
+		try:
+			record = json.loads(line)
+		except json.JSONDecodeError as error:
+			raise ValueError(f'invalid record on line {line_number} ({error.msg})')
+		if not isinstance(record, dict) or not record.get('name', None):
+			raise ValueError(f'record on line {line_number} has no component name')
+		yield record
+
+# Write records of libraries to output, one library at a time
+def ExportLibrariesToJSONL(output, lib_folder, lib_files, silent = False):
+	for lib in lib_files:
+		lib_name = SplitExtension(lib)[0]
+		print(f'\n[[ {lib_name.upper()} ]]', silent=silent)
+		klib = KicadLibrary(name=lib_name, lib_file=lib_folder + lib, silent=silent)
+		if klib.lib_parse:
+			count = klib.ExportLibraryToJSONL(output, library = lib_name)
+			print(f'(JSL)\tExported {count} records', silent=silent)
+	output.flush()
+
+# Update libraries from records grouped by library (records of a library must follow each other)
+def UpdateLibrariesFromJSONL(records, lib_folder, lib_files, template = None, global_field = '', global_field_default = '', default_library = None, silent = False):
+	lib_names = {SplitExtension(lib)[0]: lib for lib in lib_files}
+	updated = set()
+	for lib_name, library_records in itertools.groupby(records, key = lambda record: record.get('library', default_library)):
+		if lib_name is None:
+			print(f'[WARN]\tRecords without library name (skipped)', silent=silent)
+			continue
+		if lib_name not in lib_names:
+			print(f'[WARN]\tLibrary {lib_name} from records was not found in {lib_folder} (skipped)', silent=silent)
+			continue
+		if lib_name in updated:
+			print(f'[ERROR]\tRecords of library {lib_name} do not follow each other (skipped)')
+			continue
+		updated.add(lib_name)
+
+		print(f'\n[[ {lib_name.upper()} ]]', silent=silent)
+		klib = KicadLibrary(name=lib_name, lib_file=lib_folder + lib_names[lib_name], silent=silent)
+		if not klib.lib_parse:
+			continue
+
+		klib.csv_parse = klib.ParseRecords(library_records)
+		print(f'(JSL)\tParsing {len(klib.csv_parse)} records', silent=silent)
+
+		LibraryPipeline([UpdateHandler(template = template, global_field = global_field, global_field_default = global_field_default, silent = silent)], silent = silent).Run(klib)
+
+	return len(updated)
+
+### LIBRARY CHECK CLASS
+class LibraryChecker(LibraryHandler):
+
+	# Supported checks
+	CHECKS = ['duplicate_pins', 'off_grid_pins', 'missing_footprint', 'empty_datasheet', 'power_reference', 'dangling_footprints']
+	# Components are checked in library traversal
+	VISIT = True
+
+	def __init__(self, checks = None, grid = PIN_GRID, footprints = None):
+		self.checks = checks if checks else [check for check in self.CHECKS if footprints or check != 'dangling_footprints']
+		self.grid = grid
+		# Footprint index (dangling footprints check)
+		self.footprints = footprints
+		# Findings count per check
+		self.summary = {check: 0 for check in self.checks}
+		self.library_count = 0
+		self.component_count = 0
+		# Findings of last checked library
+		self.findings = []
+		self.drawings = {}
+		self.finding_count = 0
+
+	def CheckLibrary(self, klib):
+		# Single pass over loaded library (components and parse), findings are printed
+		self.finding_count = 0
+		LibraryPipeline([self]).Run(klib)
+		return self.finding_count
+
+	def Begin(self, klib):
+		self.library_count += 1
+		self.component_count += len(klib.library.components)
+		self.findings = []
+		self.drawings = {}
+		return False
+
+	def Visit(self, klib, part, component):
+		# Pin checks: components with identical drawings share their pins, which are checked once (at the end)
+		if 'duplicate_pins' in self.checks or 'off_grid_pins' in self.checks:
+			self.drawings.setdefault(getattr(component, 'draw_digest', None) or id(component), []).append(component)
+
+		# Field checks
+		findings = self.findings
+		reference = component.definition['reference']
+		if part is None:
+			part = {}
+
+		if not reference.startswith('#'):
+			if 'missing_footprint' in self.checks and part.get('footprint', '').strip('"') == '':
+				findings.append((component.name, 'missing_footprint', 'footprint field is empty'))
+			if 'empty_datasheet' in self.checks and part.get('datasheet_doc', '').strip() in ['', '~']:
+				findings.append((component.name, 'empty_datasheet', 'datasheet is empty'))
+			if 'dangling_footprints' in self.checks:
+				findings += [(component.name, 'dangling_footprints', detail)
+							 for detail in self.footprints.CheckComponent(part.get('footprint', ''), component.fplist)]
+
+		if 'power_reference' in self.checks:
+			if component.isPowerSymbol() and not reference.startswith('#'):
+				findings.append((component.name, 'power_reference', f'power symbol with reference {reference}'))
+			elif reference == '#PWR' and not component.isPowerSymbol():
+				findings.append((component.name, 'power_reference', 'reference #PWR without power flag'))
+
+		return None
+
+	def End(self, klib):
+		findings = []
+		for components in self.drawings.values():
+			for check, detail in self.CheckPins(components[0].pins):
+				findings += [(component.name, check, detail) for component in components]
+		findings += self.findings
+
+		for component_name, check, detail in findings:
+			self.summary[check] += 1
+			print(f'[CHECK]\t{klib.name}\t{component_name}\t{check}\t{detail}')
+
+		self.finding_count = len(findings)
+		self.findings = []
+		self.drawings = {}
+
+	def CheckPins(self, pins):
+		# Pins by unit, body style and number
+		pin_count = collections.Counter((pin['unit'], pin['convert'], pin['num']) for pin in pins)
+		if 'duplicate_pins' in self.checks:
+			for (unit, convert, number), count in pin_count.items():
+				if count > 1:
+					yield 'duplicate_pins', f'pin {number} (unit {unit}) is used {count} times'
+
+		if 'off_grid_pins' in self.checks:
+			for pin in pins:
+				try:
+					position = (float(pin['posx']), float(pin['posy']))
+				except ValueError:
+					continue
+				if any(abs(value - round(value / self.grid) * self.grid) > 0.01 for value in position):
+					yield 'off_grid_pins', f'pin {pin["num"]} at ({pin["posx"]}, {pin["posy"]}) is not on {self.grid} mils grid'
+
+	def PrintSummary(self):
+		count = sum(self.summary.values())
+		details = ', '.join(f'{check}: {check_count}' for check, check_count in self.summary.items() if check_count)
+		print(f'(CHK)\t{self.library_count} libraries, {self.component_count} components checked: {count} findings' + (f' ({details})' if details else ''))
+		return count
+
+### SYMBOL RENDERER CLASS
+import html
+import math
+
+# Render drawing of first unit and body style as SVG (coordinates in mils, Y axis is flipped)
+def RenderSymbol(draw, options):
+	shapes = []
+	bounds = []
+
+	def Flip(y):
+		# Library Y axis points up (no negative zero in output)
+		return 0.0 - y
+
+	def Width(thickness):
+		try:
+			width = float(thickness)
+		except ValueError:
+			width = 0
+		return width if width > 0 else SVG_LINE_WIDTH
+
+	def Fill(fill):
+		return {'F': SVG_COLORS['line'], 'f': SVG_COLORS['background']}.get(fill, 'none')
+
+	def Text(x, y, text, size, anchor = 'middle', vertical = False, baseline = 'central'):
+		# Text box is estimated for bounds (characters are 0.6 size wide)
+		length = len(text) * size * 0.6
+		start = {'start': 0, 'middle': -length / 2, 'end': -length}[anchor]
+		if vertical:
+			bounds.extend([(x - size, y + start), (x + size, y + start + length)])
+			rotation = f' transform="rotate(-90 {x:g} {Flip(y):g})"'
+		else:
+			bounds.extend([(x + start, y - size), (x + start + length, y + size)])
+			rotation = ''
+		shapes.append(f'<text x="{x:g}" y="{Flip(y):g}" font-size="{size:g}" text-anchor="{anchor}" dominant-baseline="{baseline}"{rotation}>{html.escape(text)}</text>')
+
+	for element in draw.get('rectangles', []):
+		try:
+			x1, y1, x2, y2 = (float(element[key]) for key in ['startx', 'starty', 'endx', 'endy'])
+		except ValueError:
+			continue
+		shapes.append(f'<rect x="{min(x1, x2):g}" y="{Flip(max(y1, y2)):g}" width="{abs(x2 - x1):g}" height="{abs(y2 - y1):g}" '
+					  f'fill="{Fill(element["fill"])}" stroke-width="{Width(element["thickness"]):g}"/>')
+		bounds.extend([(x1, y1), (x2, y2)])
+
+	for element in draw.get('circles', []):
+		try:
+			x, y, radius = (float(element[key]) for key in ['posx', 'posy', 'radius'])
+		except ValueError:
+			continue
+		shapes.append(f'<circle cx="{x:g}" cy="{Flip(y):g}" r="{radius:g}" fill="{Fill(element["fill"])}" stroke-width="{Width(element["thickness"]):g}"/>')
+		bounds.extend([(x - radius, y - radius), (x + radius, y + radius)])
+
+	for element in draw.get('arcs', []):
+		try:
+			x, y, radius, start_angle, end_angle, x1, y1, x2, y2 = (float(element[key]) for key in
+				['posx', 'posy', 'radius', 'start_angle', 'end_angle', 'startx', 'starty', 'endx', 'endy'])
+		except ValueError:
+			continue
+		# Arcs are drawn counterclockwise from start to end, the shorter way
+		span = (end_angle - start_angle) % 3600
+		sweep = 0 if span <= 1800 else 1
+		middle = math.radians((start_angle + (span if sweep == 0 else span - 3600) / 2) / 10)
+		shapes.append(f'<path d="M {x1:g} {Flip(y1):g} A {radius:g} {radius:g} 0 0 {sweep} {x2:g} {Flip(y2):g}" '
+					  f'fill="{Fill(element["fill"])}" stroke-width="{Width(element["thickness"]):g}"/>')
+		bounds.extend([(x1, y1), (x2, y2), (x + radius * math.cos(middle), y + radius * math.sin(middle))])
+
+	for element in draw.get('polylines', []):
+		try:
+			points = [float(value) for value in element['points']]
+		except ValueError:
+			continue
+		points = list(zip(points[0::2], points[1::2]))
+		if not points:
+			continue
+		shapes.append(f'<polyline points="{" ".join(f"{x:g},{Flip(y):g}" for x, y in points)}" '
+					  f'fill="{Fill(element["fill"])}" stroke-width="{Width(element["thickness"]):g}"/>')
+		bounds.extend(points)
+
+	for element in draw.get('texts', []):
+		try:
+			x, y, size, angle = (float(element[key]) for key in ['posx', 'posy', 'text_size', 'direction'])
+		except ValueError:
+			continue
+		# Quoted text can contain escaped double-quotes, spaces of unquoted text are written as "~"
+		text = element['text']
+		if len(text) > 1 and text[0] == '"' and text[-1] == '"':
+			text = text[1:-1].replace('\\"', '"')
+		else:
+			text = text.replace('~', ' ')
+		Text(x, y, text, size, vertical = angle in [900, 2700])
+
+	for pin in draw.get('pins', []):
+		# Invisible pins are not drawn
+		if 'N' in pin['pin_type']:
+			continue
+		try:
+			x, y, length, number_size, name_size = (float(pin[key]) for key in ['posx', 'posy', 'length', 'num_text_size', 'name_text_size'])
+		except ValueError:
+			continue
+		dx, dy = {'R': (1, 0), 'L': (-1, 0), 'U': (0, 1), 'D': (0, -1)}.get(pin['direction'], (1, 0))
+		x2, y2 = x + dx * length, y + dy * length
+		vertical = dx == 0
+		shapes.append(f'<line x1="{x:g}" y1="{Flip(y):g}" x2="{x2:g}" y2="{Flip(y2):g}" stroke-width="{SVG_LINE_WIDTH:g}"/>')
+		bounds.extend([(x, y), (x2, y2)])
+
+		# Pin number above the pin, pin name inside body (or below the pin if there is no offset)
+		middle_x, middle_y = (x + x2) / 2, (y + y2) / 2
+		if options['pin_numbers'] and pin['num'] not in ['', '~'] and number_size > 0:
+			Text(middle_x - (SVG_LINE_WIDTH if vertical else 0), middle_y + (0 if vertical else SVG_LINE_WIDTH), pin['num'], number_size, vertical = vertical, baseline = 'auto')
+		if options['pin_names'] and pin['name'] not in ['', '~'] and name_size > 0:
+			if options['text_offset'] > 0:
+				Text(x2 + dx * options['text_offset'], y2 + dy * options['text_offset'], pin['name'], name_size,
+					 anchor = 'start' if dx + dy > 0 else 'end', vertical = vertical)
+			else:
+				Text(middle_x + (SVG_LINE_WIDTH if vertical else 0), middle_y - (0 if vertical else SVG_LINE_WIDTH), pin['name'], name_size, vertical = vertical, baseline = 'hanging')
+
+	# View box fits drawing with a margin
+	if bounds:
+		min_x = min(x for x, y in bounds) - SVG_MARGIN
+		max_x = max(x for x, y in bounds) + SVG_MARGIN
+		min_y = min(y for x, y in bounds) - SVG_MARGIN
+		max_y = max(y for x, y in bounds) + SVG_MARGIN
+	else:
+		min_x, max_x, min_y, max_y = -SVG_MARGIN, SVG_MARGIN, -SVG_MARGIN, SVG_MARGIN
+	width, height = max_x - min_x, max_y - min_y
+
+	return (f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="{min_x:g} {Flip(max_y):g} {width:g} {height:g}" '
+			f'width="{width * SVG_SCALE:.0f}" height="{height * SVG_SCALE:.0f}">\n'
+			f'<g stroke="{SVG_COLORS["line"]}" fill="{SVG_COLORS["text"]}" stroke-linecap="round" stroke-linejoin="round" font-family="sans-serif">\n'
+			+ ''.join(shape + '\n' for shape in shapes) +
+			'</g>\n</svg>\n')
+
+# Render symbol to SVG file (renderer worker), file is replaced once written
+def RenderSymbolFile(job):
+	svg_file, draw, options = job
+	with open(svg_file + '.tmp', 'w') as f:
+		f.write(RenderSymbol(draw, options))
+	os.replace(svg_file + '.tmp', svg_file)
+
+class SymbolRenderer(LibraryHandler):
+
+	# Render version (part of cache keys, cached files are rendered again when changed)
+	VERSION = 1
+	# Drawings are collected in library traversal
+	VISIT = True
+
+	def __init__(self, svg_folder, workers = SVG_WORKERS, silent = False):
+		self.svg_folder = svg_folder
+		self.workers = workers
+		self.silent = silent
+		os.makedirs(self.svg_folder, exist_ok=True)
+		# Cache keys of rendered drawings (SVG files are named after keys)
+		self.cached = set(os.path.splitext(name)[0] for name in os.listdir(self.svg_folder) if name.endswith('.svg'))
+		# Drawings to render for current library: cache key -> (draw, options)
+		self.pending = {}
+		self.stats = {'components': 0, 'rendered': 0, 'cached': 0, 'skipped': 0}
+		self.render_time = 0
+		# Worker processes are started once per run (on first large batch)
+		self.executor = None
+
+	def GetKey(self, component):
+		# Digest of DRAW section and of definition options used by renderer
+		draw_digest = getattr(component, 'draw_digest', None)
+		if not draw_digest:
+			return None
+		definition = component.definition
+		key = f'{self.VERSION}|{draw_digest}|{definition["text_offset"]}|{definition["draw_pinnumber"]}|{definition["draw_pinname"]}'
+		return hashlib.md5(key.encode('utf-8')).hexdigest()
+
+	def GetDrawData(self, component):
+		# Elements of first unit and body style (or common to all units and body styles)
+		draw = {}
+		for kind, elements in component.draw.items():
+			draw[kind] = [dict(element) for element in elements if element.get('unit', '0') in ['0', '1'] and element.get('convert', '0') in ['0', '1']]
+
+		definition = component.definition
+		try:
+			text_offset = float(definition['text_offset'])
+		except ValueError:
+			text_offset = 0
+		options = {'pin_numbers': definition['draw_pinnumber'] != 'N', 'pin_names': definition['draw_pinname'] != 'N', 'text_offset': text_offset}
+		return draw, options
+
+	def Begin(self, klib):
+		# Component name -> SVG file (linked in CSV export)
+		klib.thumbnails = {}
+		self.pending = {}
+		return False
+
+	def Visit(self, klib, part, component):
+		self.stats['components'] += 1
+		key = self.GetKey(component)
+		if key is None:
+			# KiCad 6+ symbol drawings are not loaded
+			self.stats['skipped'] += 1
+			return None
+
+		klib.thumbnails[component.name] = os.path.join(self.svg_folder, key + '.svg')
+		if key in self.cached or key in self.pending:
+			self.stats['cached'] += 1
+		else:
+			# Drawing is only parsed when it is rendered
+			self.pending[key] = self.GetDrawData(component)
+		return None
+
+	def End(self, klib):
+		if not self.pending:
+			return
+
+		start = time.perf_counter()
+		jobs = [(os.path.join(self.svg_folder, key + '.svg'), draw, options) for key, (draw, options) in self.pending.items()]
+		if self.workers > 1 and len(jobs) >= SVG_PARALLEL_MIN:
+			if self.executor is None:
+				self.executor = ProcessPoolExecutor(max_workers=self.workers)
+			for result in self.executor.map(RenderSymbolFile, jobs, chunksize=max(1, len(jobs) // (self.workers * 4))):
+				pass
+		else:
+			for job in jobs:
+				RenderSymbolFile(job)
+
+		self.render_time += time.perf_counter() - start
+		self.stats['rendered'] += len(jobs)
+		self.cached.update(self.pending.keys())
+		print(f'(SVG)\tRendered {len(jobs)} drawings to {self.svg_folder}', silent=self.silent)
+		self.pending = {}
+
+	def Close(self):
+		if self.executor is not None:
+			self.executor.shutdown()
+			self.executor = None
+
+	def PrintSummary(self):
+		print(f'(SVG)\t{self.stats["components"]} components: {self.stats["rendered"]} drawings rendered ({self.render_time:.1f} s), '
+			  f'{self.stats["cached"]} reused, {self.stats["skipped"]} skipped (drawings not loaded)')
+
+### LIBRARY DIFF CLASS
+class LibraryDiff(object):
+
+	def __init__(self, include = None, exclude = None):
+		self.include = include
+		self.exclude = exclude
+		self.summary = {'added': 0, 'removed': 0, 'renamed': 0, 'changed': 0, 'unchanged': 0}
+		self.library_count = 0
+
+	def OpenDigest(self, lib_file):
+		# Missing library is empty
+		if not lib_file:
+			return {}
+		return OpenLibraryDigest(lib_file)
+
+	def DiffPaths(self, path_a, path_b):
+		# Libraries of folders are paired by relative path (compressed or not)
+		if os.path.isdir(path_a) and os.path.isdir(path_b):
+			libs_a = {splitCompression(lib)[0]: lib for lib in FindFiles(path_a, LIB_EXTENSIONS, include = self.include, exclude = self.exclude)}
+			libs_b = {splitCompression(lib)[0]: lib for lib in FindFiles(path_b, LIB_EXTENSIONS, include = self.include, exclude = self.exclude)}
+			for lib in sorted(set(libs_a) | set(libs_b)):
+				self.DiffLibrary(lib, os.path.join(path_a, libs_a[lib]) if lib in libs_a else '', os.path.join(path_b, libs_b[lib]) if lib in libs_b else '')
+		else:
+			self.DiffLibrary(os.path.basename(path_b), path_a, path_b)
+
+	def DiffLibrary(self, name, lib_a, lib_b):
+		# Components are joined by name, then removed and added components by content digest (renamed)
+		components_a = self.OpenDigest(lib_a)
+		components_b = self.OpenDigest(lib_b)
+		self.library_count += 1
+
+		removed = {}
+		for component_name, component in components_a.items():
+			if component_name not in components_b:
+				removed.setdefault(component.content, []).append(component_name)
+
+		added = []
+		for component_name, component in components_b.items():
+			component_a = components_a.get(component_name)
+			if component_a is None:
+				if removed.get(component.content):
+					self.Report(name, component_name, 'renamed', 'from ' + removed[component.content].pop(0))
+				else:
+					added.append(component_name)
+			elif component_a.digest == component.digest:
+				self.summary['unchanged'] += 1
+			else:
+				self.summary['changed'] += 1
+				if component_a.fields != component.fields:
+					for detail in self.DiffFields(component_a.getFields(), component.getFields()):
+						print(f'[DIFF]\t{name}\t{component_name}\tfield\t{detail}')
+				if component_a.doc != component.doc:
+					for detail in self.DiffFields(component_a.getDocumentation(), component.getDocumentation()):
+						print(f'[DIFF]\t{name}\t{component_name}\tdocumentation\t{detail}')
+				if component_a.draw != component.draw:
+					print(f'[DIFF]\t{name}\t{component_name}\tgraphics\tdrawing changed')
+
+		for component_name in added:
+			self.Report(name, component_name, 'added')
+		for component_names in removed.values():
+			for component_name in component_names:
+				self.Report(name, component_name, 'removed')
+
+	def DiffFields(self, fields_a, fields_b):
+		# Fields are (value, source) by name, source changes without value change are attributes (position, visibility...)
+		for key, (value, source) in fields_b.items():
+			if key not in fields_a:
+				yield f'{key} added: {value}'
+			elif fields_a[key][0] != value:
+				yield f'{key}: {fields_a[key][0]} -> {value}'
+			elif fields_a[key][1] != source:
+				yield f'{key}: attributes changed'
+
+		for key in fields_a:
+			if key not in fields_b:
+				yield f'{key} removed'
+
+	def Report(self, library, component_name, change, detail = ''):
+		self.summary[change] += 1
+		print(f'[DIFF]\t{library}\t{component_name}\t{change}' + (f'\t{detail}' if detail else ''))
+
+	def PrintSummary(self):
+		count = sum(value for key, value in self.summary.items() if key != 'unchanged')
+		print(f'(DIF)\t{self.library_count} libraries compared: {self.summary["added"]} added, {self.summary["removed"]} removed, '
+			  f'{self.summary["renamed"]} renamed, {self.summary["changed"]} changed ({self.summary["unchanged"]} unchanged)')
+		return count
+
+### LIBRARY DEDUPE CLASS
+import struct
+
+# MinHash signature of feature set (feature hashes are memoized, features are shared by many components)
+def GetMinHash(features, hashes, rows = None):
+	if rows is None:
+		rows = struct.Struct(f'<{DEDUPE_BANDS * DEDUPE_ROWS}H')
+	values = []
+	for feature in features:
+		value = hashes.get(feature, None)
+		if value is None:
+			# Hash is split in 16-bit values, one per signature row
+			value = hashes[feature] = rows.unpack(hashlib.blake2b(feature.encode('utf-8'), digest_size = rows.size).digest())
+		values.append(value)
+	return tuple(map(min, zip(*values)))
+
+# Duplicate key, features and signature of library components (runs in reader processes)
+def ReadDedupeRecords(lib_file):
+	records = []
+	hashes = {}
+	rows = struct.Struct(f'<{DEDUPE_BANDS * DEDUPE_ROWS}H')
+	for name, component in OpenLibraryDigest(lib_file).items():
+		fields = component.getFieldValues()
+		# Power symbols are not parts
+		if fields.get('Reference', '').startswith('#'):
+			continue
+
+		# Value is ignored when it is the component name
+		value = fields.pop('Value', '')
+		if value == name:
+			value = ''
+
+		features = set(f'{key}={field_value}' for key, field_value in fields.items() if field_value not in ['', '~'])
+		features.update(f'{key}_doc={doc_value}' for key, (doc_value, line) in component.getDocumentation().items() if doc_value not in ['', '~'])
+		features.add('draw=' + component.draw)
+		if value:
+			features.add('Value=' + value)
+
+		features = frozenset(features)
+		records.append((name, (component.content, value), features, GetMinHash(features, hashes, rows)))
+
+	return lib_file, records
+
+class LibraryDedupe(object):
+
+	def __init__(self, similarity = DEDUPE_SIMILARITY, workers = DEDUPE_WORKERS, silent = False):
+		self.similarity = similarity
+		self.workers = workers
+		self.silent = silent
+		# Components: (library, name, key, features, signature)
+		self.components = []
+		self.library_count = 0
+		self.summary = {'exact': 0, 'exact_components': 0, 'near': 0, 'near_components': 0, 'windowed': 0}
+		self.start = time.perf_counter()
+
+	def AddLibraries(self, lib_folder, lib_files):
+		# Libraries are read (and components hashed) in parallel
+		lib_paths = [lib_folder + lib for lib in lib_files]
+		if self.workers > 1 and len(lib_paths) >= DEDUPE_PARALLEL_MIN:
+			with ProcessPoolExecutor(max_workers=self.workers) as executor:
+				results = list(executor.map(ReadDedupeRecords, lib_paths, chunksize=max(1, len(lib_paths) // (self.workers * 4))))
+		else:
+			results = [ReadDedupeRecords(lib_path) for lib_path in lib_paths]
+
+		for lib, (lib_path, records) in zip(lib_files, results):
+			self.library_count += 1
+			for name, key, features, signature in records:
+				self.components.append((lib, name, key, features, signature))
+			print(f'(LIB)\t{lib}: {len(records)} components', silent=self.silent)
+
+	def FindExact(self):
+		# Components with identical fields (except value repeating the name), documentation and drawing
+		groups = {}
+		for index, component in enumerate(self.components):
+			groups.setdefault(component[2], []).append(index)
+		return [group for group in groups.values() if len(group) > 1]
+
+	def FindNear(self):
+		# Candidates share a band of their MinHash signature, similarity is checked on features
+		feature_sets = {}
+		for index, component in enumerate(self.components):
+			feature_sets.setdefault(component[3], []).append(index)
+		sets = list(feature_sets.keys())
+		signatures = [self.components[members[0]][4] for members in feature_sets.values()]
+
+		parent = list(range(len(sets)))
+		def Find(item):
+			while parent[item] != item:
+				parent[item] = parent[parent[item]]
+				item = parent[item]
+			return item
+
+		for band in range(DEDUPE_BANDS):
+			buckets = {}
+			rows = slice(band * DEDUPE_ROWS, (band + 1) * DEDUPE_ROWS)
+			for set_index, signature in enumerate(signatures):
+				buckets.setdefault(signature[rows], []).append(set_index)
+
+			for bucket in buckets.values():
+				if len(bucket) < 2:
+					continue
+				if len(bucket) > DEDUPE_BUCKET_SIZE:
+					# Sorted neighborhood: large buckets are compared within a window
+					self.summary['windowed'] += 1
+					bucket.sort(key = lambda set_index: signatures[set_index])
+				for position, set_a in enumerate(bucket):
+					for set_b in bucket[position + 1:position + 1 + DEDUPE_BUCKET_SIZE]:
+						root_a, root_b = Find(set_a), Find(set_b)
+						if root_a != root_b and self.Similarity(sets[set_a], sets[set_b]) >= self.similarity:
+							parent[root_b] = root_a
+
+		# Groups of similar components, identical components only are reported as exact duplicates
+		clusters = {}
+		for set_index, members in enumerate(feature_sets.values()):
+			clusters.setdefault(Find(set_index), []).extend(members)
+		return [sorted(members) for members in clusters.values() if len(set(self.components[index][2] for index in members)) > 1]
+
+	def Similarity(self, features_a, features_b):
+		# Jaccard index of feature sets
+		shared = len(features_a & features_b)
+		return shared / (len(features_a) + len(features_b) - shared)
+
+	def Report(self):
+		group_id = 0
+		for group in sorted(self.FindExact(), key = lambda group: group[0]):
+			group_id += 1
+			self.summary['exact'] += 1
+			self.summary['exact_components'] += len(group)
+			for index in group:
+				lib, name = self.components[index][:2]
+				print(f'[DUP]\texact\t{group_id}\t{lib}\t{name}')
+
+		for group in sorted(self.FindNear(), key = lambda group: group[0]):
+			group_id += 1
+			self.summary['near'] += 1
+			self.summary['near_components'] += len(group)
+			features = self.components[group[0]][3]
+			for index in group:
+				lib, name = self.components[index][:2]
+				print(f'[DUP]\tnear\t{group_id}\t{lib}\t{name}\t{self.Similarity(features, self.components[index][3]):.2f}')
+
+	def PrintSummary(self):
+		count = self.summary['exact'] + self.summary['near']
+		print(f'(DUP)\t{self.library_count} libraries, {len(self.components)} components: {self.summary["exact"]} exact duplicate groups '
+			  f'({self.summary["exact_components"]} components), {self.summary["near"]} near-duplicate groups ({self.summary["near_components"]} components) '
+			  f'in {time.perf_counter() - self.start:.1f} s')
+		if self.summary['windowed']:
+			print(f'[WARN]\t{self.summary["windowed"]} large candidate buckets were compared within a window of {DEDUPE_BUCKET_SIZE} components', silent=self.silent)
+		return count
+
+### LIBRARY RULES CLASS
+class LibraryRules(LibraryHandler):
+
+	# Supported rule actions
+	ACTIONS = ['sub', 'set', 'lower', 'upper', 'add', 'delete']
+	# Fields which cannot be deleted from a component
+	PROTECTED_FIELDS = ['name', 'reference', 'value', 'footprint', 'description_doc', 'keywords_doc', 'datasheet_doc']
+	# Rules are applied in library traversal
+	VISIT = True
+
+	def __init__(self, rules_file = None, global_field = None, global_field_default = ''):
+		# Compiled rules
+		self.rules = []
+		# Summary of affected parts: rule name -> list of (library, component)
+		self.summary = {}
+
+		if rules_file:
+			self.rules = self.CompileRules(self.LoadRules(rules_file))
+
+		# Global field is added to all components
+		if global_field:
+			self.rules += self.CompileRules([{
+				'name': f'Add global field {global_field}',
+				'actions': [{'action': 'add', 'field': global_field, 'value': global_field_default}],
+			}])
+
+	def LoadRules(self, rules_file):
+		with open(rules_file, 'r') as f:
+			rules = json.load(f)
+
+		if type(rules) is dict:
+			rules = rules.get('rules', [])
+
+		return rules
+
+	def CompileRules(self, rules):
+		compiled = []
+		for index, rule in enumerate(rules):
+			name = rule.get('name', f'rule_{len(self.rules) + index}')
+			# Conditions: field name -> regex which must (not) match the field value
+			when = [(self.CleanFieldname(field), re.compile(pattern)) for field, pattern in rule.get('when', {}).items()]
+			unless = [(self.CleanFieldname(field), re.compile(pattern)) for field, pattern in rule.get('unless', {}).items()]
+
+			actions = []
+			for action in rule.get('actions', []):
+				if action.get('action', None) not in self.ACTIONS:
+					raise ValueError(f'Rule "{name}": unknown action "{action.get("action", None)}"')
+				if 'field' not in action:
+					raise ValueError(f'Rule "{name}": action "{action["action"]}" is missing a field')
+
+				compiled_action = {
+					'action': action['action'],
+					# Field selector (glob)
+					'field': self.CleanFieldname(action['field']),
+					'fieldname': action['field'],
+				}
+				if action['action'] == 'sub':
+					compiled_action['pattern'] = re.compile(action['pattern'])
+					compiled_action['repl'] = action.get('repl', '')
+					compiled_action['count'] = action.get('count', 0)
+				elif action['action'] in ['set', 'add']:
+					compiled_action['value'] = action.get('value', '')
+				elif action['action'] == 'delete' and compiled_action['field'] in self.PROTECTED_FIELDS:
+					raise ValueError(f'Rule "{name}": field "{action["field"]}" cannot be deleted')
+
+				actions.append(compiled_action)
+
+			compiled.append({'name': name, 'when': when, 'unless': unless, 'actions': actions})
+			self.summary[name] = []
+
+		return compiled
+
+	def CleanFieldname(self, fieldname):
+		return FIELD_SCHEMA.CleanFieldname(fieldname)
+
+	def Unquote(self, value):
+		if len(value) > 1 and value[0] == '"' and value[-1] == '"':
+			return value[1:-1]
+		return value
+
+	def Quote(self, key, value):
+		# Documentation is not quoted in library
+		if key.endswith('_doc'):
+			return value
+		return '"' + value + '"'
+
+	def SelectFields(self, values, selector):
+		if selector in values:
+			return [selector]
+		return [key for key in values.keys() if fnmatch.fnmatchcase(key, selector)]
+
+	def ApplyToComponent(self, lib_part):
+		# Work on unquoted values, rules are applied in order
+		values = {key: self.Unquote(value) for key, value in lib_part.items() if 'empty' not in key}
+		matched_rules = []
+
+		for rule in self.rules:
+			if not all(pattern.search(values.get(field, '')) for field, pattern in rule['when']):
+				continue
+			if any(pattern.search(values.get(field, '')) for field, pattern in rule['unless']):
+				continue
+
+			matched = False
+			for action in rule['actions']:
+				if action['action'] == 'add':
+					# Add missing field or fill empty one
+					if not values.get(action['field'], ''):
+						values[action['field']] = action['value']
+						matched = True
+					continue
+
+				for key in self.SelectFields(values, action['field']):
+					if key == 'name':
+						continue
+					if action['action'] == 'delete':
+						if key not in self.PROTECTED_FIELDS:
+							values.pop(key)
+							matched = True
+						continue
+
+					if action['action'] == 'sub':
+						new_value = action['pattern'].sub(action['repl'], values[key], count=action['count'])
+					elif action['action'] == 'set':
+						new_value = action['value']
+					elif action['action'] == 'lower':
+						new_value = values[key].lower()
+					else:
+						new_value = values[key].upper()
+
+					if new_value != values[key]:
+						values[key] = new_value
+						matched = True
+
+			if matched:
+				matched_rules.append(rule['name'])
+
+		# Build update data (same format as compare report)
+		field_data = {}
+		for key, value in values.items():
+			if key not in lib_part:
+				# Documentation can only be updated if it exists
+				if not key.endswith('_doc'):
+					field_data.setdefault('field_add', {})[key] = self.Quote(key, value)
+			elif self.Unquote(lib_part[key]) != value:
+				field_data.setdefault('field_update', {})[key] = self.Quote(key, value)
+		for key in lib_part.keys():
+			if 'empty' not in key and key not in values:
+				field_data.setdefault('field_delete', {})[key] = lib_part[key]
+
+		return field_data, matched_rules
+
+	def ApplyToLibrary(self, klib, dry_run = False, silent = False):
+		# Single pass over library components, library is saved once
+		return LibraryPipeline([self], dry_run = dry_run, silent = silent).Run(klib)
+
+	def Begin(self, klib):
+		# Field names used by rules keep their casing in library
+		for rule in self.rules:
+			for action in rule['actions']:
+				if action['action'] == 'add' and action['field'] not in klib.fieldname_lookup_table:
+					klib.fieldname_lookup_table[action['field']] = '"' + action['fieldname'] + '"'
+		return False
+
+	def Visit(self, klib, part, component):
+		if part is None:
+			return None
+
+		field_data, matched_rules = self.ApplyToComponent(part)
+		if field_data:
+			for rule_name in matched_rules:
+				self.summary[rule_name].append((klib.name, part['name']))
+		return field_data
+
+	def PrintSummary(self, dry_run = False):
+		print(f'\nRules Summary{" (dry run)" if dry_run else ""}\n---')
+		for rule in self.rules:
+			parts = self.summary[rule['name']]
+			libraries = set(library for library, part in parts)
+			print(f'{rule["name"]}:\t{len(parts)} part(s) in {len(libraries)} librar{"y" if len(libraries) == 1 else "ies"}')
+			for library, part in parts:
+				print(f'\t{library}: {part}', silent=not(DEBUG_DEEP))
+
+# Compute content digest of files (missing files are skipped)
+def GetFilesDigest(files):
+	md5 = hashlib.md5()
+	for file in files:
+		if not os.path.isfile(file):
+			continue
+		md5.update(file.encode('utf-8'))
+		with open(file, 'rb') as f:
+			for chunk in iter(lambda: f.read(1 << 16), b''):
+				md5.update(chunk)
+
+	return md5.hexdigest()
+
+### FILE DISCOVERY
+# Split file name and extension, compression extension is ignored (Library.lib.gz -> Library, .lib)
+def SplitExtension(filename):
+	return os.path.splitext(splitCompression(filename)[0])
+
+# Documentation file of library (compressed as library file)
+def GetDocumentationFile(lib_file):
+	return SplitExtension(lib_file)[0] + '.dcm' + splitCompression(lib_file)[1]
+
+# Find files with extension in folder tree, paths are returned relative to folder
+def FindFiles(folder, extensions, include = None, exclude = None):
+	files = []
+	folders = ['']
+	while folders:
+		relative_folder = folders.pop()
+		try:
+			entries = os.scandir(os.path.join(folder, relative_folder))
+		except OSError:
+			continue
+
+		with entries:
+			for entry in entries:
+				relative_path = relative_folder + entry.name
+				if entry.is_dir():
+					folders.append(relative_path + '/')
+				elif SplitExtension(entry.name)[1] in extensions and MatchFilters(relative_path, include, exclude):
+					files.append(relative_path)
+
+	return sorted(files)
+
+# Open library with the parser matching its format
+def OpenLibrary(lib_file):
+	if SplitExtension(lib_file)[1] == '.kicad_sym':
+		return SymLib(lib_file)
+	return SchLib(lib_file, draw_raw=LIB_DRAW_RAW)
+
+# Component digests of library (components are not loaded)
+def OpenLibraryDigest(lib_file):
+	if SplitExtension(lib_file)[1] == '.kicad_sym':
+		if splitCompression(lib_file)[1]:
+			print(f'[ERROR]\tCompressed KiCad 6+ library {lib_file} is not supported')
+			return {}
+		return SymLibDigest(lib_file).components
+	return SchLibDigest(lib_file).components
+
+# Check relative path against include and exclude glob patterns
+def MatchFilters(path, include = None, exclude = None):
+	if include and not any(fnmatch.fnmatch(path, pattern) for pattern in include):
+		return False
+	if exclude and any(fnmatch.fnmatch(path, pattern) for pattern in exclude):
+		return False
+	return True
+
+# Pair LIB and CSV files by relative path without extension
+def MatchFiles(lib_files, csv_files):
+	csv_by_stem = {SplitExtension(csv)[0]: csv for csv in csv_files}
+	return {lib: csv_by_stem.get(SplitExtension(lib)[0], '') for lib in sorted(lib_files)}
+
+# Print memory used by drawings of each library (identical DRAW sections are stored once)
+def PrintDrawReport(lib_folder, lib_files):
+	total = {'components': 0, 'draws': 0, 'shared': 0, 'size': 0, 'saved': 0}
+	for lib in lib_files:
+		klib = KicadLibrary(name=SplitExtension(lib)[0], lib_file=lib_folder + lib)
+		if not getattr(klib, 'library', None):
+			continue
+
+		if not hasattr(klib.library, 'getDrawStats'):
+			# KiCad 6+ symbol drawings are not loaded
+			print(f'(LIB)\t{lib}: {len(klib.library.components)} components, drawings are not loaded')
+			continue
+
+		stats = klib.library.getDrawStats()
+		for key in total:
+			total[key] += stats[key]
+		print(f'(LIB)\t{lib}: {stats["components"]} components, {stats["draws"]} drawings ({stats["shared"]} shared), '
+			  f'{stats["size"] / 1024:.1f} KiB used, {stats["saved"] / 1024:.1f} KiB saved')
+
+	print(f'(LIB)\tTotal: {total["components"]} components, {total["draws"]} drawings ({total["shared"]} shared), '
+		  f'{total["size"] / 1024:.1f} KiB used, {total["saved"] / 1024:.1f} KiB saved')
+
+### LIBRARY INDEX CLASS
+class LibraryIndex(object):
+
+	# Query modes
+	QUERY_MODES = ['exact', 'prefix', 'token']
+
+	def __init__(self, index_file):
+		# Version
+		self.version = 'kicad-library-index-0.2'
+		# Index file path (libraries), inverted indexes are stored in their own file and loaded on first use
+		self.index_file = index_file
+		self.postings_files = {name: SplitExtension(index_file)[0] + f'.{name}.json' for name in ['values', 'tokens']}
+		# Indexed libraries: absolute path -> {'path', 'digest', 'components'}
+		self.libraries = {}
+		# Inverted indexes (None until loaded):
+		# 'values': normalized field value -> list of [library_id, component, field]
+		# 'tokens': token -> list of [library_id, component, field]
+		self.postings = {'values': {}, 'tokens': {}}
+		# Sorted values (used for prefix search), values are stored sorted in file
+		self.sorted_values = None
+		self.values_sorted = True
+
+		self.LoadIndex()
+
+	@property
+	def values(self):
+		return self.LoadPostings('values')
+
+	@property
+	def tokens(self):
+		return self.LoadPostings('tokens')
+
+	def LoadIndex(self):
+		if not os.path.exists(self.index_file):
+			return False
+
+		try:
+			with open(self.index_file, 'r') as index_file:
+				index = json.load(index_file)
+		except:
+			print(f'[WARN]\tCannot read index file {self.index_file}, rebuilding')
+			return False
+
+		if index.get('version', None) != self.version:
+			print(f'[WARN]\tIndex file {self.index_file} has a different version, rebuilding')
+			return False
+
+		self.libraries = index['libraries']
+		self.postings = {'values': None, 'tokens': None}
+		return True
+
+	def LoadPostings(self, name):
+		if self.postings[name] is None:
+			try:
+				with open(self.postings_files[name], 'r') as postings_file:
+					self.postings[name] = json.load(postings_file)
+			except:
+				# Libraries are indexed again on next update
+				print(f'[WARN]\tCannot read index file {self.postings_files[name]}, rebuilding')
+				self.libraries = {}
+				self.postings = {'values': {}, 'tokens': {}}
+		return self.postings[name]
+
+	def SaveIndex(self):
+		index = {
+			'version': self.version,
+			'libraries': self.libraries,
+		}
+		with open(self.index_file, 'w') as index_file:
+			json.dump(index, index_file, separators=(',', ':'))
+
+		# Inverted indexes are only written if loaded, values are written sorted so prefix search does not sort on load
+		for name, postings in self.postings.items():
+			if postings is None:
+				continue
+			if name == 'values':
+				postings = {value: postings[value] for value in sorted(postings)}
+			with open(self.postings_files[name], 'w') as postings_file:
+				json.dump(postings, postings_file, separators=(',', ':'))
+
+	def NormalizeValue(self, value):
+		# Strip double-quotes and ignore case
+		return value.replace('"', '').strip().lower()
+
+	def Tokenize(self, value):
+		return set(re.findall(r'[a-z0-9]+', value))
+
+	def GetLibraryKeys(self, library_id):
+		# Value and token keys of library postings (stored field values are normalized again)
+		values = set()
+		tokens = set()
+		for component_name, fields in self.libraries[library_id]['components'].items():
+			values.add(component_name.lower())
+			for value in fields.values():
+				value = self.NormalizeValue(value)
+				values.add(value)
+				tokens.update(self.Tokenize(value))
+		return values, tokens
+
+	def RemoveLibraries(self, library_ids):
+		# Only posting lists of removed libraries are rewritten
+		library_ids = set(library_id for library_id in library_ids if library_id in self.libraries)
+		if not library_ids:
+			return
+
+		keys = [set(), set()]
+		for library_id in library_ids:
+			for library_keys, keys_set in zip(self.GetLibraryKeys(library_id), keys):
+				keys_set.update(library_keys)
+
+		for postings_dict, keys_set in zip([self.values, self.tokens], keys):
+			for key in keys_set:
+				if key not in postings_dict:
+					continue
+				postings = [posting for posting in postings_dict[key] if posting[0] not in library_ids]
+				if postings:
+					postings_dict[key] = postings
+				else:
+					postings_dict.pop(key)
+
+		for library_id in library_ids:
+			self.libraries.pop(library_id, None)
+
+	def AddLibrary(self, library_id, lib_path, digest, lib_parse):
+		components = {}
+		for component in lib_parse:
+			if 'name' not in component:
+				continue
+
+			fields = {}
+			for field, value in component.items():
+				if field == 'name' or 'empty' in field:
+					continue
+				fields[field] = value.replace('"', '').strip()
+				value = self.NormalizeValue(value)
+				if not value:
+					fields.pop(field)
+					continue
+
+				posting = [library_id, component['name'], field]
+				self.values.setdefault(value, []).append(posting)
+				for token in self.Tokenize(value):
+					self.tokens.setdefault(token, []).append(posting)
+
+			# Component name is searchable too
+			posting = [library_id, component['name'], 'name']
+			self.values.setdefault(component['name'].lower(), []).append(posting)
+
+			components[component['name']] = fields
+
+		self.values_sorted = False
+		self.libraries[library_id] = {
+			'path': lib_path,
+			'digest': digest,
+			'components': components,
+		}
+
+	def UpdateIndex(self, lib_folder, lib_files, silent = False):
+		updated = 0
+		# Inverted indexes are loaded first (all libraries are indexed again if they cannot be read)
+		for name in self.postings:
+			self.LoadPostings(name)
+
+		# Libraries are identified by absolute path (several folders can be indexed in the same file)
+		lib_paths = {os.path.abspath(lib_folder + lib): lib_folder + lib for lib in lib_files}
+		# Libraries which disappeared from the tree (libraries which were not scanned are kept)
+		removed = [library_id for library_id in self.libraries.keys() if library_id not in lib_paths and not os.path.exists(library_id)]
+
+		changed = {}
+		for library_id, lib_path in lib_paths.items():
+			# Digest of absolute paths (index can be updated from any folder)
+			digest = GetFilesDigest([library_id, GetDocumentationFile(library_id)])
+
+			if library_id in self.libraries and self.libraries[library_id]['digest'] == digest:
+				continue
+			changed[library_id] = (lib_path, digest)
+
+		self.RemoveLibraries(removed + [lib for lib in changed.keys() if lib in self.libraries])
+
+		for library_id, (lib_path, digest) in changed.items():
+			klib = KicadLibrary(lib_file=lib_path, silent=True)
+			if not klib.lib_parse:
+				continue
+			print(f'(IDX)\tIndexing {lib_path} ({len(klib.lib_parse)} components)', silent=silent)
+			self.AddLibrary(library_id, library_id, digest, klib.lib_parse)
+			updated += 1
+
+		self.sorted_values = None
+		print(f'(IDX)\t{updated} updated, {len(removed)} removed, {len(self.libraries)} libraries in index', silent=silent)
+
+		return updated + len(removed)
+
+	def Query(self, query, mode = 'exact', field = None):
+		results = []
+		query = self.NormalizeValue(query)
+
+		if mode == 'exact':
+			results = list(self.values.get(query, []))
+
+		elif mode == 'prefix':
+			if self.sorted_values is None:
+				# Values are stored sorted in index file (sorted again once libraries were added)
+				self.sorted_values = list(self.values.keys())
+				if not self.values_sorted:
+					self.sorted_values.sort()
+
+			index = bisect.bisect_left(self.sorted_values, query)
+			while index < len(self.sorted_values) and self.sorted_values[index].startswith(query):
+				results.extend(self.values[self.sorted_values[index]])
+				index += 1
+
+		elif mode == 'token':
+			# All query tokens must match the same field
+			matches = None
+			for token in self.Tokenize(query):
+				postings = set(tuple(posting) for posting in self.tokens.get(token, []))
+				matches = postings if matches is None else matches & postings
+			results = sorted(matches) if matches else []
+
+		if field:
+			# Field is matched by its column name
+			field = FIELD_SCHEMA.CleanFieldname(field)
+			results = [result for result in results if result[2] == field]
+
+		return results
+
+	def GetLibraryPath(self, library_id):
+		# Library path relative to current folder
+		return os.path.relpath(library_id)
+
+	def GetValue(self, library_id, component_name, field):
+		if field == 'name':
+			return component_name
+
+		try:
+			return self.libraries[library_id]['components'][component_name][field]
+		except KeyError:
+			return ''
+
+### FOOTPRINT INDEX CLASS
+import difflib
+
+class FootprintIndex(object):
+
+	def __init__(self, footprint_paths, cache_file = '', silent = True):
+		# Version
+		self.version = 'kicad-footprint-index-0.1'
+		# Cache file path (index is not cached if empty)
+		self.cache_file = cache_file
+		# Footprint libraries: nickname -> {'path', 'mtime', 'footprints'}
+		self.libraries = {}
+		# Footprint ids (LIBRARY:NAME)
+		self.footprints = set()
+		# Footprint name -> list of ids
+		self.names = {}
+		# Normalized footprint name -> list of ids
+		self.normalized = {}
+		# Trigram -> list of ids (built on first fuzzy search)
+		self.trigrams = None
+		# Sorted lowercase names and ids (used to match footprint filters)
+		self.sorted_names = []
+		self.sorted_ids = []
+		# Footprint filter match results
+		self.filter_matches = {}
+		# Check results
+		self.summary = {'checked': 0, 'dangling': 0, 'mapped': 0, 'filters': 0}
+
+		self.LoadCache()
+		if self.UpdateIndex(footprint_paths, silent = silent) and self.cache_file:
+			self.SaveCache()
+		self.BuildLookup()
+
+	def LoadCache(self):
+		if not self.cache_file or not os.path.exists(self.cache_file):
+			return False
+
+		try:
+			with open(self.cache_file, 'r') as cache_file:
+				cache = json.load(cache_file)
+		except:
+			print(f'[WARN]\tCannot read footprint cache file {self.cache_file}, rebuilding')
+			return False
+
+		if cache.get('version', None) != self.version:
+			print(f'[WARN]\tFootprint cache file {self.cache_file} has a different version, rebuilding')
+			return False
+
+		self.libraries = cache['libraries']
+		return True
+
+	def SaveCache(self):
+		with open(self.cache_file, 'w') as cache_file:
+			json.dump({'version': self.version, 'libraries': self.libraries}, cache_file, separators=(',', ':'))
+
+	def FindLibraries(self, footprint_path):
+		# Footprint path is either a .pretty folder or a folder containing .pretty folders
+		footprint_path = footprint_path.rstrip('/')
+		if footprint_path.endswith('.pretty'):
+			return [footprint_path]
+
+		try:
+			with os.scandir(footprint_path) as entries:
+				return sorted(entry.path for entry in entries if entry.name.endswith('.pretty') and entry.is_dir())
+		except OSError:
+			print(f'[ERROR]\tCannot read footprint folder {footprint_path}', silent=False)
+			return []
+
+	def UpdateIndex(self, footprint_paths, silent = False):
+		updated = 0
+		libraries = {}
+		for footprint_path in footprint_paths:
+			for library_path in self.FindLibraries(footprint_path):
+				nickname = os.path.basename(library_path)[:-len('.pretty')]
+				if nickname in libraries:
+					print(f'[WARN]\tFootprint library {nickname} found twice, {library_path} is ignored', silent=silent)
+					continue
+
+				# Folder modification time changes when footprints are added, removed or renamed
+				try:
+					mtime = os.stat(library_path).st_mtime_ns
+				except OSError:
+					continue
+
+				library = self.libraries.get(nickname, None)
+				if library and library['path'] == library_path and library['mtime'] == mtime:
+					libraries[nickname] = library
+					continue
+
+				with os.scandir(library_path) as entries:
+					footprints = sorted(entry.name[:-len('.kicad_mod')] for entry in entries if entry.name.endswith('.kicad_mod'))
+				libraries[nickname] = {'path': library_path, 'mtime': mtime, 'footprints': footprints}
+				updated += 1
+
+		removed = len([nickname for nickname in self.libraries if nickname not in libraries])
+		self.libraries = libraries
+		print(f'(FPT)\t{updated} updated, {removed} removed, {len(self.libraries)} footprint libraries in index', silent=silent)
+
+		return updated + removed
+
+	def NormalizeName(self, name):
+		# Ignore case and punctuation
+		return re.sub(r'[^a-z0-9]', '', name.lower())
+
+	def BuildLookup(self):
+		for nickname, library in self.libraries.items():
+			for name in library['footprints']:
+				footprint = nickname + ':' + name
+				self.footprints.add(footprint)
+				self.names.setdefault(name, []).append(footprint)
+				self.normalized.setdefault(self.NormalizeName(name), []).append(footprint)
+
+		self.sorted_ids = sorted((footprint.lower(), footprint) for footprint in self.footprints)
+		self.sorted_names = sorted((footprint.split(':', 1)[1].lower(), footprint) for footprint in self.footprints)
+
+	def GetTrigrams(self, name):
+		name = self.NormalizeName(name)
+		return {name[i:i + 3] for i in range(max(len(name) - 2, 1))}
+
+	def Exists(self, footprint):
+		return footprint.strip('"') in self.footprints
+
+	def Suggest(self, footprint):
+		# Return suggested footprint ids, and whether a single suggestion can be used as replacement
+		footprint = footprint.strip('"')
+		name = footprint.split(':', 1)[-1]
+
+		# Same footprint name in other libraries, then same name ignoring case and punctuation
+		for candidates in [self.names.get(name, []), self.normalized.get(self.NormalizeName(name), [])]:
+			if candidates:
+				return candidates[:FOOTPRINT_SUGGESTIONS], len(candidates) == 1
+
+		# Fuzzy search: candidates sharing most trigrams are ranked by similarity
+		if self.trigrams is None:
+			self.trigrams = {}
+			for footprint_id in self.footprints:
+				for trigram in self.GetTrigrams(footprint_id.split(':', 1)[1]):
+					self.trigrams.setdefault(trigram, []).append(footprint_id)
+
+		# Trigrams shared by most footprints (common prefixes and suffixes) are skipped if rarer trigrams exist
+		postings = sorted((self.trigrams.get(trigram, []) for trigram in self.GetTrigrams(name)), key = len)
+		postings = [posting for index, posting in enumerate(postings) if index == 0 or len(posting) <= max(len(self.footprints) // 10, 100)]
+		scores = collections.Counter()
+		for posting in postings:
+			scores.update(posting)
+
+		matcher = difflib.SequenceMatcher(b = name.lower())
+		suggestions = []
+		for candidate, score in scores.most_common(50):
+			matcher.set_seq1(candidate.split(':', 1)[1].lower())
+			ratio = matcher.ratio()
+			if ratio >= FOOTPRINT_SIMILARITY:
+				suggestions.append((ratio, candidate))
+
+		return [candidate for ratio, candidate in sorted(suggestions, key = lambda item: (-item[0], item[1]))[:FOOTPRINT_SUGGESTIONS]], False
+
+	def MatchFilter(self, pattern):
+		# Footprint filters match footprint names (or ids if the filter has a library nickname), ignoring case
+		if pattern not in self.filter_matches:
+			pattern_lower = pattern.lower()
+			items = self.sorted_ids if ':' in pattern_lower else self.sorted_names
+			# Only names starting with the filter literal prefix are compared
+			prefix = re.split(r'[*?\[]', pattern_lower, 1)[0]
+			index = bisect.bisect_left(items, (prefix,))
+			match = False
+			while index < len(items) and items[index][0].startswith(prefix):
+				if fnmatch.fnmatchcase(items[index][0], pattern_lower):
+					match = True
+					break
+				index += 1
+			self.filter_matches[pattern] = match
+
+		return self.filter_matches[pattern]
+
+	def CheckComponent(self, footprint, fplist = []):
+		# Return details of dangling footprint and footprint filters
+		details = []
+		footprint = footprint.strip('"')
+		if footprint and not self.Exists(footprint):
+			suggestions = self.Suggest(footprint)[0]
+			details.append(f'footprint {footprint} not found' + (f' (suggested: {", ".join(suggestions)})' if suggestions else ''))
+
+		for pattern in fplist:
+			if not self.MatchFilter(pattern):
+				details.append(f'footprint filter {pattern} does not match any footprint')
+
+		return details
+
+	def CheckParts(self, klib, auto_map = False, silent = False):
+		# Flag dangling footprints of CSV parts (and filters of library components), map them if a single replacement is found
+		for part in klib.csv_parse:
+			footprint = part.get('footprint', '')
+			if not footprint.strip('"'):
+				continue
+
+			self.summary['checked'] += 1
+			if self.Exists(footprint):
+				continue
+
+			self.summary['dangling'] += 1
+			suggestions, unique = self.Suggest(footprint)
+			if auto_map and unique:
+				part['footprint'] = '"' + suggestions[0] + '"' if footprint.startswith('"') else suggestions[0]
+				self.summary['mapped'] += 1
+				print(f'(F.map) {part.get("name", "")}: {footprint} -> {part["footprint"]}', silent=silent)
+			else:
+				print(f'[FOOTPRINT]\t{klib.name}\t{part.get("name", "")}\t{footprint.strip(chr(34))}\t' + (', '.join(suggestions) if suggestions else '-'))
+
+		for component in klib.library.components:
+			for pattern in component.fplist:
+				if not self.MatchFilter(pattern):
+					self.summary['filters'] += 1
+					print(f'[FPLIST]\t{klib.name}\t{component.name}\t{pattern}')
+
+	def PrintSummary(self):
+		print(f'(FPT)\t{self.summary["checked"]} footprints checked: {self.summary["dangling"]} dangling ({self.summary["mapped"]} mapped), '
+			  f'{self.summary["filters"]} footprint filters without match')
+
+### BATCH CLASS
+class BatchRunner(object):
+
+	# Supported batch operations
+	OPERATIONS = ['export', 'update', 'add_field', 'query']
+
+	def __init__(self, cache_size = BATCH_CACHE_SIZE, cache_memory = BATCH_CACHE_MEMORY, silent = False):
+		# Loaded libraries (least recently used first): library file -> (library instance, file size)
+		self.cache = collections.OrderedDict()
+		self.cache_size = cache_size
+		# Memory cap is approximated by the size of loaded library files
+		self.cache_memory = cache_memory * (1 << 20)
+		self.cache_used = 0
+		# Loaded search indexes
+		self.indexes = {}
+		self.silent = silent
+		self.stats = {'operations': 0, 'errors': 0, 'loads': 0, 'hits': 0, 'saves': 0}
+
+	def GetLibrary(self, lib_file):
+		lib_file = os.path.normpath(lib_file)
+		if lib_file in self.cache:
+			self.cache.move_to_end(lib_file)
+			self.stats['hits'] += 1
+			return self.cache[lib_file][0]
+
+		klib = KicadLibrary(name=SplitExtension(os.path.basename(lib_file))[0], lib_file=lib_file, silent=self.silent)
+		if not klib.lib_parse:
+			return None
+		# Modified libraries are saved once, at the end of the batch or when released from cache
+		klib.deferred_save = True
+		self.stats['loads'] += 1
+
+		size = os.path.getsize(lib_file)
+		self.cache[lib_file] = (klib, size)
+		self.cache_used += size
+		self.ReleaseLibraries()
+
+		return klib
+
+	def ReleaseLibraries(self):
+		# Release least recently used libraries (last loaded library is always kept)
+		while len(self.cache) > 1 and (len(self.cache) > self.cache_size or self.cache_used > self.cache_memory):
+			lib_file, (klib, size) = self.cache.popitem(last = False)
+			self.cache_used -= size
+			self.SaveLibrary(klib)
+
+	def SaveLibrary(self, klib):
+		if klib.modified and LIB_SAVE:
+			klib.library.save()
+			klib.modified = False
+			self.stats['saves'] += 1
+
+	def Run(self, batch_input):
+		for line_number, line in enumerate(batch_input, 1):
+			line = line.strip()
+			if not line or line[0] == '#':
+				continue
+
+			try:
+				operation = json.loads(line)
+				op = operation['op']
+			except (ValueError, KeyError, TypeError) as error:
+				print(f'[ERROR]\tBatch line {line_number}: invalid operation ({error})')
+				self.stats['errors'] += 1
+				continue
+
+			if op not in self.OPERATIONS:
+				print(f'[ERROR]\tBatch line {line_number}: unknown operation "{op}"')
+				self.stats['errors'] += 1
+				continue
+
+			print(f'\n[ B{line_number} :\t{op} {operation.get("lib", operation.get("query", ""))} ]', silent=self.silent)
+			self.stats['operations'] += 1
+			try:
+				if not getattr(self, 'Run' + ''.join(word.capitalize() for word in op.split('_')))(operation):
+					self.stats['errors'] += 1
+			except KeyError as error:
+				print(f'[ERROR]\tBatch line {line_number}: missing {error} argument')
+				self.stats['errors'] += 1
+			except OSError as error:
+				print(f'[ERROR]\tBatch line {line_number}: {error}')
+				self.stats['errors'] += 1
+
+		# Save each modified library once
+		for klib, size in self.cache.values():
+			self.SaveLibrary(klib)
+
+		print(f'\nBatch complete: {self.stats["operations"]} operations ({self.stats["errors"]} errors), '
+			  f'{self.stats["loads"]} libraries loaded ({self.stats["hits"]} cache hits), {self.stats["saves"]} saved', silent=self.silent)
+
+		return self.stats['errors'] == 0
+
+	def RunExport(self, operation):
+		klib = self.GetLibrary(operation['lib'])
+		if not klib:
+			return False
+
+		csv_file = operation['csv']
+		if operation.get('sync', False):
+			klib.csv_file = csv_file
+			klib.SyncLibraryToCSV(silent = self.silent)
+			return True
+
+		if os.path.exists(csv_file) and os.path.getsize(csv_file) and not operation.get('force', False):
+			print(f'[ERROR]\tAborting Export: CSV file aleady exist and contains data')
+			return False
+
+		klib.csv_file = csv_file
+		klib.ExportLibraryToCSV(silent = self.silent)
+		return True
+
+	def RunUpdate(self, operation):
+		klib = self.GetLibrary(operation['lib'])
+		if not klib:
+			return False
+
+		klib.ParseCSV(operation['csv'])
+		if not klib.csv_parse:
+			print(f'[ERROR]\tCSV file {operation["csv"]} is empty')
+			return False
+
+		update = UpdateHandler(template = operation.get('template', None), global_field = operation.get('field', ''), global_field_default = operation.get('default', ''), silent = self.silent)
+		LibraryPipeline([update], silent = self.silent).Run(klib)
+
+		# Refresh parse for next operations
+		klib.lib_parse = klib.ParseLibrary()
+		klib.csv_parse = None
+		return True
+
+	def RunAddField(self, operation):
+		klib = self.GetLibrary(operation['lib'])
+		if not klib:
+			return False
+
+		rules = LibraryRules(global_field = operation['field'], global_field_default = operation.get('default', ''))
+		rules.ApplyToLibrary(klib, silent = self.silent)
+
+		# Refresh parse for next operations
+		klib.lib_parse = klib.ParseLibrary()
+		return True
+
+	def RunQuery(self, operation):
+		# Index is read from file (libraries modified in this batch are not re-indexed)
+		index_file = operation['index']
+		if index_file not in self.indexes:
+			self.indexes[index_file] = LibraryIndex(index_file)
+		index = self.indexes[index_file]
+
+		for library_id, component_name, field in index.Query(operation['query'], mode = operation.get('mode', 'exact'), field = operation.get('field', None)):
+			print(f'{index.GetLibraryPath(library_id)}\t{component_name}\t{field}\t{index.GetValue(library_id, component_name, field)}')
+		return True
 
 # MAIN
 if __name__ == '__main__':
@@ -889,40 +3483,141 @@ if __name__ == '__main__':
 						help = 'Show program\'s version number and exit')
 	parser.add_argument('-d', '--debug', action='store_true',
 						help = 'Display debug verbose')
-	parser.add_argument('LIB_PATH',
-						help = 'KiCad symbol library folder or file (.lib files)')
-	parser.add_argument('CSV_PATH',
-						help = 'KiCad symbol CSV folder or file (.csv files)')
+	parser.add_argument('LIB_PATH', nargs='?', default = '',
+						help = 'KiCad symbol library folder or file (.lib or .kicad_sym files, .lib files can be compressed: .gz, .xz, .zst (when available))')
+	parser.add_argument('CSV_PATH', nargs='?', default = '',
+						help = 'KiCad symbol CSV folder or file (.csv or .jsonl files, can be compressed: .gz, .xz, .zst (when available); "-" for JSON-lines on standard output/input)')
 	parser.add_argument('-e', '--export_csv', action='store_true',
 						help = 'Export LIB file(s) as CSV file(s)')
 	parser.add_argument('-u', '--update_lib', action='store_true',
 						help = 'Update LIB file(s) from CSV file(s)')
 	parser.add_argument('-f', '--force_write', action='store_true',
 						help = 'Overwrite for LIB and CSV files')
+	parser.add_argument('-s', '--sync_csv', action='store_true',
+						help = 'Sync existing CSV file(s) with LIB file(s): only changed, added and removed rows are written (after update with -u)')
 	parser.add_argument('-t', '--template', required = False, default = '',
-					help = 'Path to symbol template file (.lib) used to add component')
+					help = 'Path to symbol template file (.lib or .kicad_sym, same format as LIB file) used to add component')
 	parser.add_argument('-a', '--add_global_field', required = False, default = '',
 						help = 'Add global field to all components in library', metavar=('GLOBAL_FIELD'))
 	parser.add_argument('-g', '--global_field_default', required = False, default = '',
 						help = 'Default value for global field', metavar=('DEFAULT_VALUE'))
+	parser.add_argument('-i', '--index', required = False, default = '',
+						help = 'Build or update field-value search index of LIB file(s)', metavar=('INDEX_FILE'))
+	parser.add_argument('-q', '--query', required = False, default = '',
+						help = 'Search field values in index (requires --index)', metavar=('QUERY'))
+	parser.add_argument('--query_mode', required = False, default = 'exact', choices = LibraryIndex.QUERY_MODES,
+						help = 'Search mode for query (default: exact)')
+	parser.add_argument('--query_field', required = False, default = '',
+						help = 'Restrict query to field', metavar=('FIELD'))
+	parser.add_argument('--format', required = False, default = 'csv', choices = ['csv', 'jsonl'],
+						help = 'Format of files in CSV folder (default: csv)')
+	parser.add_argument('-c', '--combined_csv', action='store_true',
+						help = 'Use a single CSV file (with a "library" column) for all LIB files')
+	parser.add_argument('--include', required = False, action = 'append', default = [],
+						help = 'Only process files matching glob pattern (relative to folder, repeatable)', metavar=('PATTERN'))
+	parser.add_argument('--exclude', required = False, action = 'append', default = [],
+						help = 'Skip files matching glob pattern (relative to folder, repeatable)', metavar=('PATTERN'))
+	parser.add_argument('--log_level', required = False, default = 'info', choices = Logger.LEVELS,
+						help = 'Output level (default: info)')
+	parser.add_argument('--change_log', required = False, default = '',
+						help = 'Append changes made to LIB file(s) to JSON-lines file', metavar=('CHANGE_LOG_FILE'))
+	parser.add_argument('-b', '--batch', required = False, default = '',
+						help = 'Run operations from JSON-lines file ("-" for standard input)', metavar=('BATCH_FILE'))
+	parser.add_argument('--batch_memory', required = False, default = BATCH_CACHE_MEMORY, type = int,
+						help = f'Maximum size of libraries kept loaded in batch mode (MB, default: {BATCH_CACHE_MEMORY})', metavar=('MB'))
+	parser.add_argument('-r', '--rules', required = False, default = '',
+						help = 'Apply transformation rules file (.json) to LIB file(s)', metavar=('RULES_FILE'))
+	parser.add_argument('--dry_run', action='store_true',
+						help = 'Report parts affected by rules without saving LIB file(s) (cannot be used with -u, -a or -s)')
+	parser.add_argument('--check', nargs='*', choices=LibraryChecker.CHECKS, default=None,
+						help = 'Check LIB file(s) (all checks if none is given), with or without export/update', metavar=('CHECK'))
+	parser.add_argument('--footprints', required = False, action = 'append', default = [],
+						help = 'Check footprints against .pretty folder(s) found in folder (repeatable)', metavar=('FOOTPRINT_PATH'))
+	parser.add_argument('--footprint_cache', required = False, default = '',
+						help = 'Cache footprint index in file (rebuilt for modified .pretty folders)', metavar=('CACHE_FILE'))
+	parser.add_argument('--footprint_map', action='store_true',
+						help = 'Replace dangling footprints with a single matching footprint on update')
+	parser.add_argument('--draw_report', action='store_true',
+						help = 'Report drawings shared between components of LIB file(s)')
+	parser.add_argument('--svg', required = False, default = '',
+						help = 'Render symbol thumbnails of LIB file(s) to folder (cached by drawing), linked in exported CSV file(s)', metavar=('SVG_FOLDER'))
+	parser.add_argument('--dedupe', nargs='?', required = False, default = None, const = DEDUPE_SIMILARITY, type = float,
+						help = f'Report duplicate and near-duplicate components of LIB file(s) (minimum similarity, default: {DEDUPE_SIMILARITY})', metavar=('SIMILARITY'))
+	parser.add_argument('--diff_lib', nargs=2, required = False, default = None,
+						help = 'Compare LIB files or folders (added, removed, renamed and changed components)', metavar=('LIB_A', 'LIB_B'))
 
 	args = parser.parse_args()
 	###
 
+	if args.query and not args.index:
+		parser.error('--query requires --index')
+	if not args.LIB_PATH and not (args.query or args.batch or args.diff_lib):
+		parser.error('the following arguments are required: LIB_PATH')
+	if not args.CSV_PATH and not (args.index or args.rules or args.batch or args.draw_report or args.diff_lib or args.svg or args.check is not None or args.dedupe is not None):
+		parser.error('the following arguments are required: CSV_PATH')
+	if args.dry_run and (args.update_lib or args.sync_csv or (args.add_global_field and not args.rules)):
+		parser.error('--dry_run cannot be used with --update_lib, --sync_csv or --add_global_field (without --rules)')
+	if args.sync_csv and (args.combined_csv or args.CSV_PATH == '-'):
+		parser.error('--sync_csv cannot be used with --combined_csv or standard output')
+	if (args.footprint_map or (args.check and 'dangling_footprints' in args.check)) and not args.footprints:
+		parser.error('--footprint_map and dangling_footprints check require --footprints')
+
+	# Reports run alone, library operations run together in a single pass (after index update)
+	reports = [option for option, used in [('--batch', args.batch), ('--diff_lib', args.diff_lib), ('--query', args.query),
+		('--draw_report', args.draw_report), ('--dedupe', args.dedupe is not None)] if used]
+	operations = [option for option, used in [('--export_csv', args.export_csv), ('--update_lib', args.update_lib),
+		('--sync_csv', args.sync_csv), ('--rules', args.rules), ('--check', args.check is not None), ('--svg', args.svg)] if used]
+	if args.index and not args.query and reports and reports[0] in ['--batch', '--diff_lib']:
+		operations.append('--index')
+	if reports and (len(reports) > 1 or operations):
+		parser.error(f'{reports[0]} cannot be used with {", ".join(reports[1:] + operations)}')
+
 	# Enable debug
 	if args.debug:
 		DEBUG_DEEP = True
+		LOGGER.SetLevel('debug')
+	else:
+		LOGGER.SetLevel(args.log_level)
+
+	if args.change_log:
+		LOGGER.OpenChangeLog(args.change_log)
 
 	lib_files = []
 	csv_files = []
 	is_file = False
 
+	# Run batch operations
+	if args.batch:
+		batch = BatchRunner(cache_memory = args.batch_memory, silent = not(VERBOSE))
+		if args.batch == '-':
+			success = batch.Run(sys.stdin)
+		else:
+			with open(args.batch, 'r') as batch_input:
+				success = batch.Run(batch_input)
+		exit(0 if success else -1)
+
+	# Compare libraries (no library parsing)
+	if args.diff_lib:
+		diff = LibraryDiff(include = args.include, exclude = args.exclude)
+		diff.DiffPaths(*args.diff_lib)
+		exit(-1 if diff.PrintSummary() else 0)
+
+	# Query index only (no library parsing)
+	if args.query:
+		index = LibraryIndex(args.index)
+		start = time.perf_counter()
+		results = index.Query(args.query, mode = args.query_mode, field = args.query_field)
+		for library_id, component_name, field in results:
+			print(f'{index.GetLibraryPath(library_id)}\t{component_name}\t{field}\t{index.GetValue(library_id, component_name, field)}')
+		print(f'({len(results)} results in {(time.perf_counter() - start) * 1000:.1f} ms)', silent=not(DEBUG_DEEP))
+		exit(0)
+
 	# Check and store library folder
 	if args.LIB_PATH[-1] == '/':
 		# Path = Folder
 		LIB_FOLDER = args.LIB_PATH
 	else:
-		if args.LIB_PATH[-4:] == '.lib':
+		if SplitExtension(args.LIB_PATH)[1] in LIB_EXTENSIONS:
 			try:
 				# Path leads to file
 				lib_files.append(args.LIB_PATH.split('/')[-1])
@@ -937,11 +3632,24 @@ if __name__ == '__main__':
 			LIB_FOLDER = args.LIB_PATH + '/'
 
 	# Check and store CSV folder
-	if args.CSV_PATH[-1] == '/':
+	if not args.CSV_PATH:
+		# CSV folder not used
+		pass
+	elif args.CSV_PATH == '-':
+		# JSON-lines records on standard output/input, messages are written to standard error
+		record_output = sys.stdout
+		sys.stdout = sys.stderr
+	elif args.combined_csv:
+		# Single CSV file for all libraries
+		if SplitExtension(args.CSV_PATH)[1] != '.csv':
+			print(f'[ERROR]\t{args.CSV_PATH} is not a CSV file (required by --combined_csv)', silent=False)
+			exit(-1)
+		CSV_FOLDER = os.path.dirname(args.CSV_PATH) + '/'
+	elif args.CSV_PATH[-1] == '/':
 		# Path = Folder
 		CSV_FOLDER = args.CSV_PATH
 	else:
-		if args.CSV_PATH[-4:] == '.csv':
+		if SplitExtension(args.CSV_PATH)[1] in CSV_EXTENSIONS:
 			try:
 				# Path leads to file
 				csv_files.append(args.CSV_PATH.split('/')[-1])
@@ -958,18 +3666,102 @@ if __name__ == '__main__':
 	# Find all library files in folder
 	print(f'lib_folder =\t{LIB_FOLDER}', silent=not(DEBUG_DEEP))
 	if LIB_FOLDER and not is_file:
-		for dirpath, folders, files in os.walk(LIB_FOLDER):
-			for file in files:
-				if '.lib' in file and file not in lib_files:
-					lib_files.append(file)
+		lib_files = FindFiles(LIB_FOLDER, LIB_EXTENSIONS, include = args.include, exclude = args.exclude)
 	
 	# Find all CSV files in folder
 	print(f'csv_folder =\t{CSV_FOLDER}', silent=not(DEBUG_DEEP))
-	if CSV_FOLDER and not is_file:
-		for dirpath, folders, files in os.walk(CSV_FOLDER):
-			for file in files:
-				if '.csv' in file and file not in csv_files:
-					csv_files.append(file)
+	if CSV_FOLDER and not is_file and not args.combined_csv:
+		csv_files = FindFiles(CSV_FOLDER, ['.' + args.format], include = args.include, exclude = args.exclude)
+
+	# Build or update index
+	if args.index:
+		index = LibraryIndex(args.index)
+		if index.UpdateIndex(LIB_FOLDER, sorted(lib_files), silent=not(VERBOSE)):
+			index.SaveIndex()
+
+		if not (operations or args.draw_report or args.dedupe is not None):
+			exit(0)
+
+	# Load footprint index
+	footprints = FootprintIndex(args.footprints, cache_file = args.footprint_cache, silent = not(VERBOSE)) if args.footprints else None
+
+	# Load symbol thumbnails cache
+	renderer = SymbolRenderer(args.svg, silent = not(VERBOSE)) if args.svg else None
+
+	# Check libraries and render thumbnails (only)
+	checker = LibraryChecker(args.check, footprints = footprints) if args.check is not None else None
+	if (checker or renderer) and not (args.export_csv or args.update_lib or args.sync_csv or args.rules):
+		pipeline = LibraryPipeline([handler for handler in [renderer, checker] if handler], silent = not(VERBOSE))
+		for lib in sorted(lib_files):
+			klib = KicadLibrary(name=SplitExtension(lib)[0], lib_file=LIB_FOLDER + lib, silent=not(VERBOSE))
+			pipeline.Run(klib)
+		pipeline.Close()
+		if renderer:
+			renderer.PrintSummary()
+		exit(-1 if checker and checker.PrintSummary() else 0)
+
+	# Report drawings shared between components
+	if args.draw_report:
+		PrintDrawReport(LIB_FOLDER, sorted(lib_files))
+		exit(0)
+
+	# Report duplicate components (no library parsing)
+	if args.dedupe is not None:
+		dedupe = LibraryDedupe(similarity = args.dedupe, silent = not(VERBOSE))
+		dedupe.AddLibraries(LIB_FOLDER, sorted(lib_files))
+		dedupe.Report()
+		exit(-1 if dedupe.PrintSummary() else 0)
+
+	# Export or update libraries through standard output/input
+	if args.CSV_PATH == '-':
+		if args.export_csv and not args.update_lib:
+			ExportLibrariesToJSONL(record_output, LIB_FOLDER, sorted(lib_files), silent = not(VERBOSE))
+		elif args.update_lib and not args.export_csv:
+			try:
+				UpdateLibrariesFromJSONL(ReadRecords(sys.stdin), LIB_FOLDER, sorted(lib_files), template = args.template if args.template else None,
+										 global_field = args.add_global_field, global_field_default = args.global_field_default,
+										 default_library = SplitExtension(lib_files[0])[0] if is_file else None, silent = not(VERBOSE))
+			except ValueError as error:
+				print(f'[ERROR]\tCannot read records from standard input: {error}', silent=False)
+				exit(-1)
+		exit(0)
+
+	# Export or update all libraries using a single CSV file
+	if args.combined_csv:
+		combined_csv = CombinedCSV(args.CSV_PATH)
+		if args.export_csv and not args.update_lib:
+			combined_csv.Export(LIB_FOLDER, sorted(lib_files), force_write = args.force_write, silent = not(VERBOSE))
+		elif args.update_lib and not args.export_csv:
+			if args.global_field_default and not args.add_global_field:
+				print(f'[ERROR]\tMissing -add_global_field argument', silent=not(VERBOSE))
+			combined_csv.Update(LIB_FOLDER, sorted(lib_files), template = args.template if args.template else None,
+								global_field = args.add_global_field, global_field_default = args.global_field_default, silent = not(VERBOSE))
+		exit(0)
+
+	# Load transformation rules (global field is added to CSV parts on update)
+	rules = None
+	if args.rules:
+		try:
+			rules = LibraryRules(args.rules, global_field = args.add_global_field if not args.update_lib else '', global_field_default = args.global_field_default)
+		except Exception as error:
+			print(f'[ERROR]\tCannot load rules file {args.rules}: {error}', silent=False)
+			exit(-1)
+
+	# Apply transformation rules directly to libraries (then render thumbnails and check)
+	if rules and not (args.export_csv or args.update_lib or args.sync_csv):
+		pipeline = LibraryPipeline([handler for handler in [rules, renderer, checker] if handler], dry_run = args.dry_run, silent = not(VERBOSE))
+		for lib in sorted(lib_files):
+			lib_name = SplitExtension(lib)[0]
+			print(f'\n[[ {lib_name.upper()} ]]', silent=not(VERBOSE))
+			klib = KicadLibrary(name=lib_name, lib_file=LIB_FOLDER + lib, silent=not(VERBOSE))
+			if klib.lib_parse:
+				pipeline.Run(klib)
+		pipeline.Close()
+
+		rules.PrintSummary(dry_run = args.dry_run)
+		if renderer:
+			renderer.PrintSummary()
+		exit(-1 if checker and checker.PrintSummary() else 0)
 
 	lib_to_csv = {}
 
@@ -987,25 +3779,8 @@ if __name__ == '__main__':
 				print(f'[ERROR]\tMissing LIB and CSV file', silent=False)
 				exit(-1)
 	else:
-		# Match lib and csv files by name
-		for lib in sorted(lib_files):
-			try:
-				lib_name = lib.split('.')[0]
-			except:
-				lib_name = lib
-			for csv in sorted(csv_files):
-				try:
-					csv_name = csv.split('.')[0]
-				except:
-					csv_name = csv
-
-				if lib_name == csv_name:
-					lib_to_csv[lib] = csv
-					break
-
-			# Did not find match
-			if lib not in lib_to_csv:
-				lib_to_csv[lib] = ''
+		# Match lib and csv files by relative path (missing CSV files are left empty)
+		lib_to_csv = MatchFiles(lib_files, csv_files)
 
 	print(f'lib_files =\t{sorted(lib_files)}\ncsv_files =\t{sorted(csv_files)}\nlib_to_csv =\n', end='', silent=not(DEBUG_DEEP))
 	print(lib_to_csv, silent=not(DEBUG_DEEP))
@@ -1016,55 +3791,48 @@ if __name__ == '__main__':
 	else:
 		symbol_template_file = None
 
+	# Operations run on each library in a single traversal (library is saved once)
+	pipeline = LibraryPipeline(dry_run = args.dry_run, silent = not(VERBOSE))
+	if args.update_lib and not args.export_csv:
+		if args.global_field_default and not args.add_global_field:
+			print(f'[ERROR]\tMissing -add_global_field argument', silent=not(VERBOSE))
+		pipeline.AddHandler(UpdateHandler(template = symbol_template_file, global_field = args.add_global_field, global_field_default = args.global_field_default,
+										  footprints = footprints, footprint_map = args.footprint_map, silent = not(VERBOSE)))
+	if rules:
+		pipeline.AddHandler(rules)
+	if renderer:
+		pipeline.AddHandler(renderer)
+	if args.sync_csv or (args.export_csv and not args.update_lib):
+		pipeline.AddHandler(ExportHandler(force_write = args.force_write, sync = args.sync_csv, silent = not(VERBOSE)))
+	if checker:
+		pipeline.AddHandler(checker)
+
 	for lib, csv in lib_to_csv.items():
-		try:
-			lib_name = lib.split('.')[0]
-		except:
-			lib_name = lib
+		lib_name = SplitExtension(lib)[0]
 
 		# Append CSV file name if empty
 		if not csv:
-			csv = lib_name + '.csv'
+			csv = lib_name + '.' + args.format
 		print(f'\n[[ {lib_name.upper()} ]]', silent=not(VERBOSE))
 
-		# Define library instance
-		klib = KicadLibrary(name=lib_name, lib_file=LIB_FOLDER + lib, csv_file=CSV_FOLDER + csv, export=args.export_csv, silent=not(VERBOSE))
+		# Define library instance (CSV file is not parsed when it is only synced)
+		read_csv = args.update_lib or not args.sync_csv
+		klib = KicadLibrary(name=lib_name, lib_file=LIB_FOLDER + lib, csv_file=CSV_FOLDER + csv if read_csv else None, export=args.export_csv, silent=not(VERBOSE))
+		if not read_csv:
+			klib.csv_file = CSV_FOLDER + csv
 
-		# Export library to CSV
-		if args.export_csv and not args.update_lib:
-			if not klib.csv_parse:
-				klib.ExportLibraryToCSV()
-			else:
-				if args.force_write:
-					klib.ExportLibraryToCSV()
-				else:
-					print(f'[ERROR]\tAborting Export: CSV file aleady exist and contains data', silent=not(VERBOSE))
-
-		# Update library from CSV
-		if not args.export_csv and args.update_lib:
-			if klib.lib_parse and klib.csv_parse:
-				
-				if args.add_global_field:
-					global_field = args.add_global_field.lower()
-					klib.fieldname_lookup_table[global_field] = '"' + args.add_global_field + '"'
-
-					if args.global_field_default:
-						default_value = '"' + args.global_field_default + '"'
-					else:
-						default_value = '""'
-					print(f'default value = {default_value}', silent=not(DEBUG_DEEP))
-
-					# Process all CSV parts
-					if klib.csv_parse:
-						for part in klib.csv_parse:
-							print(f'Adding {global_field} to {part["name"]}', silent=not(DEBUG_DEEP))
-							try:
-								if not part[global_field]:
-									part[global_field] = default_value
-							except:
-								part.update({global_field : default_value})
-				else:
-					if args.global_field_default:
-						print(f'[ERROR]\tMissing -add_global_field argument', silent=not(VERBOSE))
+		# Update, apply rules, export and check library
+		pipeline.Run(klib)
+	pipeline.Close()
+
+	if footprints and args.update_lib:
+		footprints.PrintSummary()
+
+	if rules:
+		rules.PrintSummary(dry_run = args.dry_run)
+
+	if renderer:
+		renderer.PrintSummary()
 
-				klib.UpdateLibraryFromCSV(template = symbol_template_file, silent = not(VERBOSE))
+	if checker:
+		checker.PrintSummary()
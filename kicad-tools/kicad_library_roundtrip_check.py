@@ -0,0 +1,405 @@
+#!/usr/bin/env python
+import sys, os, argparse, random, tempfile, shutil
+from concurrent.futures import ProcessPoolExecutor
+
+# Import KiCad schematic library utils
+FILE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(FILE_DIR + '/kicad-library-utils')
+from schlib.schlib import SchLib
+from schlib.kicad_sym import SymLib
+
+### VERSION
+__version_info__ = ('0', '1', '0')
+__version__ = '.'.join(__version_info__)
+
+### GLOBAL SETTINGS
+# Component attributes compared between reference and optimized parse
+COMPONENT_ATTRIBUTES = ['name', 'reference', 'comments', 'definition', 'fields', 'fplist', 'aliases', 'documentation', 'draw', 'drawOrdered', 'checksum']
+# Component attributes compared between KiCad 6+ symbol parses
+SYMBOL_ATTRIBUTES = ['name', 'reference', 'definition', 'fplist', 'documentation']
+# Supported library file extensions
+LIB_EXTENSIONS = ['.lib', '.kicad_sym']
+
+# Characters used to generate random field values (double-quotes are escaped)
+FUZZ_CHARACTERS = 'abcXYZ019 -_.,:;/~*?%()[]{}\'"\\'
+FUZZ_FIELDNAMES = ['"Manufacturer"', '"Manufacturer Part Number"', '"Supplier"', '"Variant"', '"Temp, Range"', '"Note"']
+
+### ROUND TRIP CHECKS
+def ReadBytes(file):
+	try:
+		with open(file, 'rb') as f:
+			return f.read()
+	except OSError:
+		return None
+
+def ReadSource(file):
+	# Source file as saved (a final newline is always written)
+	data = ReadBytes(file)
+	if data and not data.endswith(b'\n'):
+		data += b'\n'
+	return data
+
+def FirstDifference(data, other_data):
+	# Return first line which differs between two outputs (line endings included)
+	lines = data.splitlines(keepends = True)
+	other_lines = other_data.splitlines(keepends = True)
+	for index, (line, other_line) in enumerate(zip(lines, other_lines)):
+		if line != other_line:
+			text = line.rstrip(b'\r\n')
+			other_text = other_line.rstrip(b'\r\n')
+			if text == other_text:
+				ending = line[len(text):]
+				other_ending = other_line[len(other_text):]
+				if not (ending and other_ending):
+					return f'line {index + 1}: final newline differs ({ending!r} != {other_ending!r})'
+				return f'line {index + 1}: line ending differs ({ending!r} != {other_ending!r})'
+			return f'line {index + 1}: {line!r} != {other_line!r}'
+	if len(lines) != len(other_lines):
+		return f'line {min(len(lines), len(other_lines)) + 1}: {len(lines)} != {len(other_lines)} lines'
+	# Lines are equal (not expected): report first differing byte
+	offset = next((index for index, (byte, other_byte) in enumerate(zip(data, other_data)) if byte != other_byte), min(len(data), len(other_data)))
+	return f'byte {offset}: {len(data)} != {len(other_data)} bytes'
+
+def CompareOutputs(label, data, other_data):
+	if data == other_data:
+		return []
+	if data is None or other_data is None:
+		return [f'{label}: file is missing']
+	return [f'{label}: {FirstDifference(data, other_data)}']
+
+def CompareModels(label, library, other_library, sort = False):
+	# Compare parsed libraries field by field (components sorted by name if set, as saved)
+	differences = []
+	if library.header != other_library.header:
+		differences.append(f'{label}: header differs')
+	if library.documentation.components != other_library.documentation.components:
+		differences.append(f'{label}: documentation differs')
+
+	components = library.components
+	other_components = other_library.components
+	if sort:
+		components = sorted(components, key = lambda component: component.name)
+		other_components = sorted(other_components, key = lambda component: component.name)
+
+	names = [component.name for component in components]
+	other_names = [component.name for component in other_components]
+	if names != other_names:
+		index = next((index for index, (name, other_name) in enumerate(zip(names, other_names)) if name != other_name), min(len(names), len(other_names)))
+		differences.append(f'{label}: components differ at index {index} ({len(names)} != {len(other_names)} components)')
+		return differences
+
+	for component, other_component in zip(components, other_components):
+		for attribute in COMPONENT_ATTRIBUTES:
+			if getattr(component, attribute) != getattr(other_component, attribute):
+				differences.append(f'{label}: {component.name} {attribute} differs')
+
+	return differences
+
+def CheckClones(library):
+	# Clones must be equal to their component
+	differences = []
+	for component in library.components:
+		clone = component.clone()
+		for attribute in COMPONENT_ATTRIBUTES:
+			if getattr(component, attribute) != getattr(clone, attribute):
+				differences.append(f'clone: {component.name} {attribute} differs')
+	return differences
+
+def CheckSharedDraws(library):
+	# Identical DRAW sections are shared (unparsed): editing one component must not change the others
+	differences = []
+	components = {}
+	for component in library.components:
+		components.setdefault(component.draw_digest, []).append(component)
+
+	for shared_components in components.values():
+		if len(shared_components) < 2 or not shared_components[0].drawOrdered:
+			continue
+		component, other_component = shared_components[:2]
+		element = component.drawOrdered[0][1]
+		key = next(iter(element))
+		element[key] = 'EDITED'
+		if other_component.drawOrdered[0][1][key] == 'EDITED':
+			differences.append(f'shared draw: {other_component.name} changed with {component.name}')
+	return differences
+
+def CheckLibrary(lib_file, source_check = True):
+	# Return list of failures for library file
+	if os.path.splitext(lib_file)[1] == '.kicad_sym':
+		return CheckSymLibrary(lib_file, source_check)
+
+	failures = []
+	dcm_file = os.path.splitext(lib_file)[0] + '.dcm'
+	temp_folder = tempfile.mkdtemp()
+	try:
+		try:
+			reference = SchLib(lib_file)
+			optimized = SchLib(lib_file, draw_raw = True)
+		except Exception as error:
+			return [f'parse: {error!r}']
+
+		if not reference.validFile:
+			return ['parse: invalid library file']
+
+		# Save before models are compared: raw DRAW sections are written as is until they are parsed
+		outputs = {}
+		for mode, library in [('reference', reference), ('optimized', optimized), ('second', reference)]:
+			output_file = os.path.join(temp_folder, mode + '.lib')
+			library.save(output_file)
+			outputs[mode] = (ReadBytes(output_file), ReadBytes(os.path.join(temp_folder, mode + '.dcm')))
+
+		# Optimized parse output must match reference parse output
+		failures += CompareOutputs('lib output (optimized)', outputs['reference'][0], outputs['optimized'][0])
+		failures += CompareOutputs('dcm output (optimized)', outputs['reference'][1], outputs['optimized'][1])
+		# Saving twice must give the same output
+		failures += CompareOutputs('lib output (second save)', outputs['reference'][0], outputs['second'][0])
+		failures += CompareOutputs('dcm output (second save)', outputs['reference'][1], outputs['second'][1])
+		# Output must match source files
+		if source_check:
+			failures += CompareOutputs('lib round trip', ReadSource(lib_file), outputs['reference'][0])
+			if os.path.isfile(dcm_file):
+				failures += CompareOutputs('dcm round trip', ReadSource(dcm_file), outputs['reference'][1])
+
+		# Models
+		failures += CompareModels('model (optimized)', reference, optimized)
+		failures += CompareModels('model (reloaded)', reference, SchLib(os.path.join(temp_folder, 'reference.lib')), sort = True)
+		failures += CheckClones(optimized)
+		# Draw elements are edited (last check)
+		failures += CheckSharedDraws(reference)
+	except Exception as error:
+		failures.append(f'check: {error!r}')
+	finally:
+		shutil.rmtree(temp_folder, ignore_errors = True)
+
+	return failures
+
+def SymbolFields(component):
+	# Fields without their S-expression source
+	return [{key: value for key, value in field.items() if key != 'property'} for field in component.fields]
+
+def CheckSymLibrary(lib_file, source_check = True):
+	# Return list of failures for KiCad 6+ symbol library file
+	failures = []
+	temp_folder = tempfile.mkdtemp()
+	try:
+		try:
+			library = SymLib(lib_file)
+		except Exception as error:
+			return [f'parse: {error!r}']
+
+		if not library.validFile:
+			return ['parse: invalid library file']
+
+		# Unchanged symbols are copied, rendering them must not change their S-expression
+		with open(lib_file, 'rb') as f:
+			for component in library.components:
+				data = component.read(f)
+				if component.render(data) != data:
+					failures.append(f'{component.name}: render differs from source')
+
+		outputs = {}
+		for mode in ['first', 'second']:
+			output_file = os.path.join(temp_folder, mode + '.kicad_sym')
+			library.save(output_file)
+			outputs[mode] = ReadBytes(output_file)
+
+		failures += CompareOutputs('lib output (second save)', outputs['first'], outputs['second'])
+		if source_check:
+			failures += CompareOutputs('lib round trip', ReadSource(lib_file), outputs['first'])
+
+		# Model
+		reloaded = SymLib(os.path.join(temp_folder, 'first.kicad_sym'))
+		if len(library.components) != len(reloaded.components):
+			failures.append(f'model (reloaded): {len(library.components)} != {len(reloaded.components)} components')
+		for component, other_component in zip(library.components, reloaded.components):
+			for attribute in SYMBOL_ATTRIBUTES:
+				if getattr(component, attribute) != getattr(other_component, attribute):
+					failures.append(f'model (reloaded): {component.name}.{attribute} differs')
+			if SymbolFields(component) != SymbolFields(other_component):
+				failures.append(f'model (reloaded): {component.name}.fields differs')
+	except Exception as error:
+		failures.append(f'check: {error!r}')
+	finally:
+		shutil.rmtree(temp_folder, ignore_errors = True)
+
+	return failures
+
+### RANDOM LIBRARY GENERATOR
+def RandomName(rng):
+	return ''.join(rng.choice('ABCDEFGHJKLMNPRSTUVWXYZ0123456789_-') for n in range(rng.randint(3, 12)))
+
+def RandomText(rng, max_length = 24):
+	# Random quoted text, double-quotes are escaped
+	# Backslashes before double-quotes (or the closing quote) cannot be told apart from escapes and are removed
+	text = ''.join(rng.choice(FUZZ_CHARACTERS) for n in range(rng.randint(0, max_length))).rstrip('\\')
+	while '\\"' in text:
+		text = text.replace('\\"', '"')
+	text = text.replace('"', '\\"')
+	return '"' + text + '"'
+
+def RandomDocText(rng):
+	# Documentation lines are not quoted (empty lines are allowed)
+	return ''.join(rng.choice(FUZZ_CHARACTERS) for n in range(rng.randint(0, 32))).strip()
+
+def RandomDraw(rng):
+	coordinate = lambda: str(rng.randrange(-1000, 1000, 25))
+	unit = lambda: str(rng.randint(0, 2))
+	fill = lambda: rng.choice(['N', 'F', 'f'])
+	lines = []
+	for n in range(rng.randint(0, 6)):
+		element = rng.choice('SCAPT')
+		if element == 'S':
+			lines.append(f'S {coordinate()} {coordinate()} {coordinate()} {coordinate()} {unit()} 1 10 {fill()}')
+		elif element == 'C':
+			lines.append(f'C {coordinate()} {coordinate()} {rng.randint(1, 500)} {unit()} 1 10 {fill()}')
+		elif element == 'A':
+			lines.append(f'A {coordinate()} {coordinate()} {rng.randint(1, 500)} {rng.randint(-1800, 1800)} {rng.randint(-1800, 1800)} {unit()} 1 10 {fill()} '
+						 f'{coordinate()} {coordinate()} {coordinate()} {coordinate()}')
+		elif element == 'P':
+			point_count = rng.randint(2, 5)
+			points = ' '.join(coordinate() for n in range(2 * point_count))
+			lines.append(f'P {point_count} {unit()} 1 10 {points} {fill()}')
+		elif element == 'T':
+			text = rng.choice([RandomName(rng), RandomText(rng)])
+			lines.append(f'T {rng.choice(["0", "900"])} {coordinate()} {coordinate()} 50 0 {unit()} 1 {text} {rng.choice(["Normal", "Italic"])} {rng.randint(0, 1)} C C')
+
+	for number in range(1, rng.randint(1, 8)):
+		pin_name = rng.choice([RandomName(rng), '~', '~{' + RandomName(rng) + '}'])
+		pin_type = rng.choice(['', ' N', ' I', ' C'])
+		lines.append(f'X {pin_name} {number} {coordinate()} {coordinate()} 100 {rng.choice("RLUD")} 50 50 {unit()} 1 {rng.choice("IOBPWw")}{pin_type}')
+
+	return lines
+
+def GenerateLibrary(folder, library_name, rng, component_count = 20):
+	# Generate random library and documentation files, written as SchLib.save writes them
+	names = set()
+	while len(names) < component_count:
+		names.add(RandomName(rng))
+
+	# Aliases are unique across the library
+	used_names = set(names)
+	components = []
+	for name in sorted(names):
+		aliases = []
+		for n in range(rng.choice([0, 0, 0, 1, 2])):
+			alias = RandomName(rng)
+			if alias not in used_names:
+				used_names.add(alias)
+				aliases.append(alias)
+		components.append((name, aliases))
+
+	lib_lines = ['EESchema-LIBRARY Version 2.4\n', '#encoding utf-8\n']
+	documentation = {}
+	for name, aliases in components:
+		lib_lines += ['#\n', f'# {name}\n', '#\n']
+		lib_lines.append(f'DEF {name} {rng.choice(["U", "Q", "R", "#PWR"])} 0 {rng.choice(["0", "40"])} {rng.choice("YN")} {rng.choice("YN")} {rng.randint(1, 4)} {rng.choice("FL")} {rng.choice("NP")}\n')
+		lib_lines.append(f'F0 {RandomText(rng, 4)} 0 100 50 H V C CNN\n')
+		lib_lines.append(f'F1 "{name}" 0 -100 50 H V C CNN\n')
+		lib_lines.append(f'F2 {RandomText(rng)} 0 -200 50 H I C CNN\n')
+		lib_lines.append(f'F3 {rng.choice([RandomText(rng), chr(34) * 2])} 0 -300 50 H I C CNN\n')
+		for index, fieldname in enumerate(rng.sample(FUZZ_FIELDNAMES, rng.randint(0, len(FUZZ_FIELDNAMES)))):
+			lib_lines.append(f'F{index + 4} {rng.choice([RandomText(rng), chr(34) * 2])} 0 {-400 - 100 * index} 50 H I C CNN {fieldname}\n')
+		if aliases:
+			lib_lines.append('ALIAS ' + ' '.join(aliases) + '\n')
+		# Empty footprint lists are not saved
+		fplist = [RandomName(rng) + '*' for n in range(rng.choice([0, 0, 1, 2, 3]))]
+		if fplist:
+			lib_lines += ['$FPLIST\n'] + [f' {fp}\n' for fp in fplist] + ['$ENDFPLIST\n']
+		lib_lines.append('DRAW\n')
+		lib_lines += [line + '\n' for line in RandomDraw(rng)]
+		lib_lines += ['ENDDRAW\n', 'ENDDEF\n']
+
+		# Documentation (some components and aliases do not have one)
+		for doc_name in [name] + aliases:
+			if rng.random() < 0.8:
+				documentation[doc_name] = [(key, RandomDocText(rng)) for key in ['D', 'K', 'F'] if rng.random() < 0.7]
+
+	lib_lines += ['#\n', '#End Library\n']
+
+	dcm_lines = ['EESchema-DOCLIB  Version 2.0\n']
+	for doc_name in sorted(documentation.keys()):
+		dcm_lines += ['#\n', f'$CMP {doc_name}\n']
+		dcm_lines += [f'{key} {value}\n' for key, value in documentation[doc_name]]
+		dcm_lines.append('$ENDCMP\n')
+	dcm_lines += ['#\n', '#End Doc Library\n']
+
+	lib_file = os.path.join(folder, library_name + '.lib')
+	with open(lib_file, 'w', newline='\n') as f:
+		f.writelines(lib_lines)
+	with open(os.path.join(folder, library_name + '.dcm'), 'w', newline='\n') as f:
+		f.writelines(dcm_lines)
+
+	return lib_file
+
+def CheckRandomLibrary(seed, component_count = 20, keep_folder = None):
+	# Generate and check random library, failing libraries are copied to keep folder
+	folder = tempfile.mkdtemp()
+	try:
+		lib_file = GenerateLibrary(folder, f'fuzz_{seed}', random.Random(seed), component_count)
+		failures = CheckLibrary(lib_file)
+		if failures and keep_folder:
+			os.makedirs(keep_folder, exist_ok = True)
+			for extension in ['.lib', '.dcm']:
+				shutil.copy(os.path.splitext(lib_file)[0] + extension, keep_folder)
+		return failures
+	finally:
+		shutil.rmtree(folder, ignore_errors = True)
+
+### FILE DISCOVERY
+def FindLibraries(paths):
+	lib_files = []
+	for path in paths:
+		if os.path.isdir(path):
+			for dirpath, folders, files in os.walk(path):
+				lib_files += [os.path.join(dirpath, file) for file in files if os.path.splitext(file)[1] in LIB_EXTENSIONS]
+		else:
+			lib_files.append(path)
+	return sorted(lib_files)
+
+# MAIN
+if __name__ == '__main__':
+	### ARGPARSE
+	parser = argparse.ArgumentParser(description = """KiCad Symbol Library Round Trip Check""", add_help=False)
+	parser.add_argument('-h', '--help', action='help',
+						help = 'Show this help message and exit')
+	parser.add_argument('-v', '--version', action='version', version='%(prog)s ' + __version__,
+						help = 'Show program\'s version number and exit')
+	parser.add_argument('PATH', nargs='*',
+						help = 'KiCad symbol library folders or files (.lib or .kicad_sym files)')
+	parser.add_argument('-j', '--jobs', required = False, default = os.cpu_count(), type = int,
+						help = 'Number of parallel checks (default: number of CPUs)')
+	parser.add_argument('--no_source', action='store_true',
+						help = 'Do not compare saved files with source files')
+	parser.add_argument('--fuzz', required = False, default = 0, type = int,
+						help = 'Number of random libraries to check', metavar=('COUNT'))
+	parser.add_argument('--seed', required = False, default = 0, type = int,
+						help = 'First random library seed (default: 0)')
+	parser.add_argument('--components', required = False, default = 20, type = int,
+						help = 'Number of components per random library (default: 20)')
+	parser.add_argument('--keep', required = False, default = '',
+						help = 'Copy failing random libraries to folder', metavar=('FOLDER'))
+
+	args = parser.parse_args()
+	###
+
+	if not args.PATH and not args.fuzz:
+		parser.error('PATH or --fuzz is required')
+
+	lib_files = FindLibraries(args.PATH)
+	seeds = list(range(args.seed, args.seed + args.fuzz))
+	failed = 0
+
+	with ProcessPoolExecutor(max_workers = args.jobs) as executor:
+		checks = [(lib_file, executor.submit(CheckLibrary, lib_file, not args.no_source)) for lib_file in lib_files]
+		checks += [(f'random library (seed {seed})', executor.submit(CheckRandomLibrary, seed, args.components, args.keep)) for seed in seeds]
+
+		for label, check in checks:
+			failures = check.result()
+			if failures:
+				failed += 1
+				print(f'[FAIL]\t{label}')
+				for failure in failures:
+					print(f'\t{failure}')
+
+	print(f'{len(checks) - failed}/{len(checks)} libraries passed')
+	exit(-1 if failed else 0)
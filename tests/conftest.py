@@ -0,0 +1,29 @@
+import os
+import sys
+
+import pytest
+
+# Library utils and tools are not installed packages
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'kicad-library-utils'))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'kicad-tools'))
+
+
+@pytest.fixture
+def write_library(tmp_path):
+    # Write .lib and .dcm files from components: [(component, documentation)]
+    def write(name, components, folder=None):
+        folder = folder or tmp_path
+        os.makedirs(folder, exist_ok=True)
+        lib_file = os.path.join(folder, name + '.lib')
+        with open(lib_file, 'w') as f:
+            f.write('EESchema-LIBRARY Version 2.4\n#encoding utf-8\n')
+            f.write(''.join(component for component, documentation in components))
+            f.write('#\n#End Library\n')
+        with open(os.path.join(folder, name + '.dcm'), 'w') as f:
+            f.write('EESchema-DOCLIB  Version 2.0\n#\n')
+            f.write(''.join(documentation for component, documentation in components))
+            f.write('#\n#End Doc Library\n')
+        return lib_file
+
+    return write
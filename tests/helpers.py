@@ -0,0 +1,112 @@
+import os
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'templates')
+
+RESISTOR_DRAW = '''DRAW
+S -40 -100 40 100 0 1 10 N
+X ~ 1 0 150 50 D 50 50 1 1 P
+X ~ 2 0 -150 50 U 50 50 1 1 P
+ENDDRAW
+'''
+
+CAPACITOR_DRAW = '''DRAW
+P 2 0 1 20 -80 -30 80 -30 N
+P 2 0 1 20 -80 30 80 30 N
+X ~ 1 0 150 110 D 50 50 1 1 P
+X ~ 2 0 -150 110 U 50 50 1 1 P
+ENDDRAW
+'''
+
+
+def make_component(name, reference='R', footprint='', fields=None, draw=RESISTOR_DRAW):
+    # Legacy component (DEF ... ENDDEF), user fields are (name, value) pairs
+    lines = [
+        '#\n',
+        f'# {name}\n',
+        '#\n',
+        f'DEF {name} {reference} 0 0 N Y 1 F N\n',
+        f'F0 "{reference}" 80 0 50 V V C CNN\n',
+        f'F1 "{name}" 0 0 50 V V C CNN\n',
+        f'F2 "{footprint}" -70 0 50 V I C CNN\n',
+        'F3 "" 0 0 50 H I C CNN\n',
+    ]
+    for index, (field, value) in enumerate(fields or [], start=4):
+        lines.append(f'F{index} "{value}" 0 {-100 * index} 50 H I C CNN "{field}"\n')
+    lines.append(draw)
+    lines.append('ENDDEF\n')
+    return ''.join(lines)
+
+
+def make_documentation(name, description='', keywords='', datasheet='~'):
+    return f'$CMP {name}\nD {description}\nK {keywords}\nF {datasheet}\n$ENDCMP\n#\n'
+
+
+# KiCad 6+ library: documentation in ki_ properties (KiCad 6-7) and Description property (KiCad 8+)
+SYM_LIBRARY = r'''(kicad_symbol_lib (version 20220914) (generator kicad_symbol_editor)
+  (symbol "R_10k" (pin_numbers hide) (pin_names (offset 0)) (in_bom yes) (on_board yes)
+    (property "Reference" "R" (at 2.032 0 90)
+      (effects (font (size 1.27 1.27)))
+    )
+    (property "Value" "10k" (id 1) (at 0 0 90)
+      (effects (font (size 1.27 1.27)))
+    )
+    (property "Footprint" "Resistor_SMD:R_0603_1608Metric" (at -1.778 0 90)
+      (effects (font (size 1.27 1.27)) hide)
+    )
+    (property "Datasheet" "~" (at 0 0 0)
+      (effects (font (size 1.27 1.27)) hide)
+    )
+    (property "Tolerance" "1%" (at 0 -2.54 0)
+      (effects (font (size 1.27 1.27)) hide)
+    )
+    (property "ki_keywords" "R res resistor" (at 0 0 0)
+      (effects (font (size 1.27 1.27)) hide)
+    )
+    (property "ki_description" "Resistor \"small\"" (at 0 0 0)
+      (effects (font (size 1.27 1.27)) hide)
+    )
+    (property "ki_fp_filters" "R_*" (at 0 0 0)
+      (effects (font (size 1.27 1.27)) hide)
+    )
+    (symbol "R_10k_0_1"
+      (rectangle (start -1.016 -2.54) (end 1.016 2.54)
+        (stroke (width 0.254) (type default))
+        (fill (type none))
+      )
+    )
+    (symbol "R_10k_1_1"
+      (pin passive line (at 0 3.81 270) (length 1.27)
+        (name "~" (effects (font (size 1.27 1.27))))
+        (number "1" (effects (font (size 1.27 1.27))))
+      )
+    )
+  )
+  (symbol "C_100n" (in_bom yes) (on_board yes)
+    (property "Reference" "C" (at 0.635 2.54 0)
+      (effects (font (size 1.27 1.27)) (justify left))
+    )
+    (property "Value" "100n" (id 1) (at 0.635 -2.54 0)
+      (effects (font (size 1.27 1.27)) (justify left))
+    )
+    (property "Footprint" "" (at 0 0 0)
+      (effects (font (size 1.27 1.27)) hide)
+    )
+    (property "Datasheet" "~" (at 0 0 0)
+      (effects (font (size 1.27 1.27)) hide)
+    )
+    (property "Description" "Capacitor" (at 0 0 0)
+      (effects (font (size 1.27 1.27)) hide)
+    )
+    (property "Voltage" "50V" (at 0 -5.08 0)
+      (effects (font (size 1.27 1.27)) hide)
+    )
+    (symbol "C_100n_0_1"
+      (polyline
+        (pts (xy -2.032 -0.762) (xy 2.032 -0.762))
+        (stroke (width 0.508) (type default))
+        (fill (type none))
+      )
+    )
+  )
+)
+'''
@@ -0,0 +1,60 @@
+import csv
+import os
+
+import kicad_library_manager_csv as manager
+
+from helpers import CAPACITOR_DRAW, make_component, make_documentation
+
+
+def write_resistors(write_library, folder, footprint_1k='Resistor_SMD:R_0603_1608Metric', capacitor=True, resistor_2k=False):
+    components = [
+        (make_component('R_10K', footprint='Resistor_SMD:R_0603_1608Metric', fields=[('Tolerance', '1%')]), make_documentation('R_10K', 'Resistor 10k')),
+        (make_component('R_1K', footprint=footprint_1k, fields=[('Tolerance', '5%')]), make_documentation('R_1K', 'Resistor 1k')),
+    ]
+    if capacitor:
+        components.append((make_component('C_100N', reference='C', draw=CAPACITOR_DRAW), make_documentation('C_100N')))
+    if resistor_2k:
+        components.append((make_component('R_2K', fields=[('Tolerance', '1%')]), make_documentation('R_2K', 'Resistor 2k')))
+    return write_library('Resistors', components, folder=folder)
+
+
+def sync_csv(lib_file, csv_file):
+    klib = manager.KicadLibrary(lib_file=lib_file, csv_file=csv_file, export=True)
+    klib.SyncLibraryToCSV(silent=True)
+
+
+def test_sync_patches_changed_rows(write_library, tmp_path):
+    lib_file = write_resistors(write_library, str(tmp_path))
+    csv_file = str(tmp_path / 'Resistors.csv')
+    manager.KicadLibrary(lib_file=lib_file, csv_file=csv_file, export=True).ExportLibraryToCSV()
+
+    # CSV file edited by user: columns are moved, lines end with LF
+    with open(csv_file, newline='') as f:
+        rows = [row[:1] + row[-1:] + row[1:-1] for row in csv.reader(f)]
+    with open(csv_file, 'w', newline='') as f:
+        csv.writer(f, lineterminator='\n').writerows(rows)
+    with open(csv_file, newline='') as f:
+        lines = f.readlines()
+
+    write_resistors(write_library, str(tmp_path), footprint_1k='Resistor_SMD:R_0805_2012Metric', capacitor=False, resistor_2k=True)
+    sync_csv(lib_file, csv_file)
+
+    with open(csv_file, newline='') as f:
+        synced = f.readlines()
+    assert all(line.endswith('\n') and not line.endswith('\r\n') for line in synced)
+    # Header and unchanged row are kept, changed row is patched, removed row is dropped, new row is added last
+    assert synced[:2] == lines[:2]
+    assert [line.split(',')[0] for line in synced] == ['name', 'R_10K', 'R_1K', 'R_2K']
+    assert 'R_0805_2012Metric' in synced[2]
+    assert synced[2].split(',')[1] == lines[2].split(',')[1]
+
+
+def test_sync_up_to_date_file_is_not_written(write_library, tmp_path):
+    lib_file = write_resistors(write_library, str(tmp_path))
+    csv_file = str(tmp_path / 'Resistors.csv')
+    manager.KicadLibrary(lib_file=lib_file, csv_file=csv_file, export=True).ExportLibraryToCSV()
+    os.utime(csv_file, (0, 0))
+
+    sync_csv(lib_file, csv_file)
+
+    assert os.stat(csv_file).st_mtime == 0
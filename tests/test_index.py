@@ -0,0 +1,36 @@
+import os
+
+import kicad_library_manager_csv as manager
+
+from helpers import make_component, make_documentation
+
+
+def write_resistor(write_library, folder, manufacturer):
+    return write_library('Resistors', [
+        (make_component('R_10K', fields=[('Manufacturer', manufacturer), ('New Param', 'x1')]), make_documentation('R_10K', 'Resistor')),
+    ], folder=str(folder))
+
+
+def test_folders_share_index(tmp_path, write_library, monkeypatch):
+    lib_a = write_resistor(write_library, tmp_path / 'a', 'Vishay')
+    lib_b = write_resistor(write_library, tmp_path / 'b', 'Yageo')
+    index_file = str(tmp_path / 'index.json')
+
+    for lib_file in [lib_a, lib_b]:
+        index = manager.LibraryIndex(index_file)
+        assert index.UpdateIndex(os.path.dirname(lib_file) + '/', ['Resistors.lib'], silent=True)
+        index.SaveIndex()
+
+    # Index is updated from another folder: libraries are unchanged
+    monkeypatch.chdir(tmp_path / 'b')
+    index = manager.LibraryIndex(index_file)
+    assert not index.UpdateIndex('../a/', ['Resistors.lib'], silent=True)
+    assert sorted(index.libraries) == [os.path.abspath(lib_a), os.path.abspath(lib_b)]
+
+    index = manager.LibraryIndex(index_file)
+    results = index.Query('yageo', mode='token')
+    assert [(index.GetLibraryPath(library_id), field) for library_id, component, field in results] == [('Resistors.lib', 'manufacturer')]
+    # Token postings are not loaded by exact queries
+    index = manager.LibraryIndex(index_file)
+    assert len(index.Query('x1', field='New Param')) == 2
+    assert index.postings['tokens'] is None
@@ -0,0 +1,25 @@
+import pytest
+
+from schlib.kicad_sym import SymLib, SymLibDigest
+
+from helpers import SYM_LIBRARY
+
+
+@pytest.fixture
+def sym_library(tmp_path):
+    lib_file = tmp_path / 'Sym.kicad_sym'
+    lib_file.write_text(SYM_LIBRARY)
+    return str(lib_file)
+
+
+def test_digest_documentation_matches_parse(sym_library):
+    library = SymLib(sym_library)
+    digests = SymLibDigest(sym_library).components
+    for component in library.components:
+        digest = digests[component.name]
+        documentation = {key: value for key, (value, source) in digest.getDocumentation().items()}
+        assert documentation == {key: value for key, value in component.documentation.items() if value is not None}
+        # Documentation properties are not fields
+        assert not set(digest.getFieldValues()) & {'Datasheet', 'Description', 'ki_description', 'ki_keywords'}
+
+    assert digests['C_100n'].getDocumentation()['description'][0] == 'Capacitor'
@@ -0,0 +1,101 @@
+import csv
+import os
+
+import pytest
+
+import kicad_library_manager_csv as manager
+
+from helpers import SYM_LIBRARY, TEMPLATE_DIR, make_component, make_documentation
+
+
+def export_csv(lib_file, csv_file):
+    klib = manager.KicadLibrary(lib_file=lib_file, csv_file=csv_file, export=True)
+    klib.ExportLibraryToCSV()
+
+
+def update_library(lib_file, csv_file, template=None):
+    klib = manager.KicadLibrary(lib_file=lib_file, csv_file=csv_file)
+    klib.UpdateLibraryFromCSV(template=template, silent=True)
+
+
+def edit_csv(csv_file, edit):
+    with open(csv_file, newline='') as f:
+        header, *rows = csv.reader(f)
+    edit(header, rows)
+    with open(csv_file, 'w', newline='') as f:
+        csv.writer(f).writerows([header] + rows)
+
+
+def read_parts(lib_file):
+    klib = manager.KicadLibrary(lib_file=lib_file)
+    return {part['name']: dict(part) for part in klib.lib_parse}, klib.library
+
+
+@pytest.fixture
+def transistors(write_library):
+    fields = [('Manufacturer', 'Diodes'), ('Manufacturer Part Number', 'BSS138-7-F')]
+    return write_library('Transistors', [
+        (make_component('BSS138', reference='Q', footprint='Package_TO_SOT_SMD:SOT-23', fields=fields),
+         make_documentation('BSS138', 'N-Channel MOSFET 50V', 'mosfet n-channel', 'https://www.diodes.com/bss138.pdf')),
+        (make_component('X1', reference='X'), make_documentation('X1', datasheet='')),
+    ])
+
+
+@pytest.mark.parametrize('manufacturer', ['Diodes', 'Diodes Incorporated'])
+def test_renamed_part_keeps_library_component(transistors, tmp_path, manufacturer):
+    csv_file = str(tmp_path / 'Transistors.csv')
+    export_csv(transistors, csv_file)
+
+    def rename(header, rows):
+        rows[0][header.index('name')] = 'BSS138W'
+        # Similar fields (one field of the part changed) are matched as well
+        rows[0][header.index('manufacturer')] = f'"{manufacturer}"'
+    edit_csv(csv_file, rename)
+    update_library(transistors, csv_file)
+
+    parts, library = read_parts(transistors)
+    assert 'BSS138' not in parts
+    assert parts['BSS138W']['manufacturer_part_number'] == '"BSS138-7-F"'
+    assert parts['BSS138W']['manufacturer'] == f'"{manufacturer}"'
+    assert len(library.getComponentByName('BSS138W').pins) == 2
+
+
+def test_part_with_few_fields_is_not_renamed(transistors, tmp_path):
+    csv_file = str(tmp_path / 'Transistors.csv')
+    export_csv(transistors, csv_file)
+
+    edit_csv(csv_file, lambda header, rows: rows[1].__setitem__(header.index('name'), 'X2'))
+    # Part is removed and added (no template: part cannot be added)
+    update_library(transistors, csv_file)
+
+    assert sorted(read_parts(transistors)[0]) == ['BSS138']
+
+
+def test_kicad_sym_update_round_trip(tmp_path):
+    lib_file = str(tmp_path / 'Sym.kicad_sym')
+    with open(lib_file, 'w') as f:
+        f.write(SYM_LIBRARY)
+    csv_file = str(tmp_path / 'Sym.csv')
+    export_csv(lib_file, csv_file)
+
+    def edit(header, rows):
+        rows[1][header.index('voltage')] = '"25V"'
+        rows.append(['C_1u'] + [''] * (len(header) - 1))
+        rows[-1][header.index('reference')] = '"C"'
+        rows[-1][header.index('value')] = '"1u"'
+    edit_csv(csv_file, edit)
+    update_library(lib_file, csv_file, template=os.path.join(TEMPLATE_DIR, 'TEMPLATE_SYMBOL.kicad_sym'))
+
+    with open(lib_file) as f:
+        updated = f.read()
+    parts = read_parts(lib_file)[0]
+    assert sorted(parts) == ['C_100n', 'C_1u', 'R_10k']
+    assert parts['C_100n']['voltage'] == '"25V"'
+    # Unchanged symbols are written back as read
+    resistor = SYM_LIBRARY[SYM_LIBRARY.index('  (symbol "R_10k"'):SYM_LIBRARY.index('  (symbol "C_100n"')]
+    assert resistor in updated
+
+    # Library is up to date: second update does not change it
+    update_library(lib_file, csv_file, template=os.path.join(TEMPLATE_DIR, 'TEMPLATE_SYMBOL.kicad_sym'))
+    with open(lib_file) as f:
+        assert f.read() == updated
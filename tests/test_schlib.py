@@ -0,0 +1,56 @@
+import pytest
+
+from schlib.schlib import SchLib
+
+from helpers import CAPACITOR_DRAW, make_component, make_documentation
+
+
+@pytest.fixture
+def resistors(write_library):
+    return write_library('Resistors', [
+        (make_component('R_10K_0603'), make_documentation('R_10K_0603', 'Resistor 10k')),
+        (make_component('R_1K_0603'), make_documentation('R_1K_0603', 'Resistor 1k')),
+        (make_component('C_100N', reference='C', draw=CAPACITOR_DRAW), make_documentation('C_100N')),
+        (make_component('EMPTY_1', draw='DRAW\nENDDRAW\n'), make_documentation('EMPTY_1')),
+        (make_component('EMPTY_2', draw='DRAW\nENDDRAW\n'), make_documentation('EMPTY_2')),
+    ])
+
+
+@pytest.mark.parametrize('draw_raw', [False, True])
+def test_edited_draw_does_not_change_identical_component(resistors, draw_raw):
+    library = SchLib(resistors, draw_raw=draw_raw)
+    component = library.getComponentByName('R_10K_0603')
+    other_component = library.getComponentByName('R_1K_0603')
+    assert component.draw_digest == other_component.draw_digest
+
+    component.draw['pins'].append(dict(component.draw['pins'][0], num='3'))
+    component.draw['rectangles'][0]['endx'] = '50'
+
+    assert len(other_component.pins) == 2
+    assert other_component.draw['rectangles'][0]['endx'] == '40'
+
+
+def test_clone_draw_is_copied(resistors):
+    component = SchLib(resistors).getComponentByName('R_10K_0603')
+    clone = component.clone()
+    assert clone.draw == component.draw
+
+    clone.draw['pins'][0]['num'] = '9'
+    assert component.getPinByNumber(1) is not None
+    assert clone.drawOrdered[-2][1] is clone.draw['pins'][0]
+
+
+def test_raw_draw_sections_are_shared(resistors):
+    library = SchLib(resistors, draw_raw=True)
+    component = library.getComponentByName('R_10K_0603')
+    other_component = library.getComponentByName('R_1K_0603')
+    assert component.draw_raw is other_component.draw_raw
+
+
+@pytest.mark.parametrize('draw_raw', [False, True])
+def test_draw_stats_skip_empty_drawings(resistors, draw_raw):
+    stats = SchLib(resistors, draw_raw=draw_raw).getDrawStats()
+    assert stats['components'] == 5
+    assert stats['draws'] + stats['shared'] == 3
+    # Parsed drawings are never shared
+    assert stats['shared'] == (1 if draw_raw else 0)